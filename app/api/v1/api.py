@@ -5,7 +5,7 @@ Agrège tous les routers de l'API
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, categories, products, clients, stock
+from app.api.v1.endpoints import auth, categories, products, clients, stock, orders, reports, cash_register
 
 api_router = APIRouter()
 
@@ -15,10 +15,10 @@ api_router.include_router(categories.router, tags=["Categories"])
 api_router.include_router(products.router, tags=["Products"])
 api_router.include_router(clients.router, tags=["Clients"])
 api_router.include_router(stock.router, tags=["Stock"])
+api_router.include_router(orders.router, tags=["Orders"])
+api_router.include_router(reports.router, tags=["Reports"])
+api_router.include_router(cash_register.router, tags=["Cash Register"])
 
 # À ajouter au fur et à mesure:
-# api_router.include_router(orders.router, prefix="/orders", tags=["Orders"])
-# api_router.include_router(cash_register.router, prefix="/cash-register", tags=["Cash Register"])
 # api_router.include_router(transactions.router, prefix="/transactions", tags=["Transactions"])
-# api_router.include_router(reports.router, prefix="/reports", tags=["Reports"])
 # etc.
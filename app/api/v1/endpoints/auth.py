@@ -9,10 +9,11 @@ from datetime import datetime
 
 from app.core.database import get_db
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
-    get_current_user
+    get_current_user,
+    invalidate_cached_user
 )
 from app.models.user import User
 from app.schemas.auth import LoginRequest, LoginResponse, RegisterRequest, ChangePasswordRequest
@@ -40,7 +41,7 @@ async def login(
     user = result.scalar_one_or_none()
 
     # Vérifier si l'utilisateur existe et si le mot de passe est correct
-    if not user or not verify_password(credentials.password, user.password_hash):
+    if not user or not await verify_password_async(credentials.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou mot de passe incorrect",
@@ -57,6 +58,7 @@ async def login(
     # Mettre à jour la date de dernière connexion
     user.last_login = datetime.utcnow()
     await db.commit()
+    invalidate_cached_user(user.id)
 
     # Créer le token d'accès
     access_token = create_access_token(subject=str(user.id))
@@ -102,7 +104,7 @@ async def register(
     # Créer le nouvel utilisateur
     new_user = User(
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await get_password_hash_async(user_data.password),
         role=user_data.role,
         store_id=user_data.store_id,
         is_active=True
@@ -156,15 +158,18 @@ async def change_password(
     - **new_password**: Nouveau mot de passe
     """
     # Vérifier l'ancien mot de passe
-    if not verify_password(password_data.old_password, current_user.password_hash):
+    if not await verify_password_async(password_data.old_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Ancien mot de passe incorrect"
         )
 
     # Mettre à jour le mot de passe
-    current_user.password_hash = get_password_hash(password_data.new_password)
+    # (l'utilisateur peut provenir du cache: le rattacher à la session)
+    db.add(current_user)
+    current_user.password_hash = await get_password_hash_async(password_data.new_password)
     await db.commit()
+    invalidate_cached_user(current_user.id)
 
     return {"message": "Mot de passe modifié avec succès"}
 
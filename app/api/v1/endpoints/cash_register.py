@@ -0,0 +1,332 @@
+"""
+Endpoints pour les sessions de caisse (ouverture, rapport X, clôture Z)
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.models.user import User
+from app.models.cash_register import CashRegisterSession, CashRegisterDetail
+from app.models.transaction import PaymentMethod
+from app.api.v1.endpoints.orders import check_payment_methods
+from app.schemas.cash_register import (
+    CashRegisterAmount,
+    CashRegisterClose,
+    CashRegisterDetailResponse,
+    CashRegisterOpen,
+    CashRegisterReport,
+    CashRegisterSessionResponse,
+    ReportType
+)
+
+router = APIRouter(prefix="/cash-register", tags=["Cash Register"])
+
+
+# ========== HELPER FUNCTIONS ==========
+
+def amounts_by_method(amounts: List[CashRegisterAmount]) -> Dict[UUID, Decimal]:
+    """Indexe les montants par méthode de paiement (une ligne par méthode)"""
+    by_method = {}
+    for line in amounts:
+        if line.payment_method_id in by_method:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Méthode de paiement en double: {line.payment_method_id}"
+            )
+        by_method[line.payment_method_id] = line.amount
+    return by_method
+
+
+async def get_cash_method_id(db: AsyncSession, store_id: UUID) -> Optional[UUID]:
+    """Méthode de paiement espèces du magasin (reçoit le fond de caisse non réparti)"""
+    result = await db.execute(
+        select(PaymentMethod.id)
+        .where(
+            PaymentMethod.store_id == store_id,
+            PaymentMethod.type == "cash",
+            PaymentMethod.is_active == True
+        )
+        .order_by(PaymentMethod.created_at, PaymentMethod.id)
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_session(
+    db: AsyncSession,
+    store_id: UUID,
+    session_id: UUID,
+    lock: bool = False
+) -> CashRegisterSession:
+    """Récupère une session du magasin, verrouillée si demandé"""
+    query = select(CashRegisterSession).where(
+        CashRegisterSession.id == session_id,
+        CashRegisterSession.store_id == store_id
+    )
+    if lock:
+        query = query.with_for_update()
+    result = await db.execute(query)
+    session = result.scalar_one_or_none()
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session de caisse non trouvée"
+        )
+    return session
+
+
+async def build_report(db: AsyncSession, session: CashRegisterSession) -> CashRegisterReport:
+    """
+    Rapport de caisse lu sur les lignes de détail
+
+    Les totaux par méthode sont tenus à jour par le trigger sur transactions :
+    le rapport lit une ligne par méthode de paiement, quel que soit le nombre
+    de ventes de la session.
+    """
+    result = await db.execute(
+        select(CashRegisterDetail, PaymentMethod.name)
+        .join(PaymentMethod, PaymentMethod.id == CashRegisterDetail.payment_method_id)
+        .where(CashRegisterDetail.session_id == session.id)
+        .order_by(PaymentMethod.name)
+    )
+    details = [
+        CashRegisterDetailResponse(
+            payment_method_id=detail.payment_method_id,
+            payment_method_name=name,
+            opening_amount=detail.opening_amount or 0,
+            total_in=detail.total_in or 0,
+            total_out=detail.total_out or 0,
+            expected_closing=detail.expected_closing or 0,
+            actual_closing=detail.actual_closing,
+            difference=detail.difference
+        )
+        for detail, name in result.all()
+    ]
+    total_in = sum((detail.total_in for detail in details), Decimal("0"))
+    total_out = sum((detail.total_out for detail in details), Decimal("0"))
+
+    return CashRegisterReport(
+        report_type=ReportType.X if session.is_open else ReportType.Z,
+        generated_at=datetime.now(timezone.utc),
+        session=CashRegisterSessionResponse.model_validate(session),
+        total_in=total_in,
+        total_out=total_out,
+        expected_amount=session.opening_amount + total_in - total_out,
+        details=details
+    )
+
+
+# ========== ENDPOINTS ==========
+
+@router.post("/open", response_model=CashRegisterSessionResponse, status_code=status.HTTP_201_CREATED)
+async def open_session(
+    session_data: CashRegisterOpen,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Ouvrir une session de caisse
+
+    Une seule session ouverte par caissier. Le numéro (SES-YYYYMMDD-001) est
+    attribué par le trigger generate_session_number.
+
+    - **opening_amount**: fond de caisse
+    - **opening_details**: répartition du fond par méthode de paiement
+      (optionnel : à défaut, tout le fond est affecté à la méthode espèces)
+    """
+    store_id = current_user.store_id
+    opening = amounts_by_method(session_data.opening_details)
+
+    if not opening and session_data.opening_amount > 0:
+        # Fond non réparti : en espèces, sinon il manquerait à l'attendu de clôture
+        cash_method_id = await get_cash_method_id(db, store_id)
+        if cash_method_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Aucune méthode de paiement espèces : précisez opening_details"
+            )
+        opening = {cash_method_id: session_data.opening_amount}
+    elif opening:
+        if sum(opening.values(), Decimal("0")) != session_data.opening_amount:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="La répartition du fond de caisse ne correspond pas à opening_amount"
+            )
+        await check_payment_methods(db, store_id, sorted(opening))
+
+    result = await db.execute(
+        select(CashRegisterSession.session_number).where(
+            CashRegisterSession.store_id == store_id,
+            CashRegisterSession.opened_by == current_user.id,
+            CashRegisterSession.status == "open"
+        )
+    )
+    open_number = result.scalar_one_or_none()
+    if open_number:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Une session de caisse est déjà ouverte: {open_number}"
+        )
+
+    session = CashRegisterSession(
+        store_id=store_id,
+        opened_by=current_user.id,
+        session_number="",  # attribué par le trigger generate_session_number
+        opening_amount=session_data.opening_amount,
+        status="open",
+        notes=session_data.notes
+    )
+    session.details = [
+        CashRegisterDetail(
+            payment_method_id=method_id,
+            opening_amount=amount,
+            expected_closing=amount
+        )
+        for method_id, amount in opening.items()
+    ]
+    db.add(session)
+
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Ouverture simultanée : l'index idx_cash_sessions_one_open a tranché
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Une session de caisse est déjà ouverte"
+        )
+    await db.refresh(session)
+
+    return session
+
+
+@router.get("/current", response_model=CashRegisterSessionResponse)
+async def get_current_session(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Session de caisse ouverte du caissier connecté"""
+    result = await db.execute(
+        select(CashRegisterSession).where(
+            CashRegisterSession.store_id == current_user.store_id,
+            CashRegisterSession.opened_by == current_user.id,
+            CashRegisterSession.status == "open"
+        )
+    )
+    session = result.scalar_one_or_none()
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Aucune session de caisse ouverte"
+        )
+    return session
+
+
+@router.get("/{session_id}/report", response_model=CashRegisterReport)
+async def get_session_report(
+    session_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Rapport de caisse
+
+    Rapport X (lecture sans clôture) si la session est ouverte, rapport Z
+    (avec montants comptés et écarts) si elle est clôturée.
+    """
+    session = await get_session(db, current_user.store_id, session_id)
+    return await build_report(db, session)
+
+
+@router.post("/{session_id}/close", response_model=CashRegisterReport)
+async def close_session(
+    session_id: UUID,
+    close_data: CashRegisterClose,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Clôturer une session de caisse (rapport Z)
+
+    La session est verrouillée : l'encaissement, qui la lit en FOR SHARE,
+    attend la fin de la clôture puis la trouve fermée. Les écarts sont
+    calculés sur les totaux attendus déjà tenus à jour par méthode.
+
+    - **counted**: montants comptés par méthode ; une méthode non comptée
+      (paiement électronique) est réputée égale à l'attendu
+    """
+    store_id = current_user.store_id
+    counted = amounts_by_method(close_data.counted)
+    if counted:
+        await check_payment_methods(db, store_id, sorted(counted))
+
+    session = await get_session(db, store_id, session_id, lock=True)
+    if not session.is_open:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Session de caisse déjà clôturée"
+        )
+
+    result = await db.execute(
+        select(CashRegisterDetail).where(CashRegisterDetail.session_id == session.id)
+    )
+    details = {detail.payment_method_id: detail for detail in result.scalars().all()}
+
+    def add_detail(method_id: UUID) -> CashRegisterDetail:
+        """Ligne d'une méthode sans mouvement ni fond de caisse"""
+        details[method_id] = CashRegisterDetail(
+            session_id=session.id,
+            payment_method_id=method_id,
+            opening_amount=Decimal("0"),
+            total_in=Decimal("0"),
+            total_out=Decimal("0"),
+            expected_closing=Decimal("0")
+        )
+        db.add(details[method_id])
+        return details[method_id]
+
+    for method_id in counted.keys() - details.keys():
+        add_detail(method_id)
+
+    # Fond de caisse non réparti (session ouverte sans opening_details) :
+    # affecté aux espèces, où il est compté
+    unattributed = session.opening_amount - sum(
+        (detail.opening_amount or Decimal("0") for detail in details.values()), Decimal("0")
+    )
+    if unattributed:
+        cash_method_id = await get_cash_method_id(db, store_id)
+        if cash_method_id is not None:
+            cash = details.get(cash_method_id) or add_detail(cash_method_id)
+            cash.opening_amount = (cash.opening_amount or Decimal("0")) + unattributed
+            cash.expected_closing = (cash.expected_closing or Decimal("0")) + unattributed
+            unattributed = Decimal("0")
+
+    total_in = total_out = closing_amount = Decimal("0")
+    for method_id, detail in details.items():
+        expected = detail.expected_closing or Decimal("0")
+        detail.actual_closing = counted.get(method_id, expected)
+        detail.difference = detail.actual_closing - expected
+        total_in += detail.total_in or 0
+        total_out += detail.total_out or 0
+        closing_amount += detail.actual_closing
+
+    session.expected_amount = session.opening_amount + total_in - total_out
+    # Montants comptés, plus le fond resté sans méthode (non compté)
+    session.closing_amount = closing_amount + unattributed
+    session.difference = session.closing_amount - session.expected_amount
+    session.status = "closed"
+    session.closed_by = current_user.id
+    session.closed_at = func.now()
+    session.closing_notes = close_data.closing_notes
+
+    await db.commit()
+    await db.refresh(session)
+
+    return await build_report(db, session)
@@ -1,13 +1,15 @@
 """
 Endpoints pour la gestion des catégories de produits
 """
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_, and_, delete
 from sqlalchemy.orm import selectinload
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User
@@ -25,6 +27,9 @@ from app.schemas.category import (
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
+# Cache des arbres de catégories, clé: (store_id, include_inactive)
+category_tree_cache = TTLCache(maxsize=1024, ttl=settings.CATEGORY_TREE_CACHE_TTL)
+
 
 # ========== HELPER FUNCTIONS ==========
 
@@ -72,6 +77,33 @@ async def get_category_product_count(category_id: UUID, db: AsyncSession) -> int
     return result.scalar() or 0
 
 
+async def get_category_product_counts(
+    db: AsyncSession,
+    store_id: UUID,
+    category_ids: Optional[List[UUID]] = None
+) -> Dict[UUID, int]:
+    """Compte les produits de plusieurs catégories en une seule requête groupée"""
+    query = (
+        select(Product.category_id, func.count(Product.id))
+        .where(
+            Product.store_id == store_id,
+            Product.category_id.isnot(None)
+        )
+        .group_by(Product.category_id)
+    )
+
+    if category_ids is not None:
+        query = query.where(Product.category_id.in_(category_ids))
+
+    result = await db.execute(query)
+    return {category_id: count for category_id, count in result.all()}
+
+
+def invalidate_category_tree(store_id: UUID) -> None:
+    """Invalide les arbres de catégories mis en cache pour un magasin"""
+    category_tree_cache.invalidate_where(lambda key: key[0] == store_id)
+
+
 # ========== ENDPOINTS CRUD ==========
 
 @router.post("/", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
@@ -112,6 +144,7 @@ async def create_category(
     db.add(new_category)
     await db.commit()
     await db.refresh(new_category)
+    invalidate_category_tree(new_category.store_id)
 
     return new_category
 
@@ -177,44 +210,55 @@ async def get_category_tree(
 ):
     """
     Récupérer l'arbre hiérarchique complet des catégories
+
+    - **product_count**: produits directement rattachés à la catégorie
+    - **total_product_count**: produits de la catégorie et de ses descendants
     """
+    cache_key = (current_user.store_id, include_inactive)
+    cached_tree = category_tree_cache.get(cache_key)
+    if cached_tree is not None:
+        return cached_tree
+
     query = select(Category).where(Category.store_id == current_user.store_id)
 
     if not include_inactive:
         query = query.where(Category.is_active == True)
 
-    query = query.order_by(Category.display_order, Category.name)
+    query = query.order_by(Category.name)
 
     result = await db.execute(query)
     categories = result.scalars().all()
 
+    # Nombre de produits par catégorie (une seule requête groupée)
+    product_counts = await get_category_product_counts(db, current_user.store_id)
+
     # Construire l'arbre
     tree = await build_category_tree(list(categories))
 
-    # Convertir en schéma de réponse avec enfants
-    async def convert_to_response(cat: Category) -> CategoryWithChildren:
-        children = []
-        if hasattr(cat, 'children_list'):
-            for child in cat.children_list:
-                children.append(await convert_to_response(child))
-
-        product_count = await get_category_product_count(cat.id, db)
+    # Convertir en schéma de réponse avec enfants et cumul des descendants
+    def convert_to_response(cat: Category) -> CategoryWithChildren:
+        children = [
+            convert_to_response(child)
+            for child in getattr(cat, 'children_list', [])
+        ]
+        product_count = product_counts.get(cat.id, 0)
 
         return CategoryWithChildren(
             **cat.__dict__,
             children=children,
-            product_count=product_count
+            product_count=product_count,
+            total_product_count=product_count + sum(child.total_product_count for child in children)
         )
 
-    tree_response = []
-    for cat in tree:
-        tree_response.append(await convert_to_response(cat))
-
-    return CategoryTreeResponse(
-        categories=tree_response,
+    tree_response = CategoryTreeResponse(
+        categories=[convert_to_response(cat) for cat in tree],
         total_count=len(categories)
     )
 
+    category_tree_cache.set(cache_key, tree_response)
+
+    return tree_response
+
 
 @router.get("/{category_id}", response_model=CategoryWithChildren)
 async def get_category(
@@ -231,21 +275,25 @@ async def get_category(
     result = await db.execute(
         select(Category)
         .where(Category.parent_id == category_id)
-        .order_by(Category.display_order, Category.name)
+        .order_by(Category.name)
     )
     children = result.scalars().all()
 
-    # Compter les produits
-    product_count = await get_category_product_count(category_id, db)
+    # Compter les produits de la catégorie et de ses enfants en une requête
+    product_counts = await get_category_product_counts(
+        db,
+        current_user.store_id,
+        [category_id] + [child.id for child in children]
+    )
+    product_count = product_counts.get(category_id, 0)
 
     # Construire la réponse
     children_response = []
     for child in children:
-        child_product_count = await get_category_product_count(child.id, db)
         children_response.append(
             CategoryWithChildren(
                 **child.__dict__,
-                product_count=child_product_count,
+                product_count=product_counts.get(child.id, 0),
                 children=[]
             )
         )
@@ -302,6 +350,7 @@ async def update_category(
 
     await db.commit()
     await db.refresh(category)
+    invalidate_category_tree(current_user.store_id)
 
     return category
 
@@ -354,6 +403,7 @@ async def delete_category(
     # Supprimer la catégorie
     await db.delete(category)
     await db.commit()
+    invalidate_category_tree(current_user.store_id)
 
     return None
 
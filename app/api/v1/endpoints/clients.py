@@ -1,26 +1,41 @@
 """
 Endpoints pour la gestion des clients
 """
+import re
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
+from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_, delete, desc
+from sqlalchemy import select, func, or_, and_, delete, cast, Date, case
 from sqlalchemy.orm import selectinload
+from starlette.concurrency import run_in_threadpool
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.security import get_current_user
+from app.core.pagination import (
+    CountMode,
+    apply_keyset,
+    count_total,
+    next_cursor,
+    total_pages
+)
+from app.core.prefix_index import PrefixIndex, normalize_key
 from app.models.user import User
-from app.models.client import Client
+from app.models.client import Client, ClientPurchaseStats
 from app.models.order import Order
 from app.models.transaction import Transaction
+from app.api.v1.endpoints.products import escape_like
 from app.schemas.client import (
     ClientCreate,
     ClientUpdate,
     ClientResponse,
     ClientWithStats,
     ClientListResponse,
+    ClientSearchResult,
     ClientStats,
     LoyaltyPointsAdjustment,
     DebtPayment
@@ -28,6 +43,12 @@ from app.schemas.client import (
 
 router = APIRouter(prefix="/clients", tags=["Clients"])
 
+# Index de préfixes des clients actifs par magasin : {store_id: PrefixIndex}
+client_index_cache = TTLCache(maxsize=256, ttl=settings.CLIENT_SEARCH_INDEX_TTL)
+
+# Terme ne contenant qu'un numéro de téléphone (chiffres et séparateurs)
+PHONE_TERM = re.compile(r"[\d\s+().-]+")
+
 
 # ========== HELPER FUNCTIONS ==========
 
@@ -70,42 +91,233 @@ async def check_phone_uniqueness(
 
 
 async def get_client_stats(client_id: UUID, db: AsyncSession) -> dict:
-    """Calcule les statistiques d'un client"""
-    # Nombre total de commandes
+    """
+    Statistiques d'achat d'un client
+
+    Lues sur la ligne client_stats tenue à jour par trigger sur orders : une
+    seule lecture, quel que soit l'historique du client. Les compteurs du mois
+    ne valent que si la ligne concerne le mois en cours (heure du magasin).
+    """
+    current_month = cast(
+        func.date_trunc(
+            "month",
+            func.store_local_time(ClientPurchaseStats.store_id, func.timezone("UTC", func.now()))
+        ),
+        Date
+    )
     result = await db.execute(
-        select(func.count(Order.id))
-        .where(Order.client_id == client_id)
+        select(
+            ClientPurchaseStats,
+            (ClientPurchaseStats.month_start == current_month).label("is_current_month")
+        )
+        .where(ClientPurchaseStats.client_id == client_id)
     )
-    total_orders = result.scalar() or 0
+    row = result.one_or_none()
+
+    if row is None:
+        return {
+            'total_orders': 0,
+            'total_spent': 0.0,
+            'average_order_value': 0.0,
+            'last_purchase_date': None,
+            'orders_this_month': 0,
+            'spent_this_month': 0.0
+        }
+
+    stats, is_current_month = row
+    total_orders = stats.orders_count
+    total_spent = float(stats.total_spent)
+
+    return {
+        'total_orders': total_orders,
+        'total_spent': total_spent,
+        'average_order_value': total_spent / total_orders if total_orders > 0 else 0.0,
+        'last_purchase_date': stats.last_purchase_at,
+        'orders_this_month': stats.month_orders_count if is_current_month else 0,
+        'spent_this_month': float(stats.month_spent) if is_current_month else 0.0
+    }
+
+
+# ========== RECHERCHE (AUTOCOMPLETE) ==========
+
+def phone_term_digits(term: str) -> Optional[str]:
+    """Chiffres d'un terme saisi comme un téléphone ("77 123-45" -> "7712345"), sinon None"""
+    if not PHONE_TERM.fullmatch(term):
+        return None
+    digits = re.sub(r"\D", "", term)
+    return digits or None
+
+
+def to_client_search_result(client: Client, score: float, match_type: str) -> ClientSearchResult:
+    """Construit un résultat de recherche à partir d'un client"""
+    return ClientSearchResult(
+        id=client.id,
+        code=client.code,
+        full_name=client.full_name,
+        phone=client.phone,
+        is_active=client.is_active,
+        score=score,
+        match_type=match_type
+    )
+
 
-    # Montant total dépensé
+def client_index_entry(client) -> tuple:
+    """
+    (id, clés, valeur) d'un client : son code, son téléphone et chaque mot de son nom
+
+    Accepte un objet Client ou une ligne portant les mêmes colonnes.
+    """
+    keys = [normalize_key(client.code), client.phone_digits]
+    for name in (client.first_name, client.last_name, client.company_name):
+        keys.extend(normalize_key(word) for word in (name or "").split())
+    full_name = Client.full_name.fget(client)
+    return client.id, keys, (client.id, client.code, full_name, client.phone)
+
+
+def index_client(index: PrefixIndex, client: Client) -> None:
+    """Indexe un client actif, ou le retire de l'index s'il est désactivé"""
+    if not client.is_active:
+        index.remove(client.id)
+        return
+    index.add(*client_index_entry(client))
+
+
+def build_client_index(clients: list) -> PrefixIndex:
+    """Construit l'index de préfixes en un seul tri (appelé hors de la boucle d'événements)"""
+    return PrefixIndex.build(client_index_entry(client) for client in clients)
+
+
+async def load_client_index(db: AsyncSession, store_id: UUID) -> PrefixIndex:
+    """
+    Charge l'index de préfixes des clients actifs d'un magasin et le met en cache
+
+    La construction (normalisation et tri de toutes les clés) s'exécute dans
+    le pool de threads pour ne pas bloquer les autres requêtes à chaque
+    expiration du cache.
+    """
+    # Colonnes brutes plutôt qu'objets ORM : le chargement reste linéaire et léger
     result = await db.execute(
-        select(func.sum(Order.total_amount))
-        .where(
-            Order.client_id == client_id,
-            Order.statut_paiement.in_(['Payer', 'Partiellement'])
+        select(
+            Client.id, Client.code, Client.first_name, Client.last_name, Client.company_name,
+            Client.client_type, Client.phone, Client.phone_digits
         )
+        .where(Client.store_id == store_id, Client.is_active == True)
+    )
+    index = await run_in_threadpool(build_client_index, result.all())
+
+    client_index_cache.set(store_id, index)
+    return index
+
+
+def refresh_indexed_client(client: Client) -> None:
+    """
+    Répercute une création, modification ou désactivation sur l'index du magasin
+
+    Chaque processus tient son propre index : les autres le relisent à
+    l'expiration de CLIENT_SEARCH_INDEX_TTL.
+    """
+    index = client_index_cache.get(client.store_id)
+    if index is not None:
+        index_client(index, client)
+
+
+def search_client_index(index: PrefixIndex, term: str, limit: int) -> List[ClientSearchResult]:
+    """Recherche par préfixe dans l'index mémoire, sans requête en base"""
+    digits = phone_term_digits(term)
+    key = digits or normalize_key(term)
+
+    results = []
+    for matched_key, (client_id, code, full_name, phone) in index.search(key, limit):
+        if matched_key == normalize_key(code):
+            match_type = "code"
+        elif digits and matched_key.isdigit():
+            match_type = "phone"
+        else:
+            match_type = "name"
+        results.append(ClientSearchResult(
+            id=client_id,
+            code=code,
+            full_name=full_name,
+            phone=phone,
+            score=round(len(key) / len(matched_key), 4),
+            match_type=match_type
+        ))
+
+    results.sort(key=lambda result: (-result.score, result.full_name))
+    return results
+
+
+async def search_clients(
+    db: AsyncSession,
+    store_id: UUID,
+    term: str,
+    limit: int,
+    include_inactive: bool = False
+) -> List[ClientSearchResult]:
+    """
+    Recherche classée de clients en base
+
+    - Code client exact (index btree)
+    - Terme numérique : préfixe du téléphone normalisé en chiffres
+      (index idx_clients_store_phone_digits), dans l'ordre des numéros
+    - Sinon, similarité trigramme sur prénom et nom (tolère les fautes de
+      frappe) avec bonus pour les préfixes (index GIN pg_trgm)
+    """
+    base_filters = [Client.store_id == store_id]
+    if not include_inactive:
+        base_filters.append(Client.is_active == True)
+
+    result = await db.execute(
+        select(Client).where(*base_filters, Client.code.in_({term, term.upper()})).limit(limit)
     )
-    total_spent = result.scalar() or 0.0
+    exact_matches = result.scalars().all()
+    if exact_matches:
+        return [to_client_search_result(client, 1.0, "code") for client in exact_matches]
 
-    # Panier moyen
-    average_order_value = total_spent / total_orders if total_orders > 0 else 0.0
+    digits = phone_term_digits(term)
+    if digits:
+        result = await db.execute(
+            select(Client)
+            .where(*base_filters, Client.phone_digits.like(f"{digits}%"))
+            .order_by(Client.phone_digits)
+            .limit(limit)
+        )
+        return [
+            to_client_search_result(client, round(len(digits) / len(client.phone_digits), 4), "phone")
+            for client in result.scalars().all()
+        ]
+
+    prefix = f"{escape_like(term)}%"
+    name_prefix = or_(
+        Client.first_name.ilike(prefix, escape="\\"),
+        Client.last_name.ilike(prefix, escape="\\")
+    )
+    score = (
+        func.greatest(
+            func.similarity(Client.first_name, term),
+            func.similarity(Client.last_name, term)
+        )
+        + case((name_prefix, 0.5), else_=0.0)
+    ).label("score")
 
-    # Date du dernier achat
     result = await db.execute(
-        select(Order.created_at)
-        .where(Order.client_id == client_id)
-        .order_by(desc(Order.created_at))
-        .limit(1)
+        select(Client, score)
+        .where(
+            *base_filters,
+            or_(
+                Client.first_name.op("%")(term),
+                Client.last_name.op("%")(term),
+                name_prefix
+            )
+        )
+        .order_by(score.desc(), Client.last_name, Client.first_name)
+        .limit(limit)
     )
-    last_purchase = result.scalar_one_or_none()
 
-    return {
-        'total_orders': total_orders,
-        'total_spent': float(total_spent),
-        'average_order_value': float(average_order_value),
-        'last_purchase_date': last_purchase
-    }
+    return [
+        to_client_search_result(client, round(float(row_score), 4), "name")
+        for client, row_score in result.all()
+    ]
 
 
 # ========== ENDPOINTS CRUD ==========
@@ -153,6 +365,7 @@ async def create_client(
     db.add(new_client)
     await db.commit()
     await db.refresh(new_client)
+    refresh_indexed_client(new_client)
 
     return new_client
 
@@ -161,6 +374,8 @@ async def create_client(
 async def list_clients(
     page: int = Query(1, ge=1, description="Numéro de page"),
     page_size: int = Query(50, ge=1, le=100, description="Taille de la page"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (remplace page)"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="Calcul du total: exact, estimated, none"),
     search: Optional[str] = Query(None, description="Recherche dans nom, prénom, email, téléphone, code"),
     loyalty_tier: Optional[str] = Query(None, description="Filtrer par niveau de fidélité"),
     has_debt: Optional[bool] = Query(None, description="Filtrer clients avec dette"),
@@ -174,6 +389,9 @@ async def list_clients(
 ):
     """
     Lister les clients avec pagination et filtres
+
+    Pour le défilement infini, utiliser `cursor` (temps constant quelle que
+    soit la profondeur) et `count_mode=none`.
     """
     # Construction de la requête
     query = select(Client).where(Client.store_id == current_user.store_id)
@@ -186,7 +404,7 @@ async def list_clients(
                 Client.last_name.ilike(f"%{search}%"),
                 Client.email.ilike(f"%{search}%"),
                 Client.phone.ilike(f"%{search}%"),
-                Client.client_code.ilike(f"%{search}%")
+                Client.code.ilike(f"%{search}%")
             )
         )
 
@@ -196,9 +414,9 @@ async def list_clients(
 
     if has_debt is not None:
         if has_debt:
-            query = query.where(Client.total_debt > 0)
+            query = query.where(Client.current_debt > 0)
         else:
-            query = query.where(Client.total_debt == 0)
+            query = query.where(Client.current_debt == 0)
 
     if is_active is not None:
         query = query.where(Client.is_active == is_active)
@@ -210,66 +428,89 @@ async def list_clients(
         query = query.where(Client.loyalty_points >= min_loyalty_points)
 
     # Compter le total
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-
-    # Tri
-    sort_column = {
-        "name": Client.last_name,
-        "points": Client.loyalty_points,
-        "debt": Client.total_debt,
-        "last_purchase": Client.last_purchase_date,
-        "created_at": Client.created_at
-    }.get(sort_by, Client.created_at)
-
-    if sort_order == "asc":
-        query = query.order_by(sort_column.asc())
-    else:
-        query = query.order_by(sort_column.desc())
-
-    # Pagination
-    query = query.offset((page - 1) * page_size).limit(page_size)
+    total = await count_total(db, query, count_mode)
+
+    # Date du dernier achat lue sur client_stats (jamais NULL pour le curseur)
+    if sort_by == "last_purchase":
+        query = query.outerjoin(ClientPurchaseStats, ClientPurchaseStats.client_id == Client.id)
+
+    # Tri (clé non nulle et type de la valeur dans le curseur)
+    sort_column, key_type = {
+        "name": (func.coalesce(Client.last_name, ""), str),
+        "points": (func.coalesce(Client.loyalty_points, 0), int),
+        "debt": (func.coalesce(Client.current_debt, 0), Decimal),
+        "last_purchase": (
+            func.coalesce(ClientPurchaseStats.last_purchase_at, datetime(1970, 1, 1)),
+            datetime.fromisoformat
+        ),
+        "created_at": (Client.created_at, datetime.fromisoformat)
+    }.get(sort_by, (Client.created_at, datetime.fromisoformat))
+
+    query = query.add_columns(sort_column.label("sort_key"))
+
+    # Tri et pagination (curseur ou numéro de page)
+    query = apply_keyset(
+        query,
+        sort_column,
+        Client.id,
+        cursor,
+        key_type,
+        page_size,
+        descending=sort_order != "asc"
+    )
+    if not cursor:
+        query = query.offset((page - 1) * page_size)
 
     # Exécution
     result = await db.execute(query)
-    clients = result.scalars().all()
+    rows, cursor_after = next_cursor(
+        result.all(),
+        page_size,
+        lambda row: (row.sort_key, row[0].id)
+    )
+    clients = [row[0] for row in rows]
 
     return ClientListResponse(
         items=clients,
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
+        total_pages=total_pages(total, page_size),
+        next_cursor=cursor_after
     )
 
 
-@router.get("/search", response_model=List[ClientResponse])
+@router.get("/search", response_model=List[ClientSearchResult])
 async def search_clients_quick(
-    q: str = Query(..., min_length=2, description="Terme de recherche (min 2 caractères)"),
+    q: str = Query(..., min_length=2, max_length=100, description="Terme de recherche (min 2 caractères)"),
     limit: int = Query(10, ge=1, le=50, description="Nombre de résultats maximum"),
+    include_inactive: bool = Query(False, description="Inclure les clients inactifs"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Recherche rapide de clients (pour autocomplete)
+    Recherche rapide de clients (autocomplete)
 
-    Cherche dans: nom, prénom, téléphone, code client
+    Cherche par code client, début du téléphone (séparateurs ignorés),
+    prénom ou nom. Avec CLIENT_SEARCH_INDEX, les clients actifs sont servis
+    depuis l'index de préfixes en mémoire du magasin ; sans résultat (faute
+    de frappe), la recherche trigramme en base prend le relais.
     """
-    query = select(Client).where(
-        Client.store_id == current_user.store_id,
-        or_(
-            Client.first_name.ilike(f"%{q}%"),
-            Client.last_name.ilike(f"%{q}%"),
-            Client.phone.ilike(f"%{q}%"),
-            Client.client_code.ilike(f"%{q}%")
-        )
-    ).limit(limit)
+    term = q.strip()
+    if not term:
+        return []
 
-    result = await db.execute(query)
-    clients = result.scalars().all()
+    store_id = current_user.store_id
+
+    if settings.CLIENT_SEARCH_INDEX and not include_inactive:
+        index = client_index_cache.get(store_id)
+        if index is None:
+            index = await load_client_index(db, store_id)
+        results = search_client_index(index, term, limit)
+        if results:
+            return results
 
-    return clients
+    return await search_clients(db, store_id, term, limit, include_inactive)
 
 
 @router.get("/{client_id}", response_model=ClientWithStats)
@@ -336,6 +577,7 @@ async def update_client(
 
     await db.commit()
     await db.refresh(client)
+    refresh_indexed_client(client)
 
     return client
 
@@ -371,6 +613,10 @@ async def delete_client(
     await db.delete(client)
     await db.commit()
 
+    index = client_index_cache.get(current_user.store_id)
+    if index is not None:
+        index.remove(client_id)
+
     return None
 
 
@@ -523,34 +769,9 @@ async def get_client_statistics(
     """
     client = await get_client_by_id(client_id, db, current_user.store_id)
 
-    # Statistiques globales
+    # Statistiques globales et du mois en cours
     stats = await get_client_stats(client_id, db)
 
-    # Statistiques du mois en cours
-    from datetime import datetime
-    start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    # Commandes ce mois-ci
-    result = await db.execute(
-        select(func.count(Order.id))
-        .where(
-            Order.client_id == client_id,
-            Order.created_at >= start_of_month
-        )
-    )
-    orders_this_month = result.scalar() or 0
-
-    # Montant dépensé ce mois-ci
-    result = await db.execute(
-        select(func.sum(Order.total_amount))
-        .where(
-            Order.client_id == client_id,
-            Order.created_at >= start_of_month,
-            Order.statut_paiement.in_(['Payer', 'Partiellement'])
-        )
-    )
-    spent_this_month = result.scalar() or 0.0
-
     return ClientStats(
         client_id=client.id,
         client_name=f"{client.first_name} {client.last_name}",
@@ -561,8 +782,8 @@ async def get_client_statistics(
         loyalty_tier=client.loyalty_tier,
         average_order_value=stats['average_order_value'],
         last_purchase_date=stats['last_purchase_date'],
-        orders_this_month=orders_this_month,
-        spent_this_month=float(spent_this_month)
+        orders_this_month=stats['orders_this_month'],
+        spent_this_month=stats['spent_this_month']
     )
 
 
@@ -582,5 +803,6 @@ async def toggle_client_active(
     client.is_active = not client.is_active
     await db.commit()
     await db.refresh(client)
+    refresh_indexed_client(client)
 
     return client
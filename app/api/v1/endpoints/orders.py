@@ -0,0 +1,494 @@
+"""
+Endpoints pour les commandes (encaissement en caisse)
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Tuple
+from uuid import UUID, uuid4
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert
+
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.models.user import User
+from app.models.client import Client
+from app.models.product import Product, ProductVariant
+from app.models.order import Order, OrderItem
+from app.models.stock import StockMovement
+from app.models.transaction import PaymentMethod, Transaction
+from app.models.cash_register import CashRegisterSession
+from app.api.v1.endpoints.products import invalidate_barcode_product, invalidate_stock_summary
+from app.api.v1.endpoints.stock import apply_stock_deltas
+from app.schemas.stock import MovementType
+from app.schemas.order import (
+    CheckoutCreate,
+    CheckoutItem,
+    OrderResponse,
+    OrderItemResponse
+)
+
+router = APIRouter(prefix="/orders", tags=["Orders"])
+
+CENT = Decimal("0.01")
+QUANTITY_STEP = Decimal("0.001")
+
+# Colonnes de order_items (la table n'a pas de updated_at)
+ORDER_ITEM_COLUMNS = (
+    OrderItem.id,
+    OrderItem.product_id,
+    OrderItem.variant_id,
+    OrderItem.product_name,
+    OrderItem.variant_name,
+    OrderItem.sku,
+    OrderItem.quantity,
+    OrderItem.unit,
+    OrderItem.unit_price,
+    OrderItem.discount_amount,
+    OrderItem.tax_rate,
+    OrderItem.tax_amount,
+    OrderItem.total_price
+)
+
+
+# ========== HELPER FUNCTIONS ==========
+
+def round_amount(value: Decimal) -> Decimal:
+    """Arrondi monétaire au centime"""
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+async def lock_cart_products(
+    db: AsyncSession,
+    store_id: UUID,
+    items: List[CheckoutItem]
+) -> Tuple[dict, dict]:
+    """
+    Charge et verrouille les produits et variantes du panier
+
+    Les lignes sont verrouillées (FOR UPDATE) par ordre d'id, comme pour les
+    mouvements groupés, pour que deux caisses vendant les mêmes articles ne
+    s'interbloquent pas.
+    """
+    product_ids = sorted({item.product_id for item in items})
+    result = await db.execute(
+        select(
+            Product.id,
+            Product.name,
+            Product.sku,
+            Product.selling_price,
+            Product.tax_rate,
+            Product.is_active,
+            Product.track_stock,
+            Product.has_multiple_units,
+            Product.units_per_primary,
+            Product.stock_quantity_primary,
+            Product.stock_quantity_secondary
+        )
+        .where(Product.store_id == store_id, Product.id.in_(product_ids))
+        .order_by(Product.id)
+        .with_for_update()
+    )
+    products = {row.id: row for row in result.all()}
+
+    variants = {}
+    variant_ids = sorted({item.variant_id for item in items if item.variant_id})
+    if variant_ids:
+        result = await db.execute(
+            select(
+                ProductVariant.id,
+                ProductVariant.product_id,
+                ProductVariant.variant_name,
+                ProductVariant.sku,
+                ProductVariant.selling_price,
+                ProductVariant.is_active,
+                ProductVariant.stock_quantity
+            )
+            .where(ProductVariant.id.in_(variant_ids))
+            .order_by(ProductVariant.id)
+            .with_for_update()
+        )
+        variants = {row.id: row for row in result.all()}
+
+    return products, variants
+
+
+def price_cart(
+    order_id: UUID,
+    store_id: UUID,
+    user_id: UUID,
+    items: List[CheckoutItem],
+    products: dict,
+    variants: dict
+) -> Tuple[List[dict], List[dict], Dict[UUID, List[Decimal]], Dict[UUID, Decimal]]:
+    """
+    Calcule les lignes de la commande et les variations de stock
+
+    Les prix sont HT : la TVA de chaque ligne est calculée à partir de
+    Product.tax_rate sur le montant remisé. Pour un produit multi-unités, le
+    stock est suivi en unité secondaire et l'unité primaire en est déduite
+    (même conversion que le trigger deduct_stock_on_order).
+
+    Retourne (lignes order_items, mouvements de stock, variations produits,
+    variations variantes).
+    """
+    item_rows = []
+    movement_rows = []
+    # Solde courant par (type, id) pour les paniers contenant plusieurs fois le même article
+    balances: Dict[Tuple[str, UUID], Decimal] = {}
+
+    for item in items:
+        product = products.get(item.product_id)
+        if product is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Produit non trouvé: {item.product_id}"
+            )
+        if not product.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Produit inactif: {product.name}"
+            )
+
+        quantity = Decimal(str(item.quantity))
+        units_per_primary = Decimal(product.units_per_primary or 1)
+        variant = None
+
+        if item.variant_id:
+            variant = variants.get(item.variant_id)
+            if variant is None or variant.product_id != product.id or not variant.is_active:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Variante non trouvée: {item.variant_id}"
+                )
+            if item.unit != "primary":
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Les variantes se vendent uniquement en unité primaire"
+                )
+            unit_price = variant.selling_price or product.selling_price
+        elif item.unit == "secondary":
+            if not product.has_multiple_units:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Le produit {product.name} n'a pas d'unité secondaire"
+                )
+            unit_price = round_amount(product.selling_price / units_per_primary)
+        else:
+            unit_price = product.selling_price
+
+        gross = unit_price * quantity
+        if item.discount_amount > gross:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Remise supérieure au montant de la ligne pour {product.name}"
+            )
+        net = round_amount(gross - item.discount_amount)
+        tax_rate = product.tax_rate or Decimal("0")
+        tax_amount = round_amount(net * tax_rate / 100)
+
+        item_rows.append({
+            "id": uuid4(),
+            "order_id": order_id,
+            "product_id": product.id,
+            "variant_id": item.variant_id,
+            "product_name": product.name,
+            "variant_name": variant.variant_name if variant else None,
+            "sku": variant.sku if variant else product.sku,
+            "quantity": quantity,
+            "unit": item.unit,
+            "unit_price": unit_price,
+            "discount_amount": item.discount_amount,
+            "tax_rate": tax_rate,
+            "tax_amount": tax_amount,
+            "total_price": net + tax_amount
+        })
+
+        if not product.track_stock:
+            continue
+
+        # Décrément du stock dans l'unité de suivi
+        if variant:
+            key = ("variant", variant.id)
+            initial = variant.stock_quantity
+            decrement = quantity
+        elif product.has_multiple_units:
+            key = ("units", product.id)
+            initial = product.stock_quantity_secondary
+            decrement = quantity if item.unit == "secondary" else quantity * units_per_primary
+        else:
+            key = ("primary", product.id)
+            initial = product.stock_quantity_primary
+            decrement = quantity
+
+        stock_before = balances.get(key, initial or Decimal("0"))
+        if stock_before < decrement:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Stock insuffisant pour {product.name}. "
+                       f"Stock actuel: {stock_before}, demandé: {decrement}"
+            )
+        balances[key] = stock_before - decrement
+
+        movement_rows.append({
+            "id": uuid4(),
+            "store_id": store_id,
+            "product_id": product.id,
+            "variant_id": item.variant_id,
+            "performed_by": user_id,
+            "movement_type": MovementType.SALE.value,
+            "quantity": quantity,
+            "unit": item.unit,
+            "reference_type": "order",
+            "reference_id": order_id
+        })
+
+    # Variations nettes par produit et par variante
+    product_deltas: Dict[UUID, List[Decimal]] = {}
+    variant_deltas: Dict[UUID, Decimal] = {}
+    for (kind, target_id), stock_after in balances.items():
+        if kind == "variant":
+            variant_deltas[target_id] = stock_after - (variants[target_id].stock_quantity or 0)
+            continue
+
+        product = products[target_id]
+        primary_before = product.stock_quantity_primary or Decimal("0")
+        if kind == "units":
+            secondary_before = product.stock_quantity_secondary or Decimal("0")
+            primary_after = (stock_after / Decimal(product.units_per_primary or 1)).quantize(QUANTITY_STEP)
+            product_deltas[target_id] = [primary_after - primary_before, stock_after - secondary_before]
+        else:
+            product_deltas[target_id] = [stock_after - primary_before, Decimal("0")]
+
+    return item_rows, movement_rows, product_deltas, variant_deltas
+
+
+async def get_client_snapshot(db: AsyncSession, store_id: UUID, client_id: UUID) -> Tuple[str, str]:
+    """Nom et téléphone du client, copiés sur la commande"""
+    result = await db.execute(
+        select(Client.first_name, Client.last_name, Client.company_name, Client.phone)
+        .where(Client.id == client_id, Client.store_id == store_id)
+    )
+    client = result.one_or_none()
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Client non trouvé"
+        )
+
+    name = " ".join(part for part in (client.first_name, client.last_name) if part)
+    return name or client.company_name, client.phone
+
+
+async def check_payment_methods(db: AsyncSession, store_id: UUID, method_ids: List[UUID]) -> None:
+    """Vérifie que les méthodes de paiement existent et sont actives"""
+    result = await db.execute(
+        select(PaymentMethod.id).where(
+            PaymentMethod.id.in_(method_ids),
+            PaymentMethod.store_id == store_id,
+            PaymentMethod.is_active == True
+        )
+    )
+    found = set(result.scalars().all())
+    missing = [str(method_id) for method_id in method_ids if method_id not in found]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Méthodes de paiement invalides: {', '.join(missing)}"
+        )
+
+
+async def check_open_session(db: AsyncSession, store_id: UUID, session_id: UUID) -> None:
+    """
+    Vérifie que la session de caisse est ouverte
+
+    La session est verrouillée en partage jusqu'à la fin de l'encaissement :
+    une clôture concurrente attend, et ne peut pas manquer cette vente.
+    """
+    result = await db.execute(
+        select(CashRegisterSession.id)
+        .where(
+            CashRegisterSession.id == session_id,
+            CashRegisterSession.store_id == store_id,
+            CashRegisterSession.status == "open"
+        )
+        .with_for_update(read=True)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Session de caisse introuvable ou fermée"
+        )
+
+
+# ========== ENDPOINTS ==========
+
+@router.post("/checkout", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
+async def checkout(
+    order_data: CheckoutCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Encaisser un panier
+
+    Calcule les prix (HT + TVA du produit), enregistre la commande, ses lignes
+    et ses paiements, et décrémente le stock dans une seule transaction.
+    Le nombre de requêtes ne dépend pas du nombre de lignes : les lignes de
+    commande sont insérées en un seul INSERT multi-lignes et le stock mis à
+    jour en un UPDATE par table. Les paiements sont insérés un par un : les
+    triggers de transactions font passer la commande de "Non Payer" à son
+    statut final (points de fidélité, dette client).
+
+    - **payments**: vide pour une vente à crédit, plusieurs pour un paiement mixte
+    - Retourne le ticket de caisse (numéro de commande, lignes, totaux)
+    """
+    store_id = current_user.store_id
+    order_id = uuid4()
+
+    products, variants = await lock_cart_products(db, store_id, order_data.items)
+    item_rows, movement_rows, product_deltas, variant_deltas = price_cart(
+        order_id,
+        store_id,
+        current_user.id,
+        order_data.items,
+        products,
+        variants
+    )
+
+    client_name, client_phone = order_data.client_name, order_data.client_phone
+    if order_data.client_id:
+        snapshot_name, snapshot_phone = await get_client_snapshot(db, store_id, order_data.client_id)
+        client_name = client_name or snapshot_name
+        client_phone = client_phone or snapshot_phone
+
+    if order_data.cash_register_session_id:
+        await check_open_session(db, store_id, order_data.cash_register_session_id)
+
+    if order_data.payments:
+        await check_payment_methods(
+            db,
+            store_id,
+            sorted({payment.payment_method_id for payment in order_data.payments})
+        )
+
+    # Totaux
+    subtotal = sum((row["total_price"] - row["tax_amount"] for row in item_rows), Decimal("0"))
+    discount_amount = sum((row["discount_amount"] for row in item_rows), Decimal("0"))
+    tax_amount = sum((row["tax_amount"] for row in item_rows), Decimal("0"))
+    total_amount = subtotal + tax_amount
+    paid = sum((payment.amount for payment in order_data.payments), Decimal("0"))
+
+    if paid > total_amount:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Montant payé ({paid}) supérieur au total ({total_amount})"
+        )
+
+    order_row = {
+        "id": order_id,
+        "store_id": store_id,
+        "client_id": order_data.client_id,
+        "client_name": client_name,
+        "client_phone": client_phone,
+        "created_by": current_user.id,
+        "cash_register_session_id": order_data.cash_register_session_id,
+        "order_number": "",  # attribué par le trigger generate_order_number
+        "order_type": order_data.order_type,
+        "order_source": "pos",
+        "subtotal": subtotal,
+        "discount_amount": discount_amount,
+        "tax_amount": tax_amount,
+        "total_amount": total_amount,
+        # Statut initial : update_order_payment_status le fait évoluer à chaque
+        # paiement, award_loyalty_points attend le passage à "Payer"
+        "montant_paye": Decimal("0"),
+        "montant_restant": total_amount,
+        "statut_paiement": "Non Payer",
+        "status": "completed",
+        "notes": order_data.notes
+    }
+
+    # La commande est insérée avant ses lignes : le trigger deduct_stock_on_order
+    # ne trouve aucune ligne et le stock n'est décrémenté qu'une fois, ci-dessous.
+    result = await db.execute(
+        insert(Order.__table__)
+        .values(order_row)
+        .returning(Order.__table__.c.order_number, Order.__table__.c.created_at)
+    )
+    order_number, created_at = result.one()
+
+    await db.execute(insert(OrderItem.__table__).values(item_rows))
+    await apply_stock_deltas(db, product_deltas, variant_deltas)
+    if movement_rows:
+        await db.execute(insert(StockMovement.__table__), movement_rows)
+
+    # Un INSERT par paiement : dans un INSERT multi-lignes, les triggers de
+    # chaque ligne verraient la commande déjà soldée par les lignes suivantes
+    # (manage_client_debt déduirait alors le paiement de la dette existante)
+    for payment in order_data.payments:
+        await db.execute(
+            insert(Transaction.__table__).values(
+                id=uuid4(),
+                store_id=store_id,
+                order_id=order_id,
+                client_id=order_data.client_id,
+                payment_method_id=payment.payment_method_id,
+                processed_by=current_user.id,
+                cash_register_session_id=order_data.cash_register_session_id,
+                transaction_type="sale",
+                amount=payment.amount,
+                reference=payment.reference,
+                status="completed"
+            )
+        )
+
+    # Statut de paiement final, tel que calculé par les triggers
+    result = await db.execute(
+        select(Order.montant_paye, Order.montant_restant, Order.statut_paiement).where(Order.id == order_id)
+    )
+    payment_state = result.one()._asdict()
+
+    await db.commit()
+
+    if movement_rows:
+        invalidate_stock_summary(store_id)
+        for product_id in {row["product_id"] for row in movement_rows}:
+            invalidate_barcode_product(store_id, product_id)
+
+    return OrderResponse(
+        **order_row | payment_state | {"order_number": order_number, "created_at": created_at},
+        items=[OrderItemResponse(**row) for row in item_rows]
+    )
+
+
+@router.get("/{order_id}", response_model=OrderResponse)
+async def get_order(
+    order_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Récupérer une commande et ses lignes (réimpression du ticket)"""
+    result = await db.execute(
+        select(Order).where(
+            Order.id == order_id,
+            Order.store_id == current_user.store_id
+        )
+    )
+    order = result.scalar_one_or_none()
+
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Commande non trouvée"
+        )
+
+    result = await db.execute(
+        select(*ORDER_ITEM_COLUMNS)
+        .where(OrderItem.order_id == order_id)
+        .order_by(OrderItem.created_at, OrderItem.id)
+    )
+
+    return OrderResponse(
+        **order.dict(),
+        items=[OrderItemResponse.model_validate(row) for row in result.all()]
+    )
@@ -1,24 +1,52 @@
 """
 Endpoints pour la gestion des produits
 """
-from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterator, List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_, delete, update
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import (
+    select, func, or_, and_, delete, update, case, literal, literal_column, union_all,
+    Column, Integer, MetaData, Table
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import selectinload
-
-from app.core.database import get_db
+from sqlalchemy.schema import CreateTable
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db, get_session_factory
+from app.core.export import ExportFormat, export_response
+from app.core.logs import logger
 from app.core.security import get_current_user
+from app.core.pagination import (
+    CountMode,
+    apply_keyset,
+    count_total,
+    next_cursor,
+    total_pages
+)
+from app.core.tabular import TabularRow, iter_tabular_rows, take
 from app.models.user import User
 from app.models.product import Product, ProductVariant
 from app.models.category import Category
+from app.models.store import Store
+from app.api.v1.endpoints.categories import invalidate_category_tree
 from app.schemas.product import (
     ProductCreate,
     ProductUpdate,
     ProductResponse,
     ProductWithRelations,
     ProductListResponse,
+    ProductSearchResult,
+    ProductImportRow,
+    ProductImportError,
+    ProductImportResponse,
+    BarcodeLookupResponse,
     ProductFilter,
     ProductVariantCreate,
     ProductVariantUpdate,
@@ -27,6 +55,35 @@ from app.schemas.product import (
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
+# Index des codes-barres par magasin : {store_id: {barcode: BarcodeLookupResponse}}
+# Les modifications faites par les autres processus arrivent sur ce canal
+# (trigger notify_barcode_change, voir on_barcode_notification)
+BARCODE_CHANNEL = "barcode_cache"
+barcode_cache = TTLCache(maxsize=256, ttl=settings.BARCODE_CACHE_TTL)
+
+# Cache court du résumé de stock (/stock/summary), clé: store_id
+# Défini ici : les écritures de produits comme les mouvements de stock l'invalident
+stock_summary_cache = TTLCache(maxsize=1024, ttl=settings.STOCK_SUMMARY_CACHE_TTL)
+
+# Colonnes de produit renseignées par l'import (ordre du COPY)
+IMPORT_FIELDS = (
+    "sku", "name", "description", "barcode", "category_id", "product_type",
+    "purchase_price", "selling_price", "wholesale_price", "tax_rate", "primary_unit",
+    "stock_quantity_primary", "stock_alert_threshold", "track_stock", "brand", "supplier_reference"
+)
+# Le stock d'un produit existant ne change que par des mouvements de stock
+IMPORT_UPDATE_FIELDS = tuple(name for name in IMPORT_FIELDS if name not in ("sku", "stock_quantity_primary"))
+
+# Table de travail de l'import, propre à la transaction (supprimée au COMMIT)
+product_import_staging = Table(
+    "product_import_staging",
+    MetaData(),
+    Column("row_number", Integer),
+    *(Column(name, Product.__table__.c[name].type) for name in IMPORT_FIELDS),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP"
+)
+
 
 # ========== HELPER FUNCTIONS ==========
 
@@ -97,6 +154,370 @@ def calculate_stock_status(product: Product) -> str:
         return "in_stock"
 
 
+def escape_like(value: str) -> str:
+    """Échappe les caractères spéciaux de LIKE (%, _ et \\)"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def to_search_result(product: Product, score: float, match_type: str) -> ProductSearchResult:
+    """Construit un résultat de recherche à partir d'un produit"""
+    return ProductSearchResult(
+        id=product.id,
+        name=product.name,
+        sku=product.sku,
+        barcode=product.barcode,
+        category_id=product.category_id,
+        selling_price=product.selling_price,
+        stock_quantity_primary=product.stock_quantity_primary or 0,
+        primary_unit=product.primary_unit,
+        has_variants=bool(product.has_variants),
+        is_active=bool(product.is_active),
+        score=score,
+        match_type=match_type
+    )
+
+
+def to_barcode_entry(row, variant: bool = False) -> BarcodeLookupResponse:
+    """Construit l'entrée d'index d'un code-barres (produit ou variante)"""
+    selling_price = row.selling_price or Decimal("0")
+    tax_rate = row.tax_rate or Decimal("0")
+    return BarcodeLookupResponse(
+        barcode=row.barcode,
+        product_id=row.product_id,
+        variant_id=row.variant_id if variant else None,
+        sku=row.sku,
+        name=row.name,
+        selling_price=selling_price,
+        tax_rate=tax_rate,
+        price_with_tax=(selling_price * (1 + tax_rate / 100)).quantize(Decimal("0.01")),
+        stock_quantity=row.stock_quantity or Decimal("0"),
+        unit=row.unit,
+        track_stock=bool(row.track_stock)
+    )
+
+
+def barcode_queries(store_id: UUID, barcode: Optional[str] = None):
+    """Requêtes des codes-barres actifs des produits et des variantes d'un magasin"""
+    product_query = select(
+        Product.id.label("product_id"),
+        Product.barcode,
+        Product.sku,
+        Product.name,
+        Product.selling_price,
+        Product.tax_rate,
+        Product.stock_quantity_primary.label("stock_quantity"),
+        Product.primary_unit.label("unit"),
+        Product.track_stock
+    ).where(
+        Product.store_id == store_id,
+        Product.is_active == True,
+        Product.barcode.isnot(None)
+    )
+
+    variant_query = select(
+        ProductVariant.product_id,
+        ProductVariant.id.label("variant_id"),
+        ProductVariant.barcode,
+        ProductVariant.sku,
+        (Product.name + " - " + ProductVariant.variant_name).label("name"),
+        func.coalesce(ProductVariant.selling_price, Product.selling_price).label("selling_price"),
+        Product.tax_rate,
+        ProductVariant.stock_quantity,
+        Product.primary_unit.label("unit"),
+        Product.track_stock
+    ).join(
+        Product, Product.id == ProductVariant.product_id
+    ).where(
+        Product.store_id == store_id,
+        Product.is_active == True,
+        ProductVariant.is_active == True,
+        ProductVariant.barcode.isnot(None)
+    )
+
+    if barcode is not None:
+        product_query = product_query.where(Product.barcode == barcode)
+        variant_query = variant_query.where(ProductVariant.barcode == barcode)
+
+    return product_query, variant_query
+
+
+async def load_barcode_index(db: AsyncSession, store_id: UUID) -> dict:
+    """Charge l'index des codes-barres d'un magasin (2 requêtes) et le met en cache"""
+    product_query, variant_query = barcode_queries(store_id)
+
+    index = {}
+    result = await db.execute(product_query)
+    for row in result.all():
+        index[row.barcode] = to_barcode_entry(row)
+
+    # Un code-barres de produit reste prioritaire sur celui d'une variante
+    result = await db.execute(variant_query)
+    for row in result.all():
+        index.setdefault(row.barcode, to_barcode_entry(row, variant=True))
+
+    barcode_cache.set(store_id, index)
+    return index
+
+
+async def find_barcode(db: AsyncSession, store_id: UUID, barcode: str) -> Optional[BarcodeLookupResponse]:
+    """Résout un code-barres absent de l'index (produit récent, stock modifié)"""
+    product_query, variant_query = barcode_queries(store_id, barcode)
+
+    result = await db.execute(product_query.limit(1))
+    row = result.first()
+    if row:
+        return to_barcode_entry(row)
+
+    result = await db.execute(variant_query.limit(1))
+    row = result.first()
+    if row:
+        return to_barcode_entry(row, variant=True)
+
+    return None
+
+
+def invalidate_barcode_product(store_id: UUID, product_id: UUID) -> None:
+    """
+    Retire d'un index les codes-barres d'un produit et de ses variantes
+
+    La prochaine lecture relit uniquement ce code-barres en base.
+    """
+    index = barcode_cache.get(store_id)
+    if index is None:
+        return
+    for code in [code for code, entry in index.items() if entry.product_id == product_id]:
+        index.pop(code, None)
+
+
+def on_barcode_notification(payload: str) -> None:
+    """
+    Applique une notification du canal barcode_cache ("store_id:product_id")
+
+    Émise au COMMIT de toute modification d'un produit ou d'une variante,
+    quel que soit le processus ou le script qui l'a faite.
+    """
+    try:
+        store_id, product_id = (UUID(part) for part in payload.split(":"))
+    except ValueError:
+        logger.warning("Notification de code-barres invalide: %s", payload)
+        return
+    invalidate_barcode_product(store_id, product_id)
+
+
+def invalidate_stock_summary(store_id: UUID) -> None:
+    """Invalide le résumé de stock mis en cache pour un magasin (après COMMIT)"""
+    stock_summary_cache.invalidate(store_id)
+
+
+async def warm_barcode_cache(db: AsyncSession) -> int:
+    """Précharge l'index des codes-barres de chaque magasin actif"""
+    result = await db.execute(select(Store.id).where(Store.is_active == True))
+    store_ids = result.scalars().all()
+    for store_id in store_ids:
+        await load_barcode_index(db, store_id)
+    return len(store_ids)
+
+
+# ========== IMPORT EN MASSE ==========
+
+def format_validation_error(error: ValidationError) -> str:
+    """Message lisible d'une ligne invalide ("selling_price: Field required; ...")"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+async def find_import_conflicts(
+    db: AsyncSession,
+    store_id: UUID,
+    skus: List[str],
+    barcodes: List[str]
+) -> tuple:
+    """
+    SKU et codes-barres d'un bloc d'import déjà utilisés, en une requête
+
+    Retourne ({sku: magasin du produit}, {code-barres: SKU du produit ou de la
+    variante qui le porte}). Le SKU est unique tous magasins confondus, le
+    code-barres par magasin.
+    """
+    query = union_all(
+        select(literal("sku"), Product.sku, Product.store_id, Product.sku)
+        .where(Product.sku.in_(skus)),
+        select(literal("barcode"), Product.barcode, Product.store_id, Product.sku)
+        .where(Product.store_id == store_id, Product.barcode.in_(barcodes)),
+        select(literal("barcode"), ProductVariant.barcode, Product.store_id, ProductVariant.sku)
+        .join(Product, Product.id == ProductVariant.product_id)
+        .where(Product.store_id == store_id, ProductVariant.barcode.in_(barcodes))
+    )
+    sku_owners, barcode_owners = {}, {}
+    for kind, code, owner_store_id, owner_sku in (await db.execute(query)).all():
+        if kind == "sku":
+            sku_owners[code] = owner_store_id
+        else:
+            barcode_owners.setdefault(code, owner_sku)
+    return sku_owners, barcode_owners
+
+
+async def resolve_import_categories(
+    db: AsyncSession,
+    store_id: UUID,
+    names: set,
+    categories: dict
+) -> None:
+    """Complète {nom en minuscules: id ou None} avec les catégories encore inconnues d'un bloc"""
+    missing = {name.lower() for name in names} - categories.keys()
+    if not missing:
+        return
+    result = await db.execute(
+        select(func.lower(Category.name), Category.id)
+        .where(Category.store_id == store_id, func.lower(Category.name).in_(missing))
+        .order_by(Category.created_at)
+    )
+    for name, category_id in result.all():
+        categories.setdefault(name, category_id)
+    for name in missing:
+        categories.setdefault(name, None)
+
+
+async def import_product_rows(
+    db: AsyncSession,
+    store_id: UUID,
+    rows: Iterator[TabularRow],
+    update_existing: bool = False
+) -> ProductImportResponse:
+    """
+    Importe des lignes de produits par blocs, puis les fusionne en une requête
+
+    Chaque bloc est validé, confronté aux SKU et codes-barres existants (une
+    requête) et copié par COPY dans une table temporaire. Une seule requête
+    INSERT ... ON CONFLICT verse ensuite la table dans products. Une ligne
+    invalide est rapportée sans interrompre le fichier. Ne valide pas la
+    transaction.
+    """
+    connection = await db.connection()
+    await connection.execute(CreateTable(product_import_staging))
+    raw_connection = await connection.get_raw_connection()
+    copy_columns = [column.name for column in product_import_staging.columns]
+
+    errors: List[ProductImportError] = []
+    total_rows = 0
+    seen_skus, seen_barcodes = {}, {}
+    copied = {}  # sku -> numéro de ligne
+    categories = {}
+
+    while True:
+        # Lecture et décodage du fichier hors de la boucle d'événements
+        chunk = await run_in_threadpool(take, rows, settings.PRODUCT_IMPORT_CHUNK_SIZE)
+        if not chunk:
+            break
+        total_rows += len(chunk)
+
+        valid = []
+        for row_number, values in chunk:
+            try:
+                item = ProductImportRow.model_validate(values)
+            except ValidationError as error:
+                sku = values.get("sku") or values.get("reference")
+                errors.append(ProductImportError(
+                    row=row_number, sku=str(sku) if sku else None, message=format_validation_error(error)
+                ))
+                continue
+
+            if item.sku in seen_skus:
+                message = f"SKU en double dans le fichier (ligne {seen_skus[item.sku]})"
+            elif item.barcode and item.barcode in seen_barcodes:
+                message = f"Code-barres en double dans le fichier (ligne {seen_barcodes[item.barcode]})"
+            else:
+                message = None
+            seen_skus.setdefault(item.sku, row_number)
+            if item.barcode:
+                seen_barcodes.setdefault(item.barcode, row_number)
+
+            if message:
+                errors.append(ProductImportError(row=row_number, sku=item.sku, message=message))
+            else:
+                valid.append((row_number, item))
+
+        if not valid:
+            continue
+
+        sku_owners, barcode_owners = await find_import_conflicts(
+            db, store_id, [item.sku for _, item in valid], [item.barcode for _, item in valid if item.barcode]
+        )
+        await resolve_import_categories(
+            db, store_id, {item.category for _, item in valid if item.category}, categories
+        )
+
+        records = []
+        for row_number, item in valid:
+            owner_store = sku_owners.get(item.sku)
+            barcode_owner = barcode_owners.get(item.barcode) if item.barcode else None
+            category_id = categories.get(item.category.lower()) if item.category else None
+
+            if owner_store is not None and owner_store != store_id:
+                message = "SKU déjà utilisé par un autre magasin"
+            elif owner_store is not None and not update_existing:
+                message = "SKU déjà existant (update_existing=true pour mettre à jour)"
+            elif barcode_owner is not None and barcode_owner != item.sku:
+                message = f"Code-barres déjà utilisé par {barcode_owner}"
+            elif item.category and category_id is None:
+                message = f"Catégorie inconnue: {item.category}"
+            else:
+                fields = item.model_dump(exclude={"category"})
+                fields["category_id"] = category_id
+                records.append((row_number, *(fields[name] for name in IMPORT_FIELDS)))
+                copied[item.sku] = row_number
+                continue
+            errors.append(ProductImportError(row=row_number, sku=item.sku, message=message))
+
+        if records:
+            await raw_connection.driver_connection.copy_records_to_table(
+                product_import_staging.name, records=records, columns=copy_columns
+            )
+
+    created = updated = 0
+    if copied:
+        staging = product_import_staging
+        # L'id est généré par ligne en base (le défaut Python ne serait évalué qu'une fois)
+        merge_query = pg_insert(Product).from_select(
+            ["id", "store_id", *IMPORT_FIELDS],
+            select(func.gen_random_uuid(), literal(store_id), *(staging.c[name] for name in IMPORT_FIELDS))
+        )
+        if update_existing:
+            merge_query = merge_query.on_conflict_do_update(
+                index_elements=[Product.sku],
+                set_={name: merge_query.excluded[name] for name in IMPORT_UPDATE_FIELDS},
+                where=Product.store_id == merge_query.excluded.store_id
+            )
+        else:
+            merge_query = merge_query.on_conflict_do_nothing(index_elements=[Product.sku])
+
+        # xmax = 0 : ligne insérée (et non mise à jour) par cette requête
+        result = await db.execute(
+            merge_query.returning(Product.sku, literal_column("xmax = 0"))
+        )
+        for sku, inserted in result.all():
+            copied.pop(sku)
+            if inserted:
+                created += 1
+            else:
+                updated += 1
+
+        # SKU créé par une autre transaction depuis la vérification du bloc
+        for sku, row_number in copied.items():
+            errors.append(ProductImportError(row=row_number, sku=sku, message="SKU déjà existant"))
+
+    errors.sort(key=lambda error: error.row)
+    return ProductImportResponse(
+        total_rows=total_rows,
+        created=created,
+        updated=updated,
+        error_count=len(errors),
+        errors=errors[:settings.PRODUCT_IMPORT_MAX_ERRORS]
+    )
+
+
 # ========== ENDPOINTS CRUD PRODUITS ==========
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
@@ -151,6 +572,8 @@ async def create_product(
     db.add(new_product)
     await db.commit()
     await db.refresh(new_product)
+    invalidate_category_tree(new_product.store_id)
+    invalidate_stock_summary(new_product.store_id)
 
     # Ajouter les champs calculés
     new_product.is_in_stock = new_product.stock_quantity_primary > 0 or new_product.stock_quantity_secondary > 0
@@ -163,6 +586,8 @@ async def create_product(
 async def list_products(
     page: int = Query(1, ge=1, description="Numéro de page"),
     page_size: int = Query(50, ge=1, le=100, description="Taille de la page"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (remplace page)"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="Calcul du total: exact, estimated, none"),
     search: Optional[str] = Query(None, description="Recherche dans nom, SKU, code-barres"),
     category_id: Optional[UUID] = Query(None, description="Filtrer par catégorie"),
     is_active: Optional[bool] = Query(None, description="Filtrer par statut actif"),
@@ -178,6 +603,9 @@ async def list_products(
 ):
     """
     Lister les produits avec pagination et filtres avancés
+
+    Pour le défilement infini, utiliser `cursor` (temps constant quelle que
+    soit la profondeur) et `count_mode=none`.
     """
     # Construction de la requête
     query = select(Product).where(Product.store_id == current_user.store_id)
@@ -217,40 +645,52 @@ async def list_products(
 
     # Filtres de prix
     if min_price is not None:
-        query = query.where(Product.prix_vente >= min_price)
+        query = query.where(Product.selling_price >= min_price)
 
     if max_price is not None:
-        query = query.where(Product.prix_vente <= max_price)
+        query = query.where(Product.selling_price <= max_price)
 
     # Compter le total
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-
-    # Tri
-    sort_column = {
-        "name": Product.name,
-        "price": Product.prix_vente,
-        "stock": Product.stock_quantity_primary,
-        "created_at": Product.created_at
-    }.get(sort_by, Product.created_at)
-
-    if sort_order == "asc":
-        query = query.order_by(sort_column.asc())
-    else:
-        query = query.order_by(sort_column.desc())
-
-    # Pagination
-    query = query.offset((page - 1) * page_size).limit(page_size)
+    total = await count_total(db, query, count_mode)
+
+    # Tri (clé non nulle et type de la valeur dans le curseur)
+    sort_column, key_type = {
+        "name": (Product.name, str),
+        "price": (Product.selling_price, Decimal),
+        "stock": (func.coalesce(Product.stock_quantity_primary, 0), Decimal),
+        "created_at": (Product.created_at, datetime.fromisoformat)
+    }.get(sort_by, (Product.created_at, datetime.fromisoformat))
+
+    query = query.add_columns(sort_column.label("sort_key"))
+
+    # Variantes chargées en une requête (statut de stock)
+    query = query.options(selectinload(Product.variants))
+
+    # Tri et pagination (curseur ou numéro de page)
+    query = apply_keyset(
+        query,
+        sort_column,
+        Product.id,
+        cursor,
+        key_type,
+        page_size,
+        descending=sort_order != "asc"
+    )
+    if not cursor:
+        query = query.offset((page - 1) * page_size)
 
     # Exécution
     result = await db.execute(query)
-    products = result.scalars().all()
+    rows, cursor_after = next_cursor(
+        result.all(),
+        page_size,
+        lambda row: (row.sort_key, row[0].id)
+    )
+    products = [row[0] for row in rows]
 
     # Ajouter les champs calculés
     products_response = []
     for product in products:
-        product.is_in_stock = product.stock_quantity_primary > 0 or product.stock_quantity_secondary > 0
         product.stock_status = calculate_stock_status(product)
         products_response.append(product)
 
@@ -259,9 +699,214 @@ async def list_products(
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
+        total_pages=total_pages(total, page_size),
+        next_cursor=cursor_after
+    )
+
+
+# ========== ENDPOINTS RECHERCHE ==========
+
+@router.get("/search", response_model=List[ProductSearchResult])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100, description="Terme recherché (nom, SKU, code-barres)"),
+    limit: int = Query(20, ge=1, le=50, description="Nombre de résultats maximum"),
+    include_inactive: bool = Query(False, description="Inclure les produits inactifs"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Recherche classée de produits (autocomplete, caisse)
+
+    - Un SKU ou code-barres exact est renvoyé directement (index btree)
+    - Sinon, classement par similarité trigramme sur le nom (tolère les
+      fautes de frappe) avec bonus pour les préfixes du nom, du SKU et du
+      code-barres (index GIN pg_trgm)
+    """
+    term = q.strip()
+    if not term:
+        return []
+
+    base_filters = [Product.store_id == current_user.store_id]
+    if not include_inactive:
+        base_filters.append(Product.is_active == True)
+
+    # Correspondance exacte SKU / code-barres (scan en caisse)
+    exact_query = select(Product).where(
+        *base_filters,
+        or_(Product.sku == term, Product.barcode == term)
+    ).limit(limit)
+    result = await db.execute(exact_query)
+    exact_matches = result.scalars().all()
+
+    if exact_matches:
+        return [
+            to_search_result(product, 1.0, "sku" if product.sku == term else "barcode")
+            for product in exact_matches
+        ]
+
+    # Recherche classée par similarité et préfixe
+    prefix = f"{escape_like(term)}%"
+    name_prefix = Product.name.ilike(prefix, escape="\\")
+    code_prefix = or_(
+        Product.sku.ilike(prefix, escape="\\"),
+        Product.barcode.ilike(prefix, escape="\\")
+    )
+
+    score = (
+        func.greatest(
+            func.similarity(Product.name, term),
+            func.word_similarity(term, Product.name)
+        )
+        + case((name_prefix, 0.5), else_=0.0)
+        + case((code_prefix, 0.3), else_=0.0)
+    ).label("score")
+
+    search_query = (
+        select(Product, score)
+        .where(
+            *base_filters,
+            or_(
+                Product.name.op("%")(term),
+                literal(term).op("<%")(Product.name),
+                name_prefix,
+                code_prefix
+            )
+        )
+        .order_by(score.desc(), Product.name)
+        .limit(limit)
     )
 
+    result = await db.execute(search_query)
+
+    return [
+        to_search_result(product, round(float(row_score), 4), "text")
+        for product, row_score in result.all()
+    ]
+
+
+@router.get("/lookup/barcode/{code}", response_model=BarcodeLookupResponse)
+async def lookup_barcode(
+    code: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Résoudre un code-barres scanné en caisse (produit ou variante)
+
+    Lecture dans l'index mémoire du magasin : aucune requête en base si le
+    code-barres est déjà indexé. Prix, taxe et stock sont renvoyés. Les
+    modifications faites par les autres workers retirent les entrées
+    concernées via LISTEN/NOTIFY (canal barcode_cache).
+    """
+    store_id = current_user.store_id
+
+    index = barcode_cache.get(store_id)
+    if index is None:
+        index = await load_barcode_index(db, store_id)
+
+    entry = index.get(code)
+    if entry is not None:
+        return entry
+
+    # Code-barres absent de l'index : lecture ciblée en base
+    entry = await find_barcode(db, store_id, code)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Code-barres inconnu"
+        )
+
+    index[code] = entry
+    return entry
+
+
+# ========== ENDPOINTS IMPORT / EXPORT ==========
+
+@router.post("/import", response_model=ProductImportResponse)
+async def import_products(
+    file: UploadFile = File(..., description="Fichier CSV (UTF-8, séparateur , ou ;) ou XLSX"),
+    update_existing: bool = Query(False, description="Mettre à jour les produits dont le SKU existe déjà"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Importer un catalogue de produits (CSV ou XLSX)
+
+    Le fichier est lu par blocs de PRODUCT_IMPORT_CHUNK_SIZE lignes ; les
+    lignes valides sont chargées en une seule fusion, les lignes rejetées
+    (validation, SKU ou code-barres déjà pris, catégorie inconnue) sont
+    rapportées avec leur numéro de ligne.
+
+    - **Colonnes obligatoires**: sku, name, selling_price
+    - **Colonnes optionnelles**: description, barcode, category (nom),
+      product_type, purchase_price, wholesale_price, tax_rate, primary_unit,
+      stock_quantity_primary (nouveaux produits), stock_alert_threshold,
+      track_stock, brand, supplier_reference
+    """
+    store_id = current_user.store_id
+    rows = iter_tabular_rows(file.file, file.filename)
+
+    report = await import_product_rows(db, store_id, rows, update_existing)
+    await db.commit()
+
+    if report.created or report.updated:
+        barcode_cache.invalidate(store_id)
+        invalidate_category_tree(store_id)
+        invalidate_stock_summary(store_id)
+
+    return report
+
+
+@router.get("/export")
+async def export_products(
+    export_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="Format: csv, ndjson"),
+    category_id: Optional[UUID] = Query(None, description="Filtrer par catégorie"),
+    is_active: Optional[bool] = Query(None, description="Filtrer par statut actif"),
+    current_user: User = Depends(get_current_user),
+    session_factory: async_sessionmaker = Depends(get_session_factory)
+):
+    """
+    Exporter le catalogue de produits (CSV ou NDJSON, en flux)
+
+    Les lignes sont lues par curseur serveur et envoyées par blocs de
+    EXPORT_CHUNK_ROWS : la mémoire reste constante quelle que soit la taille
+    du catalogue. Les colonnes reprennent celles de l'import (catégorie par
+    son nom) : un export modifié peut être réimporté avec update_existing.
+    """
+    query = (
+        select(
+            Product.id,
+            Product.sku,
+            Product.name,
+            Product.description,
+            Product.barcode,
+            Category.name.label("category"),
+            Product.product_type,
+            Product.purchase_price,
+            Product.selling_price,
+            Product.wholesale_price,
+            Product.tax_rate,
+            Product.primary_unit,
+            Product.stock_quantity_primary,
+            Product.stock_alert_threshold,
+            Product.track_stock,
+            Product.brand,
+            Product.supplier_reference,
+            Product.is_active,
+            Product.created_at,
+            Product.updated_at
+        )
+        .outerjoin(Category, Category.id == Product.category_id)
+        .where(Product.store_id == current_user.store_id)
+        .order_by(Product.sku)
+    )
+    if category_id:
+        query = query.where(Product.category_id == category_id)
+    if is_active is not None:
+        query = query.where(Product.is_active == is_active)
+
+    return export_response(session_factory, query, export_format, "produits")
+
 
 @router.get("/{product_id}", response_model=ProductWithRelations)
 async def get_product(
@@ -334,6 +979,11 @@ async def update_product(
 
     await db.commit()
     await db.refresh(product)
+    invalidate_barcode_product(current_user.store_id, product_id)
+    invalidate_stock_summary(current_user.store_id)
+
+    if 'category_id' in update_data:
+        invalidate_category_tree(current_user.store_id)
 
     # Ajouter les champs calculés
     product.is_in_stock = product.stock_quantity_primary > 0 or product.stock_quantity_secondary > 0
@@ -367,6 +1017,9 @@ async def delete_product(
     # Supprimer le produit
     await db.delete(product)
     await db.commit()
+    invalidate_category_tree(current_user.store_id)
+    invalidate_barcode_product(current_user.store_id, product_id)
+    invalidate_stock_summary(current_user.store_id)
 
     return None
 
@@ -415,6 +1068,7 @@ async def create_product_variant(
     db.add(new_variant)
     await db.commit()
     await db.refresh(new_variant)
+    invalidate_stock_summary(current_user.store_id)
 
     return new_variant
 
@@ -494,6 +1148,8 @@ async def update_product_variant(
 
     await db.commit()
     await db.refresh(variant)
+    invalidate_barcode_product(current_user.store_id, product_id)
+    invalidate_stock_summary(current_user.store_id)
 
     return variant
 
@@ -529,6 +1185,8 @@ async def delete_product_variant(
     # Supprimer la variante
     await db.delete(variant)
     await db.commit()
+    invalidate_barcode_product(current_user.store_id, product_id)
+    invalidate_stock_summary(current_user.store_id)
 
     return None
 
@@ -587,6 +1245,8 @@ async def duplicate_product(
 
     await db.commit()
     await db.refresh(new_product)
+    invalidate_category_tree(current_user.store_id)
+    invalidate_stock_summary(current_user.store_id)
 
     # Ajouter les champs calculés
     new_product.is_in_stock = False
@@ -609,6 +1269,7 @@ async def toggle_product_active(
     product.is_active = not product.is_active
     await db.commit()
     await db.refresh(product)
+    invalidate_barcode_product(current_user.store_id, product_id)
 
     # Ajouter les champs calculés
     product.is_in_stock = product.stock_quantity_primary > 0 or product.stock_quantity_secondary > 0
@@ -0,0 +1,629 @@
+"""
+Endpoints pour les rapports et le tableau de bord
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, Tuple
+from uuid import UUID
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, cast, case, and_, extract, tuple_, literal_column, nulls_last, DateTime
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.models.user import User
+from app.models.store import Store
+from app.models.order import Order, OrderItem
+from app.models.product import Product, ProductVariant
+from app.models.transaction import PaymentMethod
+from app.models.report import SalesDailyRollup, NO_PAYMENT_METHOD
+from app.schemas.report import (
+    AbcClassSummary,
+    AbcProduct,
+    AbcReport,
+    DashboardReport,
+    Granularity,
+    PaymentMethodBreakdown,
+    PeakHourCell,
+    PeakHoursReport,
+    ProductMetric,
+    ProductSales,
+    SalesBreakdown,
+    SalesPeriod,
+    SalesTotals,
+    TopProductsReport
+)
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+# Cache des rapports produits, clé: (rapport, store_id, période, paramètres)
+product_report_cache = TTLCache(maxsize=1024, ttl=settings.PRODUCT_REPORT_CACHE_TTL)
+
+CENT = Decimal("0.01")
+
+# Plage maximale pour une série horaire
+MAX_HOURLY_DAYS = 31
+
+# Période par défaut et plage maximale de la carte des heures de pointe
+PEAK_HOURS_DEFAULT_DAYS = 28
+PEAK_HOURS_MAX_DAYS = 366
+PEAK_SLOTS_COUNT = 5
+
+# Période par défaut des rapports produits
+PRODUCT_REPORT_DEFAULT_DAYS = 30
+
+# Valeurs de GROUPING(période, canal, type, méthode) : un bit à 1 par dimension agrégée
+GROUPING_TOTAL = 0b1111
+GROUPING_PERIOD = 0b0111
+GROUPING_CHANNEL = 0b1011
+GROUPING_ORDER_TYPE = 0b1101
+GROUPING_PAYMENT_METHOD = 0b1110
+
+
+# ========== HELPER FUNCTIONS ==========
+
+async def store_zone(db: AsyncSession, store_id: UUID) -> ZoneInfo:
+    """Fuseau horaire du magasin (UTC si absent ou invalide)"""
+    name = await db.scalar(select(Store.timezone).where(Store.id == store_id))
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+
+async def store_today(db: AsyncSession, store_id: UUID) -> date:
+    """Date du jour dans le fuseau horaire du magasin"""
+    return datetime.now(await store_zone(db, store_id)).date()
+
+
+def utc_bounds(zone: ZoneInfo, start_date: date, end_date: date) -> Tuple[datetime, datetime]:
+    """
+    Bornes UTC [début, fin) d'une période en dates locales
+
+    Les colonnes created_at sont des TIMESTAMP sans fuseau, en UTC.
+    """
+    start = datetime.combine(start_date, time.min, tzinfo=zone)
+    end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=zone)
+    return (
+        start.astimezone(timezone.utc).replace(tzinfo=None),
+        end.astimezone(timezone.utc).replace(tzinfo=None)
+    )
+
+
+def percent(value: Optional[Decimal], total: Optional[Decimal]) -> Decimal:
+    """Pourcentage arrondi au centième (0 si le total est nul)"""
+    if not value or not total:
+        return Decimal("0")
+    return (Decimal(value) * 100 / Decimal(total)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def totals_from_row(row) -> dict:
+    """Chiffres clés à partir d'une ligne agrégée (sommes NULL sur une période vide)"""
+    orders_count = row.orders_count or 0
+    revenue = row.revenue or Decimal("0")
+    payments = row.payments_amount or Decimal("0")
+    refunds = row.refunds_amount or Decimal("0")
+    expenses = row.expenses_amount or Decimal("0")
+    average_basket = (revenue / orders_count).quantize(CENT, rounding=ROUND_HALF_UP) if orders_count else Decimal("0")
+    return {
+        "orders_count": orders_count,
+        "revenue": revenue,
+        "average_basket": average_basket,
+        "discount_amount": row.discount_amount or Decimal("0"),
+        "tax_amount": row.tax_amount or Decimal("0"),
+        "payments_amount": payments,
+        "refunds_amount": refunds,
+        "expenses_amount": expenses,
+        "cash_balance": payments - refunds - expenses
+    }
+
+
+async def build_dashboard(
+    db: AsyncSession,
+    store_id: UUID,
+    start_date: date,
+    end_date: date,
+    granularity: Granularity
+) -> DashboardReport:
+    """
+    Tableau de bord calculé sur sales_daily_rollups
+
+    Une seule requête GROUPING SETS produit les totaux, la série temporelle et
+    les répartitions par canal, type de commande et méthode de paiement, en ne
+    lisant que les agrégats horaires de la période (jamais orders ni transactions).
+    """
+    rollup = SalesDailyRollup
+    # Le pas est inséré littéralement : un paramètre lié différerait entre SELECT et GROUP BY
+    period = func.date_trunc(
+        literal_column(f"'{granularity.value}'"),
+        cast(rollup.day, DateTime) + rollup.hour * literal_column("interval '1 hour'")
+    )
+
+    query = (
+        select(
+            func.grouping(period, rollup.channel, rollup.order_type, rollup.payment_method_id).label("grouping"),
+            period.label("period"),
+            rollup.channel,
+            rollup.order_type,
+            rollup.payment_method_id,
+            func.sum(rollup.orders_count).label("orders_count"),
+            func.sum(rollup.revenue).label("revenue"),
+            func.sum(rollup.discount_amount).label("discount_amount"),
+            func.sum(rollup.tax_amount).label("tax_amount"),
+            func.sum(rollup.payments_count).label("payments_count"),
+            func.sum(rollup.payments_amount).label("payments_amount"),
+            func.sum(rollup.refunds_amount).label("refunds_amount"),
+            func.sum(rollup.expenses_amount).label("expenses_amount")
+        )
+        .where(
+            rollup.store_id == store_id,
+            rollup.day.between(start_date, end_date)
+        )
+        .group_by(
+            func.grouping_sets(
+                tuple_(),
+                tuple_(period),
+                tuple_(rollup.channel),
+                tuple_(rollup.order_type),
+                tuple_(rollup.payment_method_id)
+            )
+        )
+    )
+    rows = (await db.execute(query)).all()
+
+    totals = SalesTotals()
+    series, by_channel, by_order_type, payment_rows = [], [], [], []
+    for row in rows:
+        if row.grouping == GROUPING_TOTAL:
+            totals = SalesTotals(**totals_from_row(row))
+        elif row.grouping == GROUPING_PERIOD:
+            series.append(SalesPeriod(period_start=row.period, **totals_from_row(row)))
+        elif row.grouping == GROUPING_CHANNEL and row.orders_count:
+            by_channel.append(SalesBreakdown(key=row.channel, orders_count=row.orders_count, revenue=row.revenue))
+        elif row.grouping == GROUPING_ORDER_TYPE and row.orders_count:
+            by_order_type.append(SalesBreakdown(key=row.order_type, orders_count=row.orders_count, revenue=row.revenue))
+        elif row.grouping == GROUPING_PAYMENT_METHOD and (
+            row.payments_count or row.refunds_amount or row.expenses_amount
+        ):
+            payment_rows.append(row)
+
+    by_payment_method = []
+    if payment_rows:
+        result = await db.execute(
+            select(PaymentMethod.id, PaymentMethod.name).where(PaymentMethod.store_id == store_id)
+        )
+        names = dict(result.all())
+        for row in payment_rows:
+            method_id = None if row.payment_method_id == NO_PAYMENT_METHOD else row.payment_method_id
+            by_payment_method.append(PaymentMethodBreakdown(
+                payment_method_id=method_id,
+                name=names.get(method_id),
+                payments_count=row.payments_count,
+                payments_amount=row.payments_amount,
+                refunds_amount=row.refunds_amount,
+                expenses_amount=row.expenses_amount
+            ))
+
+    series.sort(key=lambda item: item.period_start)
+    by_channel.sort(key=lambda item: item.revenue, reverse=True)
+    by_order_type.sort(key=lambda item: item.revenue, reverse=True)
+    by_payment_method.sort(key=lambda item: item.payments_amount, reverse=True)
+
+    return DashboardReport(
+        start_date=start_date,
+        end_date=end_date,
+        granularity=granularity,
+        totals=totals,
+        series=series,
+        by_channel=by_channel,
+        by_order_type=by_order_type,
+        by_payment_method=by_payment_method
+    )
+
+
+async def build_peak_hours(
+    db: AsyncSession,
+    store_id: UUID,
+    start_date: date,
+    end_date: date
+) -> PeakHoursReport:
+    """
+    Carte des heures de pointe calculée sur sales_daily_rollups
+
+    Les agrégats horaires sont déjà en heure locale du magasin : il suffit de
+    les regrouper par jour ISO de la semaine et par heure.
+    """
+    rollup = SalesDailyRollup
+    day_of_week = extract("isodow", rollup.day)
+    result = await db.execute(
+        select(
+            day_of_week.label("day_of_week"),
+            rollup.hour,
+            func.sum(rollup.orders_count).label("orders_count"),
+            func.sum(rollup.revenue).label("revenue")
+        )
+        .where(
+            rollup.store_id == store_id,
+            rollup.day.between(start_date, end_date),
+            rollup.payment_method_id == NO_PAYMENT_METHOD
+        )
+        .group_by(day_of_week, rollup.hour)
+    )
+    slots = {(int(row.day_of_week), row.hour): row for row in result}
+
+    # Nombre d'occurrences de chaque jour de la semaine sur la période
+    occurrences = [0] * 8
+    for offset in range((end_date - start_date).days + 1):
+        occurrences[(start_date + timedelta(days=offset)).isoweekday()] += 1
+
+    cells = []
+    for day in range(1, 8):
+        for hour in range(24):
+            row = slots.get((day, hour))
+            orders_count = row.orders_count if row else 0
+            cells.append(PeakHourCell(
+                day_of_week=day,
+                hour=hour,
+                orders_count=orders_count,
+                revenue=row.revenue if row else Decimal("0"),
+                average_orders=(
+                    (Decimal(orders_count) / occurrences[day]).quantize(CENT, rounding=ROUND_HALF_UP)
+                    if occurrences[day] else Decimal("0")
+                )
+            ))
+
+    busiest = sorted(
+        (cell for cell in cells if cell.orders_count > 0),
+        key=lambda cell: (cell.orders_count, cell.revenue),
+        reverse=True
+    )
+    return PeakHoursReport(
+        start_date=start_date,
+        end_date=end_date,
+        cells=cells,
+        peak_slots=busiest[:PEAK_SLOTS_COUNT]
+    )
+
+
+def product_sales_query(store_id: UUID, start: datetime, end: datetime):
+    """
+    Ventes par produit des commandes complétées entre deux instants UTC
+
+    Agrégation faite par la base : quantité ramenée en unité primaire, chiffre
+    d'affaires HT (remises déduites) et marge calculée avec le prix d'achat
+    actuel de la variante ou du produit.
+    """
+    primary_quantity = case(
+        (
+            and_(OrderItem.unit != "primary", Product.has_multiple_units == True, Product.units_per_primary > 0),
+            OrderItem.quantity / Product.units_per_primary
+        ),
+        else_=OrderItem.quantity
+    )
+    line_revenue = OrderItem.total_price - func.coalesce(OrderItem.tax_amount, 0)
+    unit_cost = func.coalesce(ProductVariant.purchase_price, Product.purchase_price)
+
+    return (
+        select(
+            OrderItem.product_id.label("product_id"),
+            func.sum(primary_quantity).label("quantity"),
+            func.sum(line_revenue).label("revenue"),
+            func.sum(line_revenue - primary_quantity * unit_cost).filter(unit_cost.isnot(None)).label("margin"),
+            func.count(func.distinct(OrderItem.order_id)).label("orders_count")
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .outerjoin(ProductVariant, ProductVariant.id == OrderItem.variant_id)
+        .where(
+            Order.store_id == store_id,
+            Order.status == "completed",
+            Order.created_at >= start,
+            Order.created_at < end
+        )
+        .group_by(OrderItem.product_id)
+    )
+
+
+def product_report_ttl(end_date: date, today: date) -> int:
+    """Durée de cache : une période terminée ne change plus"""
+    if end_date < today:
+        return settings.PRODUCT_REPORT_CLOSED_CACHE_TTL
+    return settings.PRODUCT_REPORT_CACHE_TTL
+
+
+async def product_report_period(
+    db: AsyncSession,
+    store_id: UUID,
+    start_date: Optional[date],
+    end_date: Optional[date]
+) -> Tuple[ZoneInfo, date, date, date]:
+    """Période d'un rapport produits (défaut: 30 derniers jours) et date du jour"""
+    zone = await store_zone(db, store_id)
+    today = datetime.now(zone).date()
+    if end_date is None:
+        end_date = today
+    if start_date is None:
+        start_date = end_date - timedelta(days=PRODUCT_REPORT_DEFAULT_DAYS - 1)
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date doit être postérieure ou égale à start_date"
+        )
+    return zone, start_date, end_date, today
+
+
+async def build_top_products(
+    db: AsyncSession,
+    store_id: UUID,
+    zone: ZoneInfo,
+    start_date: date,
+    end_date: date,
+    metric: ProductMetric,
+    limit: int
+) -> TopProductsReport:
+    """Meilleures ventes : tri et limite appliqués par la base"""
+    sales = product_sales_query(store_id, *utc_bounds(zone, start_date, end_date)).subquery()
+    value = sales.c[metric.value]
+
+    result = await db.execute(
+        select(
+            sales,
+            Product.name,
+            Product.sku,
+            func.sum(value).over().label("total")
+        )
+        .join(Product, Product.id == sales.c.product_id)
+        .order_by(nulls_last(value.desc()), sales.c.product_id)
+        .limit(limit)
+    )
+    items = [
+        ProductSales(
+            product_id=row.product_id,
+            name=row.name,
+            sku=row.sku,
+            quantity=row.quantity,
+            revenue=row.revenue,
+            margin=row.margin,
+            orders_count=row.orders_count,
+            share=percent(getattr(row, metric.value), row.total)
+        )
+        for row in result
+    ]
+    return TopProductsReport(start_date=start_date, end_date=end_date, metric=metric, items=items)
+
+
+async def build_abc(
+    db: AsyncSession,
+    store_id: UUID,
+    zone: ZoneInfo,
+    start_date: date,
+    end_date: date,
+    metric: ProductMetric,
+    a_threshold: int,
+    b_threshold: int
+) -> AbcReport:
+    """
+    Analyse ABC en une requête
+
+    Les fonctions de fenêtre calculent le rang et la somme cumulée du critère ;
+    un produit est classé A tant que la part cumulée des produits qui le
+    précèdent reste sous a_threshold %, B sous b_threshold %, C au-delà.
+    """
+    sales = product_sales_query(store_id, *utc_bounds(zone, start_date, end_date)).subquery()
+    value = func.coalesce(sales.c[metric.value], 0)
+    ordering = (value.desc(), sales.c.product_id)
+
+    ranked = (
+        select(
+            sales,
+            Product.name,
+            Product.sku,
+            func.row_number().over(order_by=ordering).label("rank"),
+            func.sum(value).over(order_by=ordering, rows=(None, 0)).label("cumulative"),
+            func.sum(value).over().label("total"),
+            value.label("value")
+        )
+        .join(Product, Product.id == sales.c.product_id)
+        .subquery()
+    )
+    preceding = ranked.c.cumulative - ranked.c.value
+    abc_class = case(
+        (preceding < ranked.c.total * a_threshold / 100, "A"),
+        (preceding < ranked.c.total * b_threshold / 100, "B"),
+        else_="C"
+    )
+    result = await db.execute(
+        select(ranked, abc_class.label("abc_class")).order_by(ranked.c.rank)
+    )
+
+    items = []
+    total = Decimal("0")
+    classes = {name: [0, Decimal("0")] for name in ("A", "B", "C")}
+    for row in result:
+        total = row.total
+        classes[row.abc_class][0] += 1
+        classes[row.abc_class][1] += row.value
+        items.append(AbcProduct(
+            product_id=row.product_id,
+            name=row.name,
+            sku=row.sku,
+            quantity=row.quantity,
+            revenue=row.revenue,
+            margin=row.margin,
+            orders_count=row.orders_count,
+            share=percent(row.value, row.total),
+            rank=row.rank,
+            cumulative_share=percent(row.cumulative, row.total),
+            abc_class=row.abc_class
+        ))
+
+    return AbcReport(
+        start_date=start_date,
+        end_date=end_date,
+        metric=metric,
+        a_threshold=a_threshold,
+        b_threshold=b_threshold,
+        total=total,
+        classes=[
+            AbcClassSummary(abc_class=name, products_count=count, value=class_value, share=percent(class_value, total))
+            for name, (count, class_value) in classes.items()
+        ],
+        items=items
+    )
+
+
+# ========== ENDPOINTS ==========
+
+@router.get("/dashboard", response_model=DashboardReport)
+async def get_dashboard(
+    start_date: Optional[date] = Query(None, description="Début de période (défaut: aujourd'hui)"),
+    end_date: Optional[date] = Query(None, description="Fin de période incluse (défaut: start_date)"),
+    granularity: Granularity = Query(Granularity.DAY, description="Pas de la série: hour, day, week, month"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Tableau de bord des ventes
+
+    Chiffre d'affaires, panier moyen, remises, dépenses et solde de caisse sur
+    la période, avec une série temporelle et les répartitions par canal, type
+    de commande et méthode de paiement. Les dates sont celles du fuseau
+    horaire du magasin.
+
+    - **start_date**, **end_date**: période (bornes incluses)
+    - **granularity**: pas de la série (hour limité à 31 jours)
+    """
+    if start_date is None:
+        start_date = await store_today(db, current_user.store_id)
+    if end_date is None:
+        end_date = start_date
+
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date doit être postérieure ou égale à start_date"
+        )
+    if granularity == Granularity.HOUR and (end_date - start_date).days >= MAX_HOURLY_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La série horaire est limitée à {MAX_HOURLY_DAYS} jours"
+        )
+
+    return await build_dashboard(db, current_user.store_id, start_date, end_date, granularity)
+
+
+@router.get("/peak-hours", response_model=PeakHoursReport)
+async def get_peak_hours(
+    start_date: Optional[date] = Query(None, description="Début de période (défaut: 4 semaines avant end_date)"),
+    end_date: Optional[date] = Query(None, description="Fin de période incluse (défaut: aujourd'hui)"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Heures de pointe : commandes par jour de la semaine et par heure
+
+    Retourne les 168 créneaux de la semaine (heure locale du magasin) avec le
+    nombre de commandes complétées, le chiffre d'affaires et la moyenne par
+    occurrence du créneau, ainsi que les créneaux les plus chargés.
+
+    - **start_date**, **end_date**: période (bornes incluses, 366 jours max)
+    """
+    if end_date is None:
+        end_date = await store_today(db, current_user.store_id)
+    if start_date is None:
+        start_date = end_date - timedelta(days=PEAK_HOURS_DEFAULT_DAYS - 1)
+
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date doit être postérieure ou égale à start_date"
+        )
+    if (end_date - start_date).days >= PEAK_HOURS_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La période est limitée à {PEAK_HOURS_MAX_DAYS} jours"
+        )
+
+    return await build_peak_hours(db, current_user.store_id, start_date, end_date)
+
+
+@router.get("/top-products", response_model=TopProductsReport)
+async def get_top_products(
+    start_date: Optional[date] = Query(None, description="Début de période (défaut: 30 jours avant end_date)"),
+    end_date: Optional[date] = Query(None, description="Fin de période incluse (défaut: aujourd'hui)"),
+    metric: ProductMetric = Query(ProductMetric.REVENUE, description="Critère: revenue, quantity, margin"),
+    limit: int = Query(10, ge=1, le=100),
+    use_cache: bool = Query(True, description="Utiliser le cache"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Meilleures ventes de la période
+
+    Quantités (en unité primaire), chiffre d'affaires HT et marge par produit,
+    calculés sur les commandes complétées. Résultat mis en cache par magasin
+    et période (1 min si la période inclut aujourd'hui, 1 h sinon).
+    """
+    zone, start_date, end_date, today = await product_report_period(
+        db, current_user.store_id, start_date, end_date
+    )
+    cache_key = ("top", current_user.store_id, start_date, end_date, metric, limit)
+    if use_cache and settings.PRODUCT_REPORT_CACHE_TTL > 0:
+        report = product_report_cache.get(cache_key)
+        if report is not None:
+            return report
+
+    report = await build_top_products(db, current_user.store_id, zone, start_date, end_date, metric, limit)
+
+    if settings.PRODUCT_REPORT_CACHE_TTL > 0:
+        product_report_cache.set(cache_key, report, ttl=product_report_ttl(end_date, today))
+
+    return report
+
+
+@router.get("/abc", response_model=AbcReport)
+async def get_abc_analysis(
+    start_date: Optional[date] = Query(None, description="Début de période (défaut: 30 jours avant end_date)"),
+    end_date: Optional[date] = Query(None, description="Fin de période incluse (défaut: aujourd'hui)"),
+    metric: ProductMetric = Query(ProductMetric.REVENUE, description="Critère: revenue, quantity, margin"),
+    a_threshold: int = Query(80, ge=1, le=99, description="Part cumulée couverte par la classe A (%)"),
+    b_threshold: int = Query(95, ge=1, le=100, description="Part cumulée couverte par les classes A et B (%)"),
+    use_cache: bool = Query(True, description="Utiliser le cache"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Analyse ABC des produits vendus sur la période
+
+    - **A**: produits qui réalisent les premiers a_threshold % du critère
+    - **B**: jusqu'à b_threshold %
+    - **C**: le reste
+
+    Classement calculé par la base (fonctions de fenêtre) et mis en cache
+    par magasin et période.
+    """
+    if b_threshold <= a_threshold:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="b_threshold doit être supérieur à a_threshold"
+        )
+    zone, start_date, end_date, today = await product_report_period(
+        db, current_user.store_id, start_date, end_date
+    )
+    cache_key = ("abc", current_user.store_id, start_date, end_date, metric, a_threshold, b_threshold)
+    if use_cache and settings.PRODUCT_REPORT_CACHE_TTL > 0:
+        report = product_report_cache.get(cache_key)
+        if report is not None:
+            return report
+
+    report = await build_abc(
+        db, current_user.store_id, zone, start_date, end_date, metric, a_threshold, b_threshold
+    )
+
+    if settings.PRODUCT_REPORT_CACHE_TTL > 0:
+        product_report_cache.set(cache_key, report, ttl=product_report_ttl(end_date, today))
+
+    return report
@@ -1,27 +1,43 @@
 """
 Endpoints pour la gestion du stock
 """
-from typing import List, Optional
-from uuid import UUID
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
 from datetime import datetime, timedelta
+from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_, desc, asc
-from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select, func, or_, and_, desc, asc, case, insert, update, values, column, Numeric
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, get_session_factory
+from app.core.export import ExportFormat, export_response
 from app.core.security import get_current_user
+from app.core.pagination import (
+    CountMode,
+    apply_keyset,
+    count_total,
+    next_cursor,
+    total_pages
+)
 from app.models.user import User
 from app.models.product import Product, ProductVariant
 from app.models.stock import StockMovement
 from app.models.category import Category
+from app.api.v1.endpoints.products import invalidate_barcode_product, invalidate_stock_summary, stock_summary_cache
 from app.schemas.stock import (
     StockMovementCreate,
     StockMovementResponse,
-    StockMovementWithProduct,
     StockMovementListResponse,
+    StockHistoryEntry,
+    StockHistoryResponse,
     StockAdjustment,
+    BulkStockMovementCreate,
+    BulkStockMovementResult,
+    BulkStockMovementLineResult,
     ProductStockInfo,
+    ProductStockListResponse,
     VariantStockInfo,
     LowStockAlert,
     StockSummary,
@@ -32,21 +48,35 @@ from app.schemas.stock import (
 
 router = APIRouter(prefix="/stock", tags=["Stock Management"])
 
+# Mouvements qui augmentent le stock
+INCOMING_MOVEMENTS = (
+    MovementType.PURCHASE,
+    MovementType.RETURN,
+    MovementType.ADJUSTMENT_IN,
+    MovementType.TRANSFER_IN
+)
+
+# Types du journal qui augmentent le stock (y compris "in" et "adjustment" écrits par les triggers)
+INCOMING_MOVEMENT_TYPES = tuple(movement.value for movement in INCOMING_MOVEMENTS) + ("in", "adjustment")
+
 
 # ========== HELPER FUNCTIONS ==========
 
 async def get_product_with_stock(
     product_id: UUID,
     db: AsyncSession,
-    store_id: UUID
+    store_id: UUID,
+    for_update: bool = False
 ) -> Product:
-    """Récupère un produit avec vérification du store"""
-    result = await db.execute(
-        select(Product).where(
-            Product.id == product_id,
-            Product.store_id == store_id
-        )
+    """Récupère un produit avec vérification du store (verrouillé si for_update)"""
+    query = select(Product).where(
+        Product.id == product_id,
+        Product.store_id == store_id
     )
+    if for_update:
+        query = query.with_for_update().execution_options(populate_existing=True)
+
+    result = await db.execute(query)
     product = result.scalar_one_or_none()
 
     if not product:
@@ -64,6 +94,87 @@ async def get_product_with_stock(
     return product
 
 
+async def compute_stock_summary(db: AsyncSession, store_id: UUID) -> StockSummary:
+    """
+    Calcule tous les compteurs du résumé de stock en un seul passage
+
+    Le stock des produits à variantes est la somme des variantes actives,
+    valorisées à leur prix d'achat (ou celui du produit à défaut).
+    """
+    variant_stock = (
+        select(
+            ProductVariant.product_id.label("product_id"),
+            func.sum(func.coalesce(ProductVariant.stock_quantity, 0)).label("quantity"),
+            func.sum(
+                func.coalesce(ProductVariant.stock_quantity, 0)
+                * func.coalesce(ProductVariant.purchase_price, Product.purchase_price, 0)
+            ).label("value")
+        )
+        .join(Product, ProductVariant.product_id == Product.id)
+        .where(
+            Product.store_id == store_id,
+            ProductVariant.is_active == True
+        )
+        .group_by(ProductVariant.product_id)
+        .subquery()
+    )
+
+    tracked = Product.track_stock == True
+    quantity = case(
+        (Product.has_variants == True, func.coalesce(variant_stock.c.quantity, 0)),
+        else_=func.coalesce(Product.stock_quantity_primary, 0)
+    )
+    value = case(
+        (Product.has_variants == True, func.coalesce(variant_stock.c.value, 0)),
+        else_=func.coalesce(Product.stock_quantity_primary, 0) * func.coalesce(Product.purchase_price, 0)
+    )
+    threshold = func.coalesce(Product.stock_alert_threshold, 0)
+
+    result = await db.execute(
+        select(
+            func.count(Product.id).filter(tracked).label("total_products"),
+            func.count(Product.id).filter(tracked, quantity > 0).label("products_in_stock"),
+            func.count(Product.id).filter(tracked, quantity > 0, quantity <= threshold).label("products_low_stock"),
+            func.count(Product.id).filter(tracked, quantity <= 0).label("products_out_of_stock"),
+            func.coalesce(func.sum(value).filter(tracked), 0).label("total_stock_value"),
+            func.count(Product.id).filter(Product.has_variants == True).label("products_with_variants")
+        )
+        .select_from(Product)
+        .outerjoin(variant_stock, variant_stock.c.product_id == Product.id)
+        .where(Product.store_id == store_id)
+    )
+    row = result.one()
+
+    return StockSummary(
+        total_products=row.total_products,
+        products_in_stock=row.products_in_stock,
+        products_low_stock=row.products_low_stock,
+        products_out_of_stock=row.products_out_of_stock,
+        total_stock_value=float(row.total_stock_value),
+        products_with_variants=row.products_with_variants
+    )
+
+
+def movement_filters(
+    store_id: UUID,
+    product_id: Optional[UUID] = None,
+    movement_type: Optional[MovementType] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> list:
+    """Conditions de filtrage du journal des mouvements (liste et export)"""
+    filters = [StockMovement.store_id == store_id]
+    if product_id:
+        filters.append(StockMovement.product_id == product_id)
+    if movement_type:
+        filters.append(StockMovement.movement_type == movement_type.value)
+    if date_from:
+        filters.append(StockMovement.created_at >= date_from)
+    if date_to:
+        filters.append(StockMovement.created_at <= date_to)
+    return filters
+
+
 async def create_stock_movement(
     db: AsyncSession,
     store_id: UUID,
@@ -77,80 +188,286 @@ async def create_stock_movement(
     reference: Optional[str] = None,
     notes: Optional[str] = None
 ) -> StockMovement:
-    """Crée un mouvement de stock et met à jour les quantités"""
+    """
+    Crée un mouvement de stock et met à jour les quantités
 
-    # Récupérer le stock actuel
+    La quantité est modifiée par un UPDATE atomique (qty = qty ± n) et une
+    sortie n'est appliquée que si le stock suffit (qty >= n) : deux ventes
+    simultanées du dernier article ne peuvent pas réussir toutes les deux.
+
+    L'appelant invalide le résumé de stock et retire le produit de l'index
+    des codes-barres après le COMMIT : invalidés avant, une lecture
+    concurrente y remettrait les valeurs encore en base.
+    """
+    quantity = Decimal(str(quantity))
+    incoming = movement_type in INCOMING_MOVEMENTS
+
+    # Déterminer la ligne et la colonne de stock concernées
     if variant_id:
-        result = await db.execute(
-            select(ProductVariant).where(ProductVariant.id == variant_id)
-        )
-        variant = result.scalar_one_or_none()
-        if not variant:
-            raise HTTPException(status_code=404, detail="Variante non trouvée")
-        stock_before = variant.stock_quantity
+        model = ProductVariant
+        stock_column = ProductVariant.stock_quantity
+        filters = [ProductVariant.id == variant_id, ProductVariant.product_id == product_id]
+        not_found = "Variante non trouvée"
     else:
         result = await db.execute(
-            select(Product).where(Product.id == product_id)
+            select(Product.primary_unit, Product.secondary_unit).where(Product.id == product_id)
         )
-        product = result.scalar_one_or_none()
-        if not product:
+        units = result.one_or_none()
+        if not units:
             raise HTTPException(status_code=404, detail="Produit non trouvé")
 
         # Déterminer quelle quantité utiliser selon l'unité
-        if unit == product.primary_unit:
-            stock_before = product.stock_quantity_primary
-        elif unit == product.secondary_unit:
-            stock_before = product.stock_quantity_secondary
+        model = Product
+        if unit != units.primary_unit and unit == units.secondary_unit:
+            stock_column = Product.stock_quantity_secondary
         else:
-            stock_before = product.stock_quantity_primary
-
-    # Calculer le nouveau stock selon le type de mouvement
-    if movement_type in [MovementType.PURCHASE, MovementType.RETURN,
-                         MovementType.ADJUSTMENT_IN, MovementType.TRANSFER_IN]:
-        # Mouvements entrants : augmentent le stock
-        stock_after = stock_before + quantity
+            stock_column = Product.stock_quantity_primary
+        filters = [Product.id == product_id]
+        not_found = "Produit non trouvé"
+
+    # Mise à jour atomique (conditionnelle pour les sorties)
+    current_stock = func.coalesce(stock_column, 0)
+    statement = update(model).where(*filters)
+    if incoming:
+        statement = statement.values({stock_column: current_stock + quantity})
     else:
-        # Mouvements sortants : diminuent le stock
-        stock_after = stock_before - quantity
-        if stock_after < 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Stock insuffisant. Stock actuel: {stock_before}, demandé: {quantity}"
-            )
+        statement = statement.where(current_stock >= quantity).values({stock_column: current_stock - quantity})
+
+    result = await db.execute(statement.returning(stock_column))
+    stock_after = result.scalar_one_or_none()
+
+    if stock_after is None:
+        # Aucune ligne modifiée : introuvable ou stock insuffisant
+        result = await db.execute(select(current_stock).where(*filters))
+        stock_before = result.scalar_one_or_none()
+        if stock_before is None:
+            raise HTTPException(status_code=404, detail=not_found)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Stock insuffisant. Stock actuel: {stock_before}, demandé: {quantity}"
+        )
+
+    stock_before = stock_after - quantity if incoming else stock_after + quantity
 
     # Créer le mouvement
     movement = StockMovement(
         store_id=store_id,
         product_id=product_id,
         variant_id=variant_id,
-        order_id=order_id,
+        performed_by=user_id,
         movement_type=movement_type.value,
         quantity=quantity,
         unit=unit,
-        stock_before=stock_before,
-        stock_after=stock_after,
-        reference=reference,
-        notes=notes,
-        user_id=user_id
+        reference_type="order" if order_id else "manual",
+        reference_id=order_id,
+        reason=reference,
+        notes=notes
     )
 
     db.add(movement)
+    await db.flush()
 
-    # Mettre à jour le stock du produit/variante
-    if variant_id:
-        variant.stock_quantity = stock_after
-    else:
-        if unit == product.primary_unit:
-            product.stock_quantity_primary = stock_after
-        elif unit == product.secondary_unit:
-            product.stock_quantity_secondary = stock_after
-        else:
-            product.stock_quantity_primary = stock_after
+    # Champs de la réponse qui ne sont pas des colonnes
+    movement.stock_before = stock_before
+    movement.stock_after = stock_after
+    movement.order_id = order_id
+    movement.user_id = user_id
+    movement.reference = reference
 
-    await db.flush()
     return movement
 
 
+async def apply_stock_deltas(
+    db: AsyncSession,
+    product_deltas: Dict[UUID, List[Decimal]],
+    variant_deltas: Dict[UUID, Decimal]
+) -> None:
+    """
+    Applique des variations de stock en une requête par table
+
+    - **product_deltas**: {product_id: [variation primaire, variation secondaire]}
+    - **variant_deltas**: {variant_id: variation}
+
+    Les lignes doivent avoir été verrouillées et les soldes vérifiés par l'appelant.
+    """
+    if product_deltas:
+        product_values = values(
+            column("id", PGUUID(as_uuid=True)),
+            column("delta_primary", Numeric(15, 3)),
+            column("delta_secondary", Numeric(15, 3)),
+            name="deltas"
+        ).data([(product_id, delta[0], delta[1]) for product_id, delta in product_deltas.items()])
+        await db.execute(
+            update(Product)
+            .where(Product.id == product_values.c.id)
+            .values(
+                stock_quantity_primary=(
+                    func.coalesce(Product.stock_quantity_primary, 0) + product_values.c.delta_primary
+                ),
+                stock_quantity_secondary=(
+                    func.coalesce(Product.stock_quantity_secondary, 0) + product_values.c.delta_secondary
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    if variant_deltas:
+        variant_values = values(
+            column("id", PGUUID(as_uuid=True)),
+            column("delta", Numeric(15, 3)),
+            name="deltas"
+        ).data(list(variant_deltas.items()))
+        await db.execute(
+            update(ProductVariant)
+            .where(ProductVariant.id == variant_values.c.id)
+            .values(stock_quantity=func.coalesce(ProductVariant.stock_quantity, 0) + variant_values.c.delta)
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def apply_bulk_stock_movements(
+    db: AsyncSession,
+    store_id: UUID,
+    user_id: UUID,
+    data: BulkStockMovementCreate
+) -> BulkStockMovementResult:
+    """
+    Applique un mouvement de stock groupé dans la transaction courante
+
+    Les produits puis les variantes concernés sont verrouillés (FOR UPDATE)
+    par ordre d'id pour éviter les interblocages entre envois concurrents.
+    Les quantités sont mises à jour en une requête UPDATE ... FROM (VALUES ...)
+    par table et les mouvements insérés en une seule fois. Comme pour
+    create_stock_movement, les caches sont invalidés par l'appelant après
+    le COMMIT.
+    """
+    sign = 1 if data.movement_type in INCOMING_MOVEMENTS else -1
+
+    # Verrouiller les produits concernés
+    product_ids = sorted({line.product_id for line in data.lines})
+    result = await db.execute(
+        select(
+            Product.id,
+            Product.stock_quantity_primary,
+            Product.stock_quantity_secondary,
+            Product.secondary_unit,
+            Product.track_stock
+        )
+        .where(Product.store_id == store_id, Product.id.in_(product_ids))
+        .order_by(Product.id)
+        .with_for_update()
+    )
+    products = {row.id: row for row in result.all()}
+
+    missing = [str(product_id) for product_id in product_ids if product_id not in products]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Produits non trouvés: {', '.join(missing)}"
+        )
+
+    untracked = [str(row.id) for row in products.values() if not row.track_stock]
+    if untracked:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Produits non suivis en stock: {', '.join(untracked)}"
+        )
+
+    # Verrouiller les variantes concernées
+    variants = {}
+    variant_ids = sorted({line.variant_id for line in data.lines if line.variant_id})
+    if variant_ids:
+        result = await db.execute(
+            select(ProductVariant.id, ProductVariant.product_id, ProductVariant.stock_quantity)
+            .where(ProductVariant.id.in_(variant_ids))
+            .order_by(ProductVariant.id)
+            .with_for_update()
+        )
+        variants = {row.id: row for row in result.all()}
+
+    # Calcul des soldes ligne par ligne (ordre de la requête)
+    balances: Dict[Tuple[str, UUID], Decimal] = {}
+    items = []
+    movement_rows = []
+
+    for line in data.lines:
+        product = products[line.product_id]
+        quantity = Decimal(str(line.quantity))
+
+        if line.variant_id:
+            variant = variants.get(line.variant_id)
+            if not variant or variant.product_id != line.product_id:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Variante non trouvée: {line.variant_id}"
+                )
+            key = ("variant", line.variant_id)
+            initial = variant.stock_quantity
+        elif line.unit == "secondary" or (product.secondary_unit and line.unit == product.secondary_unit):
+            key = ("secondary", line.product_id)
+            initial = product.stock_quantity_secondary
+        else:
+            key = ("primary", line.product_id)
+            initial = product.stock_quantity_primary
+
+        stock_before = balances.get(key, initial or Decimal("0"))
+        stock_after = stock_before + sign * quantity
+        if stock_after < 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Stock insuffisant pour le produit {line.product_id}. "
+                       f"Stock actuel: {stock_before}, demandé: {quantity}"
+            )
+        balances[key] = stock_after
+
+        items.append(BulkStockMovementLineResult(
+            product_id=line.product_id,
+            variant_id=line.variant_id,
+            quantity=float(quantity),
+            stock_before=float(stock_before),
+            stock_after=float(stock_after)
+        ))
+        movement_rows.append({
+            "id": uuid4(),
+            "store_id": store_id,
+            "product_id": line.product_id,
+            "variant_id": line.variant_id,
+            "performed_by": user_id,
+            "movement_type": data.movement_type.value,
+            "quantity": quantity,
+            "unit": line.unit,
+            "reference_type": "manual",
+            "reason": data.reason,
+            "notes": line.notes
+        })
+
+    # Variations nettes par produit et par variante
+    product_deltas: Dict[UUID, List[Decimal]] = {}
+    variant_deltas: Dict[UUID, Decimal] = {}
+    for (kind, target_id), stock_after in balances.items():
+        if kind == "variant":
+            variant_deltas[target_id] = stock_after - (variants[target_id].stock_quantity or 0)
+        else:
+            deltas = product_deltas.setdefault(target_id, [Decimal("0"), Decimal("0")])
+            if kind == "primary":
+                deltas[0] = stock_after - (products[target_id].stock_quantity_primary or 0)
+            else:
+                deltas[1] = stock_after - (products[target_id].stock_quantity_secondary or 0)
+
+    await apply_stock_deltas(db, product_deltas, variant_deltas)
+
+    # Insertion groupée des mouvements
+    await db.execute(insert(StockMovement.__table__), movement_rows)
+
+    return BulkStockMovementResult(
+        movement_type=data.movement_type,
+        movements_created=len(movement_rows),
+        products_updated=len(product_deltas),
+        variants_updated=len(variant_deltas),
+        items=items
+    )
+
+
 # ========== ENDPOINTS MOUVEMENTS DE STOCK ==========
 
 @router.post("/movements", response_model=StockMovementResponse, status_code=status.HTTP_201_CREATED)
@@ -192,15 +509,46 @@ async def create_manual_stock_movement(
     )
 
     await db.commit()
+    invalidate_stock_summary(movement_data.store_id)
+    invalidate_barcode_product(movement_data.store_id, movement_data.product_id)
     await db.refresh(movement)
 
     return movement
 
 
+@router.post("/movements/bulk", response_model=BulkStockMovementResult, status_code=status.HTTP_201_CREATED)
+async def create_bulk_stock_movements(
+    movement_data: BulkStockMovementCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Créer un mouvement de stock groupé (ex: réception d'une livraison fournisseur)
+
+    Toutes les lignes sont appliquées dans une seule transaction : si une
+    ligne échoue (produit inconnu, stock insuffisant), rien n'est enregistré.
+    """
+    result = await apply_bulk_stock_movements(
+        db,
+        current_user.store_id,
+        current_user.id,
+        movement_data
+    )
+
+    await db.commit()
+    invalidate_stock_summary(current_user.store_id)
+    for product_id in {line.product_id for line in movement_data.lines}:
+        invalidate_barcode_product(current_user.store_id, product_id)
+
+    return result
+
+
 @router.get("/movements", response_model=StockMovementListResponse)
 async def list_stock_movements(
     page: int = Query(1, ge=1, description="Numéro de page"),
     page_size: int = Query(50, ge=1, le=100, description="Taille de la page"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (remplace page)"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="Calcul du total: exact, estimated, none"),
     product_id: Optional[UUID] = Query(None, description="Filtrer par produit"),
     movement_type: Optional[MovementType] = Query(None, description="Filtrer par type"),
     date_from: Optional[datetime] = Query(None, description="Date de début"),
@@ -210,88 +558,190 @@ async def list_stock_movements(
 ):
     """
     Lister les mouvements de stock avec pagination et filtres
-    """
-    # Construction de la requête
-    query = select(StockMovement).where(StockMovement.store_id == current_user.store_id)
-
-    # Filtres
-    if product_id:
-        query = query.where(StockMovement.product_id == product_id)
 
-    if movement_type:
-        query = query.where(StockMovement.movement_type == movement_type.value)
-
-    if date_from:
-        query = query.where(StockMovement.created_at >= date_from)
-
-    if date_to:
-        query = query.where(StockMovement.created_at <= date_to)
+    Pour le défilement infini, utiliser `cursor` (temps constant quelle que
+    soit la profondeur) et `count_mode=none`.
+    """
+    query = select(StockMovement).where(
+        *movement_filters(current_user.store_id, product_id, movement_type, date_from, date_to)
+    )
 
     # Compter le total
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-
-    # Tri et pagination
-    query = query.order_by(desc(StockMovement.created_at))
-    query = query.offset((page - 1) * page_size).limit(page_size)
+    total = await count_total(db, query, count_mode)
+
+    # Tri et pagination (curseur ou numéro de page)
+    query = apply_keyset(
+        query,
+        StockMovement.created_at,
+        StockMovement.id,
+        cursor,
+        datetime.fromisoformat,
+        page_size,
+        descending=True
+    )
+    if not cursor:
+        query = query.offset((page - 1) * page_size)
 
     # Exécution
     result = await db.execute(query)
-    movements = result.scalars().all()
+    movements, cursor_after = next_cursor(
+        result.scalars().all(),
+        page_size,
+        lambda movement: (movement.created_at, movement.id)
+    )
 
     return StockMovementListResponse(
         items=movements,
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
+        total_pages=total_pages(total, page_size),
+        next_cursor=cursor_after
     )
 
 
-@router.get("/movements/{product_id}/history", response_model=List[StockMovementWithProduct])
+@router.get("/movements/export")
+async def export_stock_movements(
+    export_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="Format: csv, ndjson"),
+    product_id: Optional[UUID] = Query(None, description="Filtrer par produit"),
+    movement_type: Optional[MovementType] = Query(None, description="Filtrer par type"),
+    date_from: Optional[datetime] = Query(None, description="Date de début"),
+    date_to: Optional[datetime] = Query(None, description="Date de fin"),
+    current_user: User = Depends(get_current_user),
+    session_factory: async_sessionmaker = Depends(get_session_factory)
+):
+    """
+    Exporter le journal des mouvements de stock (CSV ou NDJSON, en flux)
+
+    Mêmes filtres que la liste, ordre chronologique. Les lignes sont lues
+    par curseur serveur et envoyées par blocs : une année de mouvements
+    s'exporte en mémoire constante.
+    """
+    query = (
+        select(
+            StockMovement.id,
+            StockMovement.created_at,
+            Product.sku.label("product_sku"),
+            Product.name.label("product_name"),
+            ProductVariant.sku.label("variant_sku"),
+            StockMovement.movement_type,
+            StockMovement.quantity,
+            StockMovement.unit,
+            StockMovement.reference_type,
+            StockMovement.reference_id,
+            StockMovement.reason,
+            StockMovement.notes,
+            StockMovement.performed_by
+        )
+        .join(Product, Product.id == StockMovement.product_id)
+        .outerjoin(ProductVariant, ProductVariant.id == StockMovement.variant_id)
+        .where(*movement_filters(current_user.store_id, product_id, movement_type, date_from, date_to))
+        .order_by(StockMovement.created_at, StockMovement.id)
+    )
+
+    return export_response(session_factory, query, export_format, "mouvements_stock")
+
+
+@router.get("/movements/{product_id}/history", response_model=StockHistoryResponse)
 async def get_product_stock_history(
     product_id: UUID,
     limit: int = Query(50, ge=1, le=200, description="Nombre de mouvements"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page précédente (next_cursor)"),
+    variant_id: Optional[UUID] = Query(None, description="Filtrer par variante"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Récupérer l'historique des mouvements de stock d'un produit
+
+    Mouvements, noms de variantes et solde après chaque mouvement en une
+    seule requête. Le solde part du stock actuel (de la variante, ou du
+    produit en unité primaire) et remonte le journal avec une fonction de
+    fenêtre : il reste exact sur toutes les pages.
     """
     # Vérifier que le produit existe
     product = await get_product_with_stock(product_id, db, current_user.store_id)
 
-    # Récupérer les mouvements
-    query = (
-        select(StockMovement)
+    # Variation signée, convertie en unité primaire pour le stock du produit
+    secondary = and_(
+        StockMovement.variant_id.is_(None),
+        or_(
+            StockMovement.unit == "secondary",
+            and_(StockMovement.unit == product.secondary_unit, StockMovement.unit != product.primary_unit)
+        )
+    )
+    change = (
+        case((StockMovement.movement_type.in_(INCOMING_MOVEMENT_TYPES), 1), else_=-1)
+        * case(
+            (secondary, StockMovement.quantity / (product.units_per_primary or 1)),
+            else_=StockMovement.quantity
+        )
+    )
+    # Somme des mouvements plus récents de la même variante (ou du produit)
+    newer = func.sum(change).over(
+        partition_by=StockMovement.variant_id,
+        order_by=(StockMovement.created_at.desc(), StockMovement.id.desc()),
+        rows=(None, -1)
+    )
+    current_stock = case(
+        (StockMovement.variant_id.is_not(None), func.coalesce(ProductVariant.stock_quantity, 0)),
+        else_=func.coalesce(Product.stock_quantity_primary, 0)
+    )
+
+    ledger = (
+        select(
+            StockMovement.id,
+            StockMovement.variant_id,
+            ProductVariant.variant_name,
+            StockMovement.movement_type,
+            StockMovement.quantity,
+            StockMovement.unit,
+            change.label("quantity_change"),
+            (current_stock - func.coalesce(newer, 0)).label("stock_after"),
+            StockMovement.reference_type,
+            StockMovement.reference_id,
+            StockMovement.reason,
+            StockMovement.notes,
+            StockMovement.performed_by,
+            StockMovement.created_at
+        )
+        .join(Product, Product.id == StockMovement.product_id)
+        .outerjoin(ProductVariant, ProductVariant.id == StockMovement.variant_id)
         .where(StockMovement.product_id == product_id)
-        .order_by(desc(StockMovement.created_at))
-        .limit(limit)
+        .subquery()
+    )
+
+    # Les filtres et la page s'appliquent après le calcul du solde
+    query = select(ledger)
+    if variant_id:
+        query = query.where(ledger.c.variant_id == variant_id)
+    query = apply_keyset(
+        query,
+        ledger.c.created_at,
+        ledger.c.id,
+        cursor,
+        datetime.fromisoformat,
+        limit,
+        descending=True
     )
 
     result = await db.execute(query)
-    movements = result.scalars().all()
-
-    # Enrichir avec les informations produit
-    movements_with_product = []
-    for movement in movements:
-        movement_dict = movement.__dict__.copy()
-        movement_dict['product_name'] = product.name
-        movement_dict['product_sku'] = product.sku
-
-        # Ajouter le nom de la variante si applicable
-        if movement.variant_id:
-            variant_result = await db.execute(
-                select(ProductVariant).where(ProductVariant.id == movement.variant_id)
+    rows, cursor_after = next_cursor(result.all(), limit, lambda row: (row.created_at, row.id))
+
+    return StockHistoryResponse(
+        product_id=product.id,
+        product_name=product.name,
+        product_sku=product.sku,
+        primary_unit=product.primary_unit,
+        items=[
+            StockHistoryEntry(
+                **row._mapping,
+                stock_before=row.stock_after - row.quantity_change
             )
-            variant = variant_result.scalar_one_or_none()
-            if variant:
-                movement_dict['variant_name'] = str(variant.attributes)
-
-        movements_with_product.append(StockMovementWithProduct(**movement_dict))
-
-    return movements_with_product
+            for row in rows
+        ],
+        next_cursor=cursor_after
+    )
 
 
 # ========== ENDPOINTS AJUSTEMENT DE STOCK ==========
@@ -307,17 +757,21 @@ async def adjust_stock(
 
     Crée automatiquement un mouvement d'ajustement (positif ou négatif)
     """
-    # Vérifier que le produit existe
+    # Vérifier que le produit existe (verrouillé jusqu'à la fin de l'ajustement)
     product = await get_product_with_stock(
         adjustment.product_id,
         db,
-        current_user.store_id
+        current_user.store_id,
+        for_update=True
     )
 
     # Récupérer le stock actuel
     if adjustment.variant_id:
         result = await db.execute(
-            select(ProductVariant).where(ProductVariant.id == adjustment.variant_id)
+            select(ProductVariant)
+            .where(ProductVariant.id == adjustment.variant_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
         )
         variant = result.scalar_one_or_none()
         if not variant:
@@ -330,7 +784,7 @@ async def adjust_stock(
             current_stock = product.stock_quantity_secondary
 
     # Calculer la différence
-    difference = adjustment.new_quantity - current_stock
+    difference = Decimal(str(adjustment.new_quantity)) - (current_stock or 0)
 
     if difference == 0:
         raise HTTPException(
@@ -356,6 +810,8 @@ async def adjust_stock(
     )
 
     await db.commit()
+    invalidate_stock_summary(current_user.store_id)
+    invalidate_barcode_product(current_user.store_id, adjustment.product_id)
     await db.refresh(movement)
 
     return movement
@@ -363,26 +819,63 @@ async def adjust_stock(
 
 # ========== ENDPOINTS ÉTAT DU STOCK ==========
 
-@router.get("/current", response_model=List[ProductStockInfo])
+@router.get("/current", response_model=ProductStockListResponse)
 async def get_current_stock(
     category_id: Optional[UUID] = Query(None, description="Filtrer par catégorie"),
     in_stock_only: bool = Query(False, description="Uniquement produits en stock"),
     low_stock_only: bool = Query(False, description="Uniquement produits en stock faible"),
     sort_by: str = Query("name", description="Tri: name, stock, value"),
+    page_size: int = Query(100, ge=1, le=500, description="Taille de la page"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Récupérer l'état actuel du stock de tous les produits
+
+    Pagination par curseur: passer `next_cursor` de la réponse précédente
+    dans `cursor` pour obtenir la page suivante.
     """
+    # Date du dernier mouvement, calculée dans la même requête (sous-requête corrélée)
+    last_movement_date = (
+        select(StockMovement.created_at)
+        .where(StockMovement.product_id == Product.id)
+        .order_by(desc(StockMovement.created_at))
+        .limit(1)
+        .correlate(Product)
+        .scalar_subquery()
+    )
+
+    # Clé de tri (toujours complétée par l'ID pour un ordre total)
+    if sort_by == "stock":
+        sort_key = func.coalesce(Product.stock_quantity_primary, 0)
+        descending = False
+        key_type = Decimal
+    elif sort_by == "value":
+        sort_key = (
+            func.coalesce(Product.stock_quantity_primary, 0)
+            * func.coalesce(Product.purchase_price, 0)
+        )
+        descending = True
+        key_type = Decimal
+    else:
+        sort_key = Product.name
+        descending = False
+        key_type = str
+
     # Construction de la requête
     query = (
-        select(Product)
+        select(
+            Product,
+            Category.name.label("category_name"),
+            last_movement_date.label("last_movement_date"),
+            sort_key.label("sort_key")
+        )
+        .outerjoin(Category, Product.category_id == Category.id)
         .where(
             Product.store_id == current_user.store_id,
             Product.track_stock == True
         )
-        .options(selectinload(Product.category))
     )
 
     # Filtres
@@ -402,33 +895,27 @@ async def get_current_stock(
             Product.stock_quantity_primary <= Product.stock_alert_threshold
         )
 
-    # Tri
-    if sort_by == "stock":
-        query = query.order_by(Product.stock_quantity_primary)
-    elif sort_by == "value":
-        query = query.order_by(desc(Product.stock_quantity_primary * Product.prix_achat))
-    else:
-        query = query.order_by(Product.name)
+    # Tri, reprise après le curseur et limite
+    query = apply_keyset(query, sort_key, Product.id, cursor, key_type, page_size, descending)
 
     result = await db.execute(query)
-    products = result.scalars().all()
+    rows, cursor_after = next_cursor(
+        result.all(),
+        page_size,
+        lambda row: (row.sort_key, row[0].id)
+    )
 
     # Construire la réponse
     stock_info_list = []
-    for product in products:
-        # Récupérer le dernier mouvement
-        last_movement_result = await db.execute(
-            select(StockMovement.created_at)
-            .where(StockMovement.product_id == product.id)
-            .order_by(desc(StockMovement.created_at))
-            .limit(1)
-        )
-        last_movement_date = last_movement_result.scalar_one_or_none()
+    for product, category_name, last_movement, _ in rows:
+        stock_primary = product.stock_quantity_primary or 0
+        alert_threshold = product.stock_alert_threshold or 0
+        cost_price = product.purchase_price or 0
 
         # Calculer le statut du stock
-        if product.stock_quantity_primary <= 0:
+        if stock_primary <= 0:
             stock_status = "out_of_stock"
-        elif product.stock_quantity_primary <= product.stock_alert_threshold:
+        elif stock_primary <= alert_threshold:
             stock_status = "low_stock"
         else:
             stock_status = "in_stock"
@@ -437,23 +924,28 @@ async def get_current_stock(
             product_id=product.id,
             product_name=product.name,
             product_sku=product.sku,
-            category_name=product.category.name if product.category else None,
-            stock_quantity_primary=float(product.stock_quantity_primary),
+            category_name=category_name,
+            stock_quantity_primary=float(stock_primary),
             primary_unit=product.primary_unit,
-            stock_quantity_secondary=float(product.stock_quantity_secondary),
+            stock_quantity_secondary=float(product.stock_quantity_secondary or 0),
             secondary_unit=product.secondary_unit,
-            stock_alert_threshold=float(product.stock_alert_threshold),
-            is_below_threshold=product.stock_quantity_primary <= product.stock_alert_threshold,
+            stock_alert_threshold=float(alert_threshold),
+            is_below_threshold=stock_primary <= alert_threshold,
             stock_status=stock_status,
-            cost_price=float(product.prix_achat),
-            total_stock_value=float(product.stock_quantity_primary * product.prix_achat),
-            last_movement_date=last_movement_date,
+            cost_price=float(cost_price),
+            total_stock_value=float(stock_primary * cost_price),
+            last_movement_date=last_movement,
             has_variants=product.has_variants,
             track_stock=product.track_stock
         )
         stock_info_list.append(stock_info)
 
-    return stock_info_list
+    return ProductStockListResponse(
+        items=stock_info_list,
+        page_size=page_size,
+        has_more=cursor_after is not None,
+        next_cursor=cursor_after
+    )
 
 
 @router.get("/low-stock", response_model=List[LowStockAlert])
@@ -527,81 +1019,24 @@ async def get_low_stock_alerts(
 
 @router.get("/summary", response_model=StockSummary)
 async def get_stock_summary(
+    use_cache: bool = Query(True, description="Autoriser la réponse depuis le cache"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Récupérer un résumé global du stock
-    """
-    # Total de produits suivis en stock
-    result = await db.execute(
-        select(func.count(Product.id))
-        .where(
-            Product.store_id == current_user.store_id,
-            Product.track_stock == True
-        )
-    )
-    total_products = result.scalar() or 0
-
-    # Produits en stock
-    result = await db.execute(
-        select(func.count(Product.id))
-        .where(
-            Product.store_id == current_user.store_id,
-            Product.track_stock == True,
-            Product.stock_quantity_primary > 0
-        )
-    )
-    products_in_stock = result.scalar() or 0
 
-    # Produits en stock faible
-    result = await db.execute(
-        select(func.count(Product.id))
-        .where(
-            Product.store_id == current_user.store_id,
-            Product.track_stock == True,
-            Product.stock_quantity_primary > 0,
-            Product.stock_quantity_primary <= Product.stock_alert_threshold
-        )
-    )
-    products_low_stock = result.scalar() or 0
-
-    # Produits en rupture
-    result = await db.execute(
-        select(func.count(Product.id))
-        .where(
-            Product.store_id == current_user.store_id,
-            Product.track_stock == True,
-            Product.stock_quantity_primary <= 0
-        )
-    )
-    products_out_of_stock = result.scalar() or 0
+    Calculé en une seule requête; mis en cache quelques secondes par magasin
+    (invalidé après chaque mouvement de stock et écriture de produit).
+    """
+    if use_cache and settings.STOCK_SUMMARY_CACHE_TTL > 0:
+        summary = stock_summary_cache.get(current_user.store_id)
+        if summary is not None:
+            return summary
 
-    # Valeur totale du stock
-    result = await db.execute(
-        select(func.sum(Product.stock_quantity_primary * Product.prix_achat))
-        .where(
-            Product.store_id == current_user.store_id,
-            Product.track_stock == True
-        )
-    )
-    total_stock_value = result.scalar() or 0.0
+    summary = await compute_stock_summary(db, current_user.store_id)
 
-    # Produits avec variantes
-    result = await db.execute(
-        select(func.count(Product.id))
-        .where(
-            Product.store_id == current_user.store_id,
-            Product.has_variants == True
-        )
-    )
-    products_with_variants = result.scalar() or 0
+    if settings.STOCK_SUMMARY_CACHE_TTL > 0:
+        stock_summary_cache.set(current_user.store_id, summary)
 
-    return StockSummary(
-        total_products=total_products,
-        products_in_stock=products_in_stock,
-        products_low_stock=products_low_stock,
-        products_out_of_stock=products_out_of_stock,
-        total_stock_value=float(total_stock_value),
-        products_with_variants=products_with_variants
-    )
+    return summary
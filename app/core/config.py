@@ -4,7 +4,7 @@ Gère toutes les variables d'environnement et paramètres
 """
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from pydantic import field_validator
 import secrets
 import json
@@ -24,6 +24,57 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 jours
     ALGORITHM: str = "HS256"
 
+    # Threads dédiés à bcrypt (hors de la boucle d'événements), calculs simultanés au plus
+    PASSWORD_HASH_WORKERS: int = 2
+
+    # Bibliothèque de vérification des tokens: pyjwt (plus rapide) ou jose
+    JWT_BACKEND: str = "pyjwt"
+
+    # Cache des tokens vérifiés (évite de revérifier la signature à chaque requête)
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_TTL: int = 300  # secondes, borné par l'expiration du token
+
+    # Cache des utilisateurs authentifiés (évite un SELECT users par requête)
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_USER_CACHE_TTL: int = 60  # secondes
+
+    # Cache du résumé de stock par magasin (0 pour désactiver)
+    STOCK_SUMMARY_CACHE_TTL: int = 15  # secondes
+
+    # Cache de l'arbre des catégories par magasin
+    CATEGORY_TREE_CACHE_TTL: int = 300  # secondes
+
+    # Index mémoire des codes-barres par magasin (lecture en caisse)
+    BARCODE_CACHE_TTL: int = 300  # secondes
+    BARCODE_CACHE_WARMUP: bool = True  # précharger au démarrage
+    BARCODE_CACHE_NOTIFY: bool = True  # écouter les modifications des autres processus (LISTEN/NOTIFY)
+
+    # Import de produits en masse (CSV/XLSX)
+    PRODUCT_IMPORT_CHUNK_SIZE: int = 1000  # lignes validées et chargées par bloc
+    PRODUCT_IMPORT_MAX_ERRORS: int = 1000  # lignes rejetées détaillées dans la réponse
+
+    # Exports en flux (CSV, NDJSON) : lignes lues par le curseur serveur et envoyées par bloc
+    EXPORT_CHUNK_ROWS: int = 1000
+
+    # Index mémoire de préfixes des clients par magasin (autocomplete sans requête)
+    CLIENT_SEARCH_INDEX: bool = False
+    CLIENT_SEARCH_INDEX_TTL: int = 600  # secondes
+
+    # Cache des rapports produits (top ventes, ABC) par magasin et période (0 pour désactiver)
+    PRODUCT_REPORT_CACHE_TTL: int = 60  # secondes, période incluant aujourd'hui
+    PRODUCT_REPORT_CLOSED_CACHE_TTL: int = 3600  # secondes, période terminée
+
+    # Journalisation
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json, text
+    LOG_SAMPLE_RATE: float = 1.0  # part des requêtes journalisées (0 à 1)
+    LOG_ROUTE_SAMPLE_RATES: Dict[str, float] = {
+        "/health": 0.01,
+        "/health/ready": 0.01,
+        "/metrics": 0.0,
+    }
+    LOG_SLOW_REQUEST_MS: int = 1000  # toujours journalisées au-delà
+
     # Database PostgreSQL (Supabase)
     DATABASE_URL: str
     DATABASE_POOL_SIZE: int = 3  # Réduit pour plan starter Render
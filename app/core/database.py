@@ -3,12 +3,17 @@ Configuration de la base de données
 SQLAlchemy avec asyncpg pour PostgreSQL asynchrone
 """
 
+import asyncio
+from typing import AsyncGenerator, Callable, Optional
+
+import asyncpg
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import NullPool, QueuePool
-from typing import AsyncGenerator
+from sqlalchemy.pool import NullPool
 
 from app.core.config import settings
+from app.core.logs import logger
+from app.core.metrics import InstrumentedAsyncQueuePool, instrument_engine
 
 
 # Configuration du moteur SQLAlchemy asynchrone
@@ -20,10 +25,13 @@ engine = create_async_engine(
     pool_timeout=settings.DATABASE_POOL_TIMEOUT,
     pool_recycle=settings.DATABASE_POOL_RECYCLE,
     pool_pre_ping=True,  # Vérifie la connexion avant utilisation
-    poolclass=QueuePool,
+    poolclass=InstrumentedAsyncQueuePool,  # Pool asyncio avec mesure de l'attente de connexion
     future=True
 )
 
+# Comptage des requêtes SQL par requête HTTP (voir app/core/metrics.py)
+instrument_engine(engine.sync_engine)
+
 # Session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -48,11 +56,13 @@ async def init_db():
             # Test de connexion
             from sqlalchemy import text
             await conn.execute(text("SELECT 1"))
-        print("✅ Connexion à la base de données établie")
+        logger.info("Connexion à la base de données établie")
     except Exception as e:
         # Ne pas crasher l'app si la DB n'est pas accessible au démarrage
-        print(f"⚠️ Avertissement: Connexion à la base de données échouée: {e}")
-        print("⚠️ L'application démarre quand même. La DB sera vérifiée au premier appel.")
+        logger.warning(
+            "Connexion à la base de données échouée: %s. "
+            "L'application démarre quand même, la DB sera vérifiée au premier appel.", e
+        )
 
 
 async def check_db_connection() -> bool:
@@ -90,6 +100,17 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+def get_session_factory() -> async_sessionmaker:
+    """
+    Dépendance FastAPI pour obtenir la fabrique de sessions
+
+    Pour un traitement qui se poursuit après l'endpoint (réponse en flux) :
+    la session de get_db est fermée avant l'envoi du corps de la réponse,
+    le traitement ouvre donc sa propre session.
+    """
+    return AsyncSessionLocal
+
+
 async def get_db_context():
     """
     Context manager pour utiliser la DB en dehors de FastAPI
@@ -108,3 +129,47 @@ async def get_db_context():
             raise
         finally:
             await session.close()
+
+
+async def listen_channel(
+    channel: str,
+    on_payload: Callable[[str], None],
+    on_reconnect: Callable[[], None],
+    listening: Optional[asyncio.Event] = None,
+    retry_delay: float = 5
+) -> None:
+    """
+    Écoute un canal LISTEN/NOTIFY jusqu'à annulation de la tâche
+
+    La connexion est dédiée (hors du pool) et rétablie après une coupure ;
+    les notifications émises entre-temps sont perdues, on_reconnect est donc
+    appelé une fois l'écoute rétablie (vider un cache, par exemple).
+    `listening` est positionné dès que la première écoute est active.
+
+    Usage:
+        task = asyncio.create_task(listen_channel("barcode_cache", on_change, cache.clear))
+    """
+    dsn = settings.get_database_url().replace("+asyncpg", "", 1)
+    missed = False
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            await connection.add_listener(channel, lambda *args: on_payload(args[3]))
+            if missed:
+                on_reconnect()
+            if listening is not None:
+                listening.set()
+            await lost.wait()
+            logger.warning("Écoute du canal %s interrompue, reconnexion", channel)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Écoute du canal %s impossible: %s", channel, e)
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        missed = True
+        await asyncio.sleep(retry_delay)
@@ -0,0 +1,94 @@
+"""
+Exports en flux (CSV, NDJSON)
+Lecture par curseur serveur et envoi par blocs : la mémoire reste constante
+quel que soit le nombre de lignes exportées
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, List, Sequence
+from uuid import UUID
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+
+
+class ExportFormat(str, Enum):
+    """Format d'export"""
+    CSV = "csv"
+    NDJSON = "ndjson"  # un objet JSON par ligne
+
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+
+def export_value(value: Any) -> Any:
+    """Valeur exportable (montants en texte, sans perte de précision)"""
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_rows(rows: Sequence[Sequence[Any]], columns: List[str], export_format: ExportFormat) -> bytes:
+    """Encode un bloc de lignes"""
+    if export_format == ExportFormat.NDJSON:
+        return "".join(
+            json.dumps(dict(zip(columns, map(export_value, row))), ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else export_value(value) for value in row])
+    return buffer.getvalue().encode("utf-8")
+
+
+async def stream_query(
+    session_factory: async_sessionmaker,
+    query: Select,
+    export_format: ExportFormat
+) -> AsyncIterator[bytes]:
+    """
+    Exécute la requête avec un curseur serveur et produit l'export bloc par bloc
+
+    La requête doit sélectionner des colonnes (pas des entités ORM) : leurs
+    noms servent d'en-tête CSV et de clés JSON. La session est ouverte ici,
+    pour la durée de l'envoi, et fermée même si le client se déconnecte.
+    """
+    columns = [column.name for column in query.selected_columns]
+
+    if export_format == ExportFormat.CSV:
+        # BOM : Excel reconnaît l'UTF-8 (les accents), l'import produits le tolère
+        yield "\ufeff".encode("utf-8") + encode_rows([columns], columns, export_format)
+
+    async with session_factory() as session:
+        result = await session.stream(query.execution_options(yield_per=settings.EXPORT_CHUNK_ROWS))
+        async for rows in result.partitions():
+            yield encode_rows(rows, columns, export_format)
+
+
+def export_response(
+    session_factory: async_sessionmaker,
+    query: Select,
+    export_format: ExportFormat,
+    filename: str
+) -> StreamingResponse:
+    """Réponse HTTP en flux, téléchargée sous `filename`.csv ou .ndjson"""
+    return StreamingResponse(
+        stream_query(session_factory, query, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format.value}"'}
+    )
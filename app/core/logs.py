@@ -0,0 +1,151 @@
+"""
+Journalisation structurée
+Lignes JSON écrites par un thread dédié (QueueHandler + QueueListener) pour ne
+jamais bloquer la boucle asyncio sur un stdout lent, avec échantillonnage des
+routes à fort trafic
+"""
+
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+logger = logging.getLogger("commercia")
+
+# Contexte de la requête HTTP courante (request_id, store_id, user_id...)
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_context", default=None)
+
+# Attributs standards d'un LogRecord, exclus des champs supplémentaires
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+_traceback_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        context = getattr(record, "context", None)
+        if context:
+            data.update(context)
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key != "context":
+                data[key] = value
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Format lisible pour le développement"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        exception = getattr(record, "exception", None)
+        return f"{text}\n{exception}" if exception else text
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler qui capture le contexte de la requête au moment de l'appel
+
+    Le contexte est copié sur l'enregistrement avant son passage au thread
+    d'écriture, où les ContextVar de la requête ne sont plus visibles.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        context = _request_context.get()
+        if context:
+            record.context = dict(context)
+        if record.exc_info:
+            # Trace formatée ici, QueueHandler la fusionnerait sinon dans le message
+            record.exception = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+            record.exc_text = None
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+def setup_logging() -> None:
+    """Configure le logger de l'application et démarre le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    logger.handlers = [ContextQueueHandler(log_queue)]
+    logger.setLevel(settings.LOG_LEVEL)
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Vide la file d'attente et arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def start_request_context(request_id: Optional[str] = None) -> Dict[str, Any]:
+    """Ouvre le contexte de journalisation de la requête courante"""
+    context = {"request_id": (request_id or uuid.uuid4().hex)[:64]}
+    _request_context.set(context)
+    return context
+
+
+def bind_request_context(**fields: Any) -> None:
+    """
+    Ajoute des champs au contexte de la requête courante
+
+    Le dictionnaire est partagé avec le middleware : un champ ajouté par une
+    dépendance (ex: store_id après authentification) apparaît dans la ligne
+    de log de fin de requête.
+    """
+    context = _request_context.get()
+    if context is not None:
+        context.update({key: str(value) for key, value in fields.items() if value is not None})
+
+
+def should_log_request(route: str, status_code: int, duration: float) -> bool:
+    """
+    Échantillonnage des logs d'accès
+
+    Les erreurs et les requêtes lentes sont toujours journalisées, les autres
+    selon le taux de la route (LOG_ROUTE_SAMPLE_RATES) ou LOG_SAMPLE_RATE.
+    """
+    if status_code >= 500 or duration * 1000 >= settings.LOG_SLOW_REQUEST_MS:
+        return True
+    rate = settings.LOG_ROUTE_SAMPLE_RATES.get(route, settings.LOG_SAMPLE_RATE)
+    if rate >= 1:
+        return True
+    return random.random() < rate
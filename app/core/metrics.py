@@ -0,0 +1,203 @@
+"""
+Instrumentation des requêtes
+Nombre de requêtes SQL, temps base de données et attente du pool par requête
+HTTP, exportés au format Prometheus (/metrics) et dans l'en-tête Server-Timing
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.routing import Match
+
+
+class RequestStats:
+    """Compteurs d'une requête HTTP en cours"""
+
+    __slots__ = ("sql_count", "sql_time", "pool_wait")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.pool_wait = 0.0
+
+
+# Statistiques de la requête courante (None hors requête HTTP)
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def start_request() -> RequestStats:
+    """Démarre le comptage pour la requête courante"""
+    stats = RequestStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Retourne les compteurs de la requête courante"""
+    return _current_stats.get()
+
+
+class Histogram:
+    """
+    Histogramme Prometheus minimal avec labels
+
+    Usage:
+        h = Histogram("http_request_duration_seconds", "Durée", ("method", "route"), (0.1, 1))
+        h.observe(0.25, ("GET", "/products/"))
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple[str, ...]) -> None:
+        """Enregistre une observation"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [compteurs par bucket..., somme, total]
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        """Format texte d'exposition Prometheus"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = [(labels, list(series)) for labels, series in self._series.items()]
+
+        for labels, series in sorted(series_items):
+            label_text = ",".join(
+                f'{name}="{_escape_label(value)}"' for name, value in zip(self.labelnames, labels)
+            )
+            prefix = f"{label_text}," if label_text else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-1]}")
+        return "\n".join(lines)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ========== MÉTRIQUES ==========
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Durée des requêtes HTTP",
+    ("method", "route", "status"),
+    LATENCY_BUCKETS
+)
+request_sql_queries = Histogram(
+    "http_request_sql_queries",
+    "Nombre de requêtes SQL par requête HTTP",
+    ("method", "route"),
+    QUERY_COUNT_BUCKETS
+)
+request_db_time = Histogram(
+    "http_request_db_seconds",
+    "Temps cumulé passé en base par requête HTTP",
+    ("method", "route"),
+    LATENCY_BUCKETS
+)
+request_pool_wait = Histogram(
+    "http_request_pool_wait_seconds",
+    "Attente cumulée d'une connexion du pool par requête HTTP",
+    ("method", "route"),
+    LATENCY_BUCKETS
+)
+
+ALL_HISTOGRAMS = (request_duration, request_sql_queries, request_db_time, request_pool_wait)
+
+
+def observe_request(method: str, route: str, status_code: int, duration: float, stats: RequestStats) -> None:
+    """Enregistre les mesures d'une requête terminée"""
+    request_duration.observe(duration, (method, route, str(status_code)))
+    request_sql_queries.observe(stats.sql_count, (method, route))
+    request_db_time.observe(stats.sql_time, (method, route))
+    request_pool_wait.observe(stats.pool_wait, (method, route))
+
+
+def render_metrics() -> str:
+    """Toutes les métriques au format Prometheus"""
+    return "\n\n".join(histogram.render() for histogram in ALL_HISTOGRAMS) + "\n"
+
+
+def server_timing_header(duration: float, stats: RequestStats) -> str:
+    """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+    return (
+        f"total;dur={duration * 1000:.1f}, "
+        f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries", '
+        f"pool;dur={stats.pool_wait * 1000:.1f}"
+    )
+
+
+def route_template(app, scope) -> str:
+    """
+    Chemin déclaré de la route (ex: /api/v1/products/{product_id})
+
+    Évite une série par identifiant dans les labels des métriques.
+    """
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "unmatched"
+
+
+# ========== INSTRUMENTATION SQLALCHEMY ==========
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Pool asyncio qui mesure l'attente d'une connexion"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats = _current_stats.get()
+            if stats is not None:
+                stats.pool_wait += time.perf_counter() - start
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Compte les requêtes SQL et leur durée pour la requête HTTP courante"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_time += time.perf_counter() - start
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start"):
+            connection.info["query_start"].pop()
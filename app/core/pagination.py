@@ -0,0 +1,164 @@
+"""
+Utilitaires de pagination
+Curseurs opaques pour la pagination par clé (keyset) et comptage du total
+"""
+
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement, ColumnElement
+
+
+def _serialize(value: Any) -> Any:
+    """Convertit une valeur de clé de tri en valeur JSON"""
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode les valeurs de la dernière ligne d'une page en curseur opaque
+
+    Usage:
+        next_cursor = encode_cursor(last.created_at, last.id)
+    """
+    payload = json.dumps([_serialize(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: Callable[[Any], Any]) -> List[Any]:
+    """
+    Décode un curseur et convertit chaque valeur avec le type attendu
+
+    Usage:
+        created_at, last_id = decode_cursor(cursor, datetime.fromisoformat, UUID)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("Nombre de valeurs inattendu")
+        return [
+            None if value is None else convert(value)
+            for convert, value in zip(types, values)
+        ]
+    except (ValueError, TypeError, ArithmeticError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide"
+        )
+
+
+class CountMode(str, Enum):
+    """Mode de calcul du total des listes paginées"""
+    EXACT = "exact"          # COUNT(*) sur la requête filtrée
+    ESTIMATED = "estimated"  # Estimation du planificateur pour la requête filtrée (EXPLAIN)
+    NONE = "none"            # Pas de total (pagination par curseur)
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) d'une requête, paramètres liés conservés"""
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def estimate_rows(db: AsyncSession, query: Select) -> int:
+    """Nombre de lignes estimé par le planificateur (la requête n'est pas exécutée)"""
+    result = await db.execute(Explain(query))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_total(
+    db: AsyncSession,
+    query: Select,
+    mode: CountMode
+) -> Optional[int]:
+    """
+    Calcule le total d'une liste selon le mode demandé
+
+    Le mode "estimated" renvoie l'estimation du planificateur pour la requête
+    filtrée (magasin et filtres compris), sans l'exécuter : coût constant,
+    précision celle des statistiques de la table.
+    """
+    if mode == CountMode.NONE:
+        return None
+
+    if mode == CountMode.ESTIMATED:
+        return await estimate_rows(db, query)
+
+    result = await db.execute(select(func.count()).select_from(query.subquery()))
+    return result.scalar() or 0
+
+
+def apply_keyset(
+    query: Select,
+    sort_key: ColumnElement,
+    id_column: ColumnElement,
+    cursor: Optional[str],
+    key_type: Callable[[Any], Any],
+    page_size: int,
+    descending: bool = False
+) -> Select:
+    """
+    Applique le tri, la reprise après curseur et la limite d'une page
+
+    Une ligne supplémentaire est demandée pour savoir s'il reste des résultats
+    (voir next_cursor). La clé de tri ne doit pas être NULL.
+    """
+    if cursor:
+        last_key, last_id = decode_cursor(cursor, key_type, UUID)
+        if descending:
+            query = query.where(tuple_(sort_key, id_column) < tuple_(last_key, last_id))
+        else:
+            query = query.where(tuple_(sort_key, id_column) > tuple_(last_key, last_id))
+
+    if descending:
+        query = query.order_by(sort_key.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_key.asc(), id_column.asc())
+
+    return query.limit(page_size + 1)
+
+
+def next_cursor(rows: List[Any], page_size: int, key: Callable[[Any], tuple]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Tronque les lignes à la taille de la page et calcule le curseur suivant
+
+    Usage:
+        items, cursor = next_cursor(rows, page_size, lambda r: (r.created_at, r.id))
+    """
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def total_pages(total: Optional[int], page_size: int) -> Optional[int]:
+    """Nombre de pages pour un total connu"""
+    if total is None:
+        return None
+    return (total + page_size - 1) // page_size
@@ -0,0 +1,92 @@
+"""
+Index de préfixes en mémoire
+Recherche par début de clé (autocomplétion) sur un tableau trié
+"""
+
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, Dict, Hashable, Iterable, List, Tuple
+
+
+def normalize_key(value: str) -> str:
+    """Minuscules sans accents ni espaces superflus ("Sénou " -> "senou")"""
+    key = value.strip().lower()
+    if key.isascii():
+        # Cas courant : rien à décomposer
+        return key
+    decomposed = unicodedata.normalize("NFKD", key)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class PrefixIndex:
+    """
+    Index de préfixes : équivalent compact d'un trie
+
+    Les clés sont gardées dans une liste triée de (clé, id) : une recherche
+    par préfixe est une recherche dichotomique suivie d'une lecture des clés
+    contiguës, sans un nœud Python par caractère. Un élément peut avoir
+    plusieurs clés (téléphone, prénom, nom...).
+
+    Usage:
+        index = PrefixIndex()
+        index.add(client.id, ["221771234567", "awa", "diop"], entry)
+        index.search("77", limit=10)  # entrées dont une clé commence par "77"
+
+    Pour un chargement complet, `PrefixIndex.build` trie toutes les clés en
+    une fois (O(n log n)) ; `add` insère clé par clé et reste réservé aux
+    mises à jour ponctuelles.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, Hashable]] = []
+        self._items: Dict[Hashable, Tuple[List[str], Any]] = {}
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[Hashable, Iterable[str], Any]]) -> "PrefixIndex":
+        """Construit un index à partir de (id, clés, valeur), avec un seul tri"""
+        index = cls()
+        for item_id, keys, value in entries:
+            index._items[item_id] = (sorted({key for key in keys if key}), value)
+        index._keys = sorted(
+            (key, item_id) for item_id, (keys, _) in index._items.items() for key in keys
+        )
+        return index
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item_id: Hashable, keys: Iterable[str], value: Any) -> None:
+        """Ajoute ou remplace un élément et ses clés"""
+        self.remove(item_id)
+        unique_keys = sorted({key for key in keys if key})
+        for key in unique_keys:
+            insort(self._keys, (key, item_id))
+        self._items[item_id] = (unique_keys, value)
+
+    def remove(self, item_id: Hashable) -> None:
+        """Retire un élément s'il est indexé"""
+        entry = self._items.pop(item_id, None)
+        if entry is None:
+            return
+        for key in entry[0]:
+            position = bisect_left(self._keys, (key, item_id))
+            if position < len(self._keys) and self._keys[position] == (key, item_id):
+                del self._keys[position]
+
+    def search(self, prefix: str, limit: int) -> List[Tuple[str, Any]]:
+        """
+        Retourne (clé trouvée, valeur) pour au plus `limit` éléments dont une
+        clé commence par le préfixe, par ordre de clé
+        """
+        results = []
+        seen = set()
+        position = bisect_left(self._keys, (prefix,))
+        while position < len(self._keys) and len(results) < limit:
+            key, item_id = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            if item_id not in seen:
+                seen.add(item_id)
+                results.append((key, self._items[item_id][1]))
+            position += 1
+        return results
@@ -3,26 +3,52 @@ Utilitaires de sécurité
 Gestion JWT, hashing des mots de passe, authentification
 """
 
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union, Any
+from typing import Callable, Dict, Optional, Tuple, Type, Union, Any
+import jwt as pyjwt
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import make_transient_to_detached
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.logs import bind_request_context
 from app.models.user import User
 
 
 # Configuration du hashing de mot de passe
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Pool borné pour bcrypt (~250 ms par calcul) : bcrypt libère le GIL, la boucle
+# d'événements continue de servir les autres requêtes pendant une vague de connexions
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+
 # Configuration du bearer token
 security = HTTPBearer()
 
+# Cache des tokens vérifiés, clé: token
+token_cache = TTLCache(
+    maxsize=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.AUTH_TOKEN_CACHE_TTL
+)
+
+# Cache des utilisateurs authentifiés, clé: (user_id, iat du token)
+user_cache = TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL
+)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifie qu'un mot de passe correspond au hash"""
@@ -34,6 +60,18 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Vérifie un mot de passe dans le pool bcrypt, sans bloquer la boucle d'événements"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash un mot de passe dans le pool bcrypt, sans bloquer la boucle d'événements"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
+
 def create_access_token(
     subject: Union[str, Any],
     expires_delta: Optional[timedelta] = None
@@ -69,26 +107,82 @@ def create_access_token(
     return encoded_jwt
 
 
+def _decode_jose(token: str) -> dict:
+    """Vérifie et décode un token avec python-jose"""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def _decode_pyjwt(token: str) -> dict:
+    """Vérifie et décode un token avec PyJWT"""
+    return pyjwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+# Décodeurs disponibles (settings.JWT_BACKEND) et exception levée pour un token invalide
+JWT_DECODERS: Dict[str, Tuple[Callable[[str], dict], Type[Exception]]] = {
+    "jose": (_decode_jose, JWTError),
+    "pyjwt": (_decode_pyjwt, pyjwt.InvalidTokenError),
+}
+
+
 def decode_token(token: str) -> Optional[dict]:
     """
     Décode un token JWT
 
+    Les tokens vérifiés sont gardés en cache jusqu'à AUTH_TOKEN_CACHE_TTL
+    secondes, sans jamais dépasser leur expiration : un terminal de caisse
+    qui renvoie le même token ne repaie pas la vérification de signature.
+    Les tokens invalides ne sont pas mis en cache.
+
     Args:
         token: Token JWT à décoder
 
     Returns:
         Payload du token ou None si invalide
     """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return dict(payload)
+
+    decode, error = JWT_DECODERS[settings.JWT_BACKEND]
     try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
-        )
-        return payload
-    except JWTError:
+        payload = decode(token)
+    except error:
         return None
 
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    if isinstance(payload.get("exp"), (int, float)):
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(token, payload, ttl=ttl)
+    return dict(payload)
+
+
+def _snapshot_user(user: User) -> dict:
+    """Copie les colonnes d'un utilisateur pour la mise en cache"""
+    return {column.name: getattr(user, column.name) for column in User.__table__.columns}
+
+
+def _user_from_snapshot(snapshot: dict) -> User:
+    """
+    Reconstruit un utilisateur détaché depuis le cache
+
+    Chaque requête reçoit sa propre instance: elle peut être rattachée
+    à la session avec db.add() sans déclencher d'INSERT.
+    """
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return user
+
+
+def invalidate_cached_user(user_id: Union[str, Any]) -> None:
+    """
+    Invalide toutes les entrées du cache pour un utilisateur
+
+    À appeler après un changement de mot de passe, de rôle ou de statut.
+    """
+    user_id = str(user_id)
+    user_cache.invalidate_where(lambda key: key[0] == user_id)
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -120,14 +214,22 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
 
-    # Récupérer l'utilisateur depuis la DB
-    result = await db.execute(
-        select(User).where(User.id == user_id)
-    )
-    user = result.scalar_one_or_none()
+    # Récupérer l'utilisateur depuis le cache, sinon depuis la DB
+    cache_key = (user_id, payload.get("iat"))
+    snapshot = user_cache.get(cache_key)
 
-    if user is None:
-        raise credentials_exception
+    if snapshot is not None:
+        user = _user_from_snapshot(snapshot)
+    else:
+        result = await db.execute(
+            select(User).where(User.id == user_id)
+        )
+        user = result.scalar_one_or_none()
+
+        if user is None:
+            raise credentials_exception
+
+        user_cache.set(cache_key, _snapshot_user(user))
 
     if not user.is_active:
         raise HTTPException(
@@ -135,6 +237,7 @@ async def get_current_user(
             detail="Utilisateur inactif"
         )
 
+    bind_request_context(store_id=user.store_id, user_id=user.id)
     return user
 
 
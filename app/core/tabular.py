@@ -0,0 +1,78 @@
+"""
+Lecture de fichiers tabulaires (CSV, XLSX)
+Les lignes sont lues au fil de l'eau, jamais chargées en entier en mémoire
+"""
+
+import csv
+import io
+import re
+from itertools import islice
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.prefix_index import normalize_key
+
+# Ligne lue : (numéro de ligne dans le fichier, {en-tête normalisé: valeur})
+TabularRow = Tuple[int, Dict[str, Any]]
+
+
+def normalize_header(header: Any) -> str:
+    """En-tête de colonne sans accents ni casse ("Prix de vente" -> "prix_de_vente")"""
+    return re.sub(r"\W+", "_", normalize_key(str(header or ""))).strip("_")
+
+
+def iter_csv_rows(file: IO[bytes]) -> Iterator[TabularRow]:
+    """
+    Lignes d'un CSV UTF-8 (BOM toléré)
+
+    Le séparateur (virgule ou point-virgule, export Excel français) est
+    déduit de la ligne d'en-tête.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    header_line = text.readline()
+    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+    headers = [normalize_header(header) for header in next(csv.reader([header_line], delimiter=delimiter), [])]
+
+    for line_number, values in enumerate(csv.reader(text, delimiter=delimiter), start=2):
+        if any(value.strip() for value in values):
+            yield line_number, dict(zip(headers, values))
+
+
+def iter_xlsx_rows(file: IO[bytes]) -> Iterator[TabularRow]:
+    """Lignes de la première feuille d'un classeur XLSX (lecture seule, en flux)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Import XLSX indisponible (openpyxl non installé), utilisez un CSV"
+        )
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = [normalize_header(header) for header in next(rows, ())]
+        for line_number, values in enumerate(rows, start=2):
+            if any(value not in (None, "") for value in values):
+                yield line_number, dict(zip(headers, values))
+    finally:
+        workbook.close()
+
+
+def iter_tabular_rows(file: IO[bytes], filename: Optional[str]) -> Iterator[TabularRow]:
+    """Lignes d'un fichier CSV ou XLSX, selon son extension"""
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "xlsx":
+        return iter_xlsx_rows(file)
+    if extension in ("csv", "txt"):
+        return iter_csv_rows(file)
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Format de fichier non supporté (CSV ou XLSX attendu)"
+    )
+
+
+def take(rows: Iterator[TabularRow], size: int) -> List[TabularRow]:
+    """Lit le bloc suivant de `size` lignes (liste vide en fin de fichier)"""
+    return list(islice(rows, size))
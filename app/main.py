@@ -5,13 +5,38 @@ FastAPI application avec PostgreSQL via SQLAlchemy et asyncpg
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import time
 
 from app.core.config import settings
-from app.core.database import engine, init_db, check_db_connection
+from app.core.database import engine, init_db, check_db_connection, listen_channel, AsyncSessionLocal
+from app.core.security import password_executor, token_cache, user_cache
+from app.core.logs import (
+    logger,
+    setup_logging,
+    should_log_request,
+    shutdown_logging,
+    start_request_context
+)
+from app.core.metrics import (
+    observe_request,
+    render_metrics,
+    route_template,
+    server_timing_header,
+    start_request
+)
 from app.api.v1.api import api_router
+from app.api.v1.endpoints.categories import category_tree_cache
+from app.api.v1.endpoints.products import (
+    BARCODE_CHANNEL,
+    barcode_cache,
+    on_barcode_notification,
+    stock_summary_cache,
+    warm_barcode_cache
+)
+from app.api.v1.endpoints.reports import product_report_cache
 
 
 # Lifespan context manager pour gérer le démarrage et l'arrêt
@@ -19,14 +44,38 @@ from app.api.v1.api import api_router
 async def lifespan(app: FastAPI):
     """Gère le cycle de vie de l'application"""
     # Démarrage
-    print("🚀 Démarrage de l'application Commercia...")
+    setup_logging()
+    logger.info("Démarrage de l'application Commercia")
     await init_db()
-    print("✅ Base de données initialisée")
+    barcode_listener = None
+    if settings.BARCODE_CACHE_NOTIFY:
+        # Écouter avant le préchargement : aucune modification ne passe entre les deux
+        listening = asyncio.Event()
+        barcode_listener = asyncio.create_task(
+            listen_channel(BARCODE_CHANNEL, on_barcode_notification, barcode_cache.clear, listening)
+        )
+        try:
+            await asyncio.wait_for(listening.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning("Écoute des codes-barres non établie, nouvelle tentative en arrière-plan")
+    if settings.BARCODE_CACHE_WARMUP:
+        try:
+            async with AsyncSessionLocal() as db:
+                stores = await warm_barcode_cache(db)
+            logger.info("Index des codes-barres préchargé", extra={"stores": stores})
+        except Exception as e:
+            logger.warning("Préchargement des codes-barres impossible: %s", e)
     yield
     # Arrêt
-    print("⏹️  Arrêt de l'application...")
+    logger.info("Arrêt de l'application")
+    if barcode_listener is not None:
+        barcode_listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await barcode_listener
     await engine.dispose()
-    print("✅ Connexions fermées")
+    password_executor.shutdown(wait=False)
+    logger.info("Connexions fermées")
+    shutdown_logging()
 
 
 # Créer l'application FastAPI
@@ -51,15 +100,39 @@ app.add_middleware(
 )
 
 
-# Middleware pour logger les requêtes
+# Middleware pour logger et mesurer les requêtes
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log toutes les requêtes avec leur temps d'exécution"""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
+    """Log toutes les requêtes avec leur temps d'exécution et leurs requêtes SQL"""
+    context = start_request_context(request.headers.get("X-Request-ID"))
+    stats = start_request()
+    start_time = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        process_time = time.perf_counter() - start_time
+        route = route_template(request.app, request.scope)
+        observe_request(request.method, route, status_code, process_time, stats)
+
+        if should_log_request(route, status_code, process_time):
+            logger.info(
+                "%s %s %s", request.method, request.url.path, status_code,
+                extra={
+                    "method": request.method,
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": round(process_time * 1000, 1),
+                    "sql_count": stats.sql_count,
+                    "sql_ms": round(stats.sql_time * 1000, 1),
+                    "pool_wait_ms": round(stats.pool_wait * 1000, 1)
+                }
+            )
+
+    response.headers["X-Request-ID"] = context["request_id"]
     response.headers["X-Process-Time"] = str(process_time)
-    print(f"📨 {request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
+    response.headers["Server-Timing"] = server_timing_header(process_time, stats)
     return response
 
 
@@ -67,7 +140,11 @@ async def log_requests(request: Request, call_next):
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Gère toutes les exceptions non capturées"""
-    print(f"❌ Erreur non gérée: {str(exc)}")
+    logger.error(
+        "Erreur non gérée: %s", exc,
+        exc_info=(type(exc), exc, exc.__traceback__),
+        extra={"method": request.method, "path": request.url.path}
+    )
     return JSONResponse(
         status_code=500,
         content={
@@ -100,6 +177,25 @@ async def readiness_check():
     }
 
 
+@app.get("/health/cache", tags=["Health"])
+async def cache_stats():
+    """Compteurs des caches en mémoire (hits, misses, taille)"""
+    return {
+        "auth_tokens": token_cache.stats(),
+        "auth_users": user_cache.stats(),
+        "stock_summary": stock_summary_cache.stats(),
+        "category_tree": category_tree_cache.stats(),
+        "barcodes": barcode_cache.stats(),
+        "product_reports": product_report_cache.stats()
+    }
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """Métriques au format Prometheus (durée, requêtes SQL, temps DB, attente du pool)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/", tags=["Root"])
 async def root():
     """Route racine"""
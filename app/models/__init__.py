@@ -7,7 +7,7 @@ from app.models.base import Base, BaseModel
 from app.models.store import Store
 from app.models.user import User
 from app.models.employee import Employee
-from app.models.client import Client
+from app.models.client import Client, ClientPurchaseStats
 from app.models.category import Category
 from app.models.product import Product, ProductVariant
 from app.models.order import Order, OrderItem
@@ -15,6 +15,7 @@ from app.models.transaction import Transaction, PaymentMethod
 from app.models.stock import StockMovement
 from app.models.cash_register import CashRegisterSession, CashRegisterDetail
 from app.models.reservation import Reservation, ReservationItem
+from app.models.report import SalesDailyRollup
 
 # Import des autres modèles (à créer)
 # from app.models.promo import PromoCode, PromoCodeUsage
@@ -27,6 +28,7 @@ __all__ = [
     "User",
     "Employee",
     "Client",
+    "ClientPurchaseStats",
     "Category",
     "Product",
     "ProductVariant",
@@ -39,4 +41,5 @@ __all__ = [
     "CashRegisterDetail",
     "Reservation",
     "ReservationItem",
+    "SalesDailyRollup",
 ]
@@ -2,7 +2,7 @@
 Modèles CashRegisterSession et CashRegisterDetail
 """
 
-from sqlalchemy import Column, String, Text, DECIMAL, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, DECIMAL, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -13,6 +13,7 @@ class CashRegisterSession(BaseModel):
     """Modèle représentant une session de caisse"""
 
     __tablename__ = "cash_register_sessions"
+    __table_args__ = (UniqueConstraint("store_id", "session_number"),)
 
     # Relations
     store_id = Column(UUID(as_uuid=True), ForeignKey("stores.id"), nullable=False)
@@ -20,7 +21,7 @@ class CashRegisterSession(BaseModel):
     closed_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
 
     # Identification
-    session_number = Column(String(50), unique=True, nullable=False, index=True)
+    session_number = Column(String(50), nullable=False, index=True)  # unique par magasin
 
     # Montants
     opening_amount = Column(DECIMAL(15, 2), nullable=False)
@@ -67,12 +68,13 @@ class CashRegisterDetail(BaseModel):
     """Modèle représentant les détails de caisse par méthode de paiement"""
 
     __tablename__ = "cash_register_details"
+    __table_args__ = (UniqueConstraint("session_id", "payment_method_id"),)
 
     # Relations
     session_id = Column(UUID(as_uuid=True), ForeignKey("cash_register_sessions.id", ondelete="CASCADE"), nullable=False)
     payment_method_id = Column(UUID(as_uuid=True), ForeignKey("payment_methods.id"), nullable=False)
 
-    # Montants
+    # Montants (totaux tenus à jour par le trigger sur transactions)
     opening_amount = Column(DECIMAL(15, 2), default=0)
     total_in = Column(DECIMAL(15, 2), default=0)  # entrées (ventes, dépôts)
     total_out = Column(DECIMAL(15, 2), default=0)  # sorties (remboursements, retraits)
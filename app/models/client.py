@@ -1,24 +1,27 @@
 """
-Modèle Client
+Modèles Client et ClientPurchaseStats
 """
 
-from sqlalchemy import Column, String, Text, Boolean, Integer, DECIMAL, ForeignKey
+from sqlalchemy import (
+    Column, String, Text, Boolean, Integer, DECIMAL, Date, DateTime, ForeignKey, UniqueConstraint, Computed
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
-from app.models.base import BaseModel
+from app.models.base import Base, BaseModel
 
 
 class Client(BaseModel):
     """Modèle représentant un client"""
 
     __tablename__ = "clients"
+    __table_args__ = (UniqueConstraint("store_id", "code"),)
 
     # Relations
     store_id = Column(UUID(as_uuid=True), ForeignKey("stores.id"), nullable=False)
 
     # Identification
-    code = Column(String(50), unique=True, nullable=False, index=True)
+    code = Column(String(50), nullable=False, index=True)  # unique par magasin
 
     # Informations de base
     first_name = Column(String(100))
@@ -26,6 +29,8 @@ class Client(BaseModel):
     company_name = Column(String(255))
     email = Column(String(255), index=True)
     phone = Column(String(20), index=True)
+    # Chiffres du téléphone, pour la recherche par préfixe (colonne générée)
+    phone_digits = Column(String(20, collation="C"), Computed(r"regexp_replace(phone, '\D', '', 'g')", persisted=True))
     address = Column(Text)
     city = Column(String(100))
 
@@ -61,3 +66,30 @@ class Client(BaseModel):
     def can_purchase_on_credit(self) -> bool:
         """Vérifie si le client peut acheter à crédit"""
         return self.current_debt < self.credit_limit
+
+
+class ClientPurchaseStats(Base):
+    """
+    Statistiques d'achat d'un client (table client_stats)
+
+    Tenue à jour par le trigger sur orders : elle est lue par les fiches
+    client et le tri par dernier achat, jamais écrite par l'application.
+    """
+
+    __tablename__ = "client_stats"
+
+    client_id = Column(UUID(as_uuid=True), ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    store_id = Column(UUID(as_uuid=True), ForeignKey("stores.id", ondelete="CASCADE"), nullable=False)
+
+    # Toutes les commandes du client
+    orders_count = Column(Integer, nullable=False, default=0)
+    total_spent = Column(DECIMAL(15, 2), nullable=False, default=0)  # payées ou partiellement payées
+    last_purchase_at = Column(DateTime)
+
+    # Mois en cours (mois local du magasin, remis à zéro au premier achat du mois)
+    month_start = Column(Date)
+    month_orders_count = Column(Integer, nullable=False, default=0)
+    month_spent = Column(DECIMAL(15, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ClientPurchaseStats(client={self.client_id}, orders={self.orders_count})>"
@@ -2,7 +2,7 @@
 Modèles Order et OrderItem (Commande et articles de commande)
 """
 
-from sqlalchemy import Column, String, Text, Integer, DECIMAL, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, DECIMAL, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -13,6 +13,7 @@ class Order(BaseModel):
     """Modèle représentant une commande"""
 
     __tablename__ = "orders"
+    __table_args__ = (UniqueConstraint("store_id", "order_number"),)
 
     # Relations
     store_id = Column(UUID(as_uuid=True), ForeignKey("stores.id"), nullable=False)
@@ -21,7 +22,7 @@ class Order(BaseModel):
     cash_register_session_id = Column(UUID(as_uuid=True), ForeignKey("cash_register_sessions.id"), nullable=True)
 
     # Identification
-    order_number = Column(String(50), unique=True, nullable=False, index=True)
+    order_number = Column(String(50), nullable=False, index=True)  # unique par magasin
 
     # Informations client
     client_name = Column(String(255))
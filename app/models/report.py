@@ -0,0 +1,49 @@
+"""
+Modèle SalesDailyRollup (agrégats de ventes du tableau de bord)
+"""
+
+import uuid
+
+from sqlalchemy import Column, String, Integer, SmallInteger, Date, DECIMAL, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.core.database import Base
+
+
+# Méthode de paiement des lignes issues des commandes (et des transactions sans méthode)
+NO_PAYMENT_METHOD = uuid.UUID(int=0)
+
+
+class SalesDailyRollup(Base):
+    """
+    Agrégats de ventes par magasin, jour, heure, canal, type de commande et
+    méthode de paiement
+
+    Table tenue à jour par les triggers sur orders et transactions : elle est
+    lue par les rapports, jamais écrite par l'application.
+    """
+
+    __tablename__ = "sales_daily_rollups"
+
+    # Clé
+    store_id = Column(UUID(as_uuid=True), ForeignKey("stores.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # date locale du magasin
+    hour = Column(SmallInteger, primary_key=True)  # 0-23, heure locale du magasin
+    channel = Column(String(50), primary_key=True, default="")  # order_source: pos, ecommerce
+    order_type = Column(String(50), primary_key=True, default="")
+    payment_method_id = Column(UUID(as_uuid=True), primary_key=True, default=NO_PAYMENT_METHOD)
+
+    # Commandes complétées
+    orders_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(DECIMAL(15, 2), nullable=False, default=0)
+    discount_amount = Column(DECIMAL(15, 2), nullable=False, default=0)
+    tax_amount = Column(DECIMAL(15, 2), nullable=False, default=0)
+
+    # Transactions complétées
+    payments_count = Column(Integer, nullable=False, default=0)
+    payments_amount = Column(DECIMAL(15, 2), nullable=False, default=0)
+    refunds_amount = Column(DECIMAL(15, 2), nullable=False, default=0)
+    expenses_amount = Column(DECIMAL(15, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SalesDailyRollup(store={self.store_id}, day={self.day}, hour={self.hour})>"
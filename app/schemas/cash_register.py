@@ -0,0 +1,91 @@
+"""
+Schémas Pydantic pour les sessions de caisse
+"""
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+# ========== ENUMS ==========
+
+class ReportType(str, Enum):
+    """Type de rapport de caisse"""
+    X = "X"  # lecture en cours de session
+    Z = "Z"  # clôture
+
+
+# ========== SCHÉMAS D'OUVERTURE / CLÔTURE ==========
+
+class CashRegisterAmount(BaseModel):
+    """Montant pour une méthode de paiement"""
+    payment_method_id: UUID
+    amount: Decimal = Field(..., ge=0, description="Montant")
+
+
+class CashRegisterOpen(BaseModel):
+    """Ouverture d'une session de caisse"""
+    opening_amount: Decimal = Field(..., ge=0, description="Fond de caisse")
+    opening_details: List[CashRegisterAmount] = Field(
+        default_factory=list,
+        description="Répartition du fond de caisse par méthode (somme = opening_amount)"
+    )
+    notes: Optional[str] = Field(None, max_length=1000)
+
+
+class CashRegisterClose(BaseModel):
+    """Clôture d'une session de caisse"""
+    counted: List[CashRegisterAmount] = Field(
+        default_factory=list,
+        description="Montants comptés par méthode ; une méthode non comptée est réputée juste"
+    )
+    closing_notes: Optional[str] = Field(None, max_length=1000)
+
+
+# ========== SCHÉMAS DE RÉPONSE ==========
+
+class CashRegisterDetailResponse(BaseModel):
+    """Totaux d'une méthode de paiement sur la session"""
+    payment_method_id: UUID
+    payment_method_name: Optional[str] = None
+    opening_amount: Decimal = Decimal("0")
+    total_in: Decimal = Decimal("0")
+    total_out: Decimal = Decimal("0")
+    expected_closing: Decimal = Decimal("0")
+    actual_closing: Optional[Decimal] = None
+    difference: Optional[Decimal] = None
+
+
+class CashRegisterSessionResponse(BaseModel):
+    """Schéma de réponse pour une session de caisse"""
+    id: UUID
+    store_id: UUID
+    session_number: str
+    status: str
+    opened_by: UUID
+    opened_at: Optional[datetime] = None
+    closed_by: Optional[UUID] = None
+    closed_at: Optional[datetime] = None
+    opening_amount: Decimal
+    closing_amount: Optional[Decimal] = None
+    expected_amount: Optional[Decimal] = None
+    difference: Optional[Decimal] = None
+    notes: Optional[str] = None
+    closing_notes: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class CashRegisterReport(BaseModel):
+    """Rapport X (session ouverte) ou Z (clôture)"""
+    report_type: ReportType
+    generated_at: datetime
+    session: CashRegisterSessionResponse
+    total_in: Decimal
+    total_out: Decimal
+    expected_amount: Decimal = Field(..., description="Fond de caisse + entrées - sorties")
+    details: List[CashRegisterDetailResponse] = Field(default_factory=list)
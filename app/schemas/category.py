@@ -54,6 +54,7 @@ class CategoryWithChildren(CategoryResponse):
     """Schéma de réponse avec les sous-catégories"""
     children: List['CategoryWithChildren'] = Field(default_factory=list, description="Sous-catégories")
     product_count: Optional[int] = Field(0, description="Nombre de produits dans cette catégorie")
+    total_product_count: Optional[int] = Field(0, description="Nombre de produits incluant les sous-catégories")
 
 
 # Schéma pour la liste paginée
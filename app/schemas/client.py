@@ -116,10 +116,22 @@ class ClientWithStats(ClientResponse):
 class ClientListResponse(BaseModel):
     """Schéma de réponse pour une liste paginée de clients"""
     items: List[ClientResponse]
-    total: int
+    total: Optional[int] = Field(None, description="Total (absent si count_mode=none)")
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = Field(None, description="Curseur à passer pour obtenir la page suivante")
+
+
+class ClientSearchResult(BaseModel):
+    """Résultat de recherche de client (autocomplete, caisse)"""
+    id: UUID
+    code: str
+    full_name: str
+    phone: Optional[str] = None
+    is_active: bool = True
+    score: float = Field(..., description="Pertinence (1 = correspondance exacte)")
+    match_type: str = Field(..., description="Type de correspondance: code, phone, name")
 
 
 class ClientFilter(BaseModel):
@@ -0,0 +1,90 @@
+"""
+Schémas Pydantic pour les commandes (ventes en caisse)
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+# ========== SCHÉMAS D'ENCAISSEMENT ==========
+
+class CheckoutItem(BaseModel):
+    """Ligne du panier"""
+    product_id: UUID
+    variant_id: Optional[UUID] = None
+    quantity: float = Field(..., gt=0, description="Quantité vendue")
+    unit: str = Field("primary", pattern="^(primary|secondary)$", description="Unité: primary ou secondary")
+    discount_amount: Decimal = Field(Decimal("0"), ge=0, description="Remise sur la ligne (HT)")
+
+
+class CheckoutPayment(BaseModel):
+    """Paiement reçu à l'encaissement"""
+    payment_method_id: UUID
+    amount: Decimal = Field(..., gt=0)
+    reference: Optional[str] = Field(None, max_length=255, description="Référence (ex: n° de transaction Mobile Money)")
+
+
+class CheckoutCreate(BaseModel):
+    """Schéma pour encaisser un panier"""
+    items: List[CheckoutItem] = Field(..., min_length=1, max_length=500)
+    client_id: Optional[UUID] = None
+    client_name: Optional[str] = Field(None, max_length=255)
+    client_phone: Optional[str] = Field(None, max_length=20)
+    order_type: str = Field("pos", max_length=50, description="pos, online, reservation, location")
+    cash_register_session_id: Optional[UUID] = None
+    payments: List[CheckoutPayment] = Field(
+        default_factory=list, description="Paiements (vide pour une vente à crédit)"
+    )
+    notes: Optional[str] = Field(None, max_length=1000)
+
+
+# ========== SCHÉMAS DE RÉPONSE ==========
+
+class OrderItemResponse(BaseModel):
+    """Ligne de commande"""
+    id: UUID
+    product_id: UUID
+    variant_id: Optional[UUID] = None
+    product_name: str
+    variant_name: Optional[str] = None
+    sku: Optional[str] = None
+    quantity: Decimal
+    unit: str
+    unit_price: Decimal
+    discount_amount: Decimal = Decimal("0")
+    tax_rate: Decimal = Decimal("0")
+    tax_amount: Decimal = Decimal("0")
+    total_price: Decimal
+
+    class Config:
+        from_attributes = True
+
+
+class OrderResponse(BaseModel):
+    """Commande (ticket de caisse)"""
+    id: UUID
+    store_id: UUID
+    order_number: str
+    client_id: Optional[UUID] = None
+    client_name: Optional[str] = None
+    client_phone: Optional[str] = None
+    order_type: str
+    status: str
+    subtotal: Decimal
+    discount_amount: Decimal = Decimal("0")
+    tax_amount: Decimal = Decimal("0")
+    total_amount: Decimal
+    montant_paye: Decimal = Decimal("0")
+    montant_restant: Decimal = Decimal("0")
+    statut_paiement: str
+    cash_register_session_id: Optional[UUID] = None
+    created_by: Optional[UUID] = None
+    notes: Optional[str] = None
+    created_at: datetime
+    items: List[OrderItemResponse] = Field(default_factory=list)
+
+    class Config:
+        from_attributes = True
@@ -1,11 +1,12 @@
 """
 Schémas Pydantic pour les produits et variantes
 """
+import re
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Annotated, Optional, List, Dict, Any
 from uuid import UUID
 from decimal import Decimal
-from pydantic import BaseModel, Field, validator
+from pydantic import AliasChoices, BaseModel, Field, field_validator, model_validator, validator
 from enum import Enum
 
 
@@ -176,10 +177,47 @@ class ProductWithRelations(ProductResponse):
 class ProductListResponse(BaseModel):
     """Schéma de réponse pour une liste paginée de produits"""
     items: List[ProductResponse]
-    total: int
+    total: Optional[int] = Field(None, description="Total (absent si count_mode=none)")
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = Field(None, description="Curseur à passer pour obtenir la page suivante")
+
+
+# Schéma pour la recherche classée
+class ProductSearchResult(BaseModel):
+    """Résultat de recherche de produit (autocomplete, caisse)"""
+    id: UUID
+    name: str
+    sku: str
+    barcode: Optional[str] = None
+    category_id: Optional[UUID] = None
+    selling_price: Decimal
+    stock_quantity_primary: Decimal = Decimal("0")
+    primary_unit: Optional[str] = None
+    has_variants: bool = False
+    is_active: bool = True
+    score: float = Field(..., description="Pertinence (1 = correspondance exacte)")
+    match_type: str = Field(..., description="Type de correspondance: sku, barcode, text")
+
+    class Config:
+        from_attributes = True
+
+
+# Schéma pour la lecture de code-barres
+class BarcodeLookupResponse(BaseModel):
+    """Produit ou variante résolu à partir d'un code-barres (caisse)"""
+    barcode: str
+    product_id: UUID
+    variant_id: Optional[UUID] = None
+    sku: str
+    name: str
+    selling_price: Decimal
+    tax_rate: Decimal = Decimal("0")
+    price_with_tax: Decimal
+    stock_quantity: Decimal = Decimal("0")
+    unit: Optional[str] = None
+    track_stock: bool = True
 
 
 # Schéma pour les filtres de recherche
@@ -197,6 +235,107 @@ class ProductFilter(BaseModel):
     sort_order: Optional[str] = Field("desc", description="Ordre: asc, desc")
 
 
+# Schémas pour l'import en masse
+# Montant compatible DECIMAL(15,2)
+ImportPrice = Annotated[Decimal, Field(ge=0, max_digits=15, decimal_places=2)]
+
+
+class ProductImportRow(BaseModel):
+    """
+    Ligne d'un fichier d'import de produits
+
+    Les en-têtes sont normalisés (minuscules, sans accents) ; les noms
+    français des colonnes sont acceptés (prix_vente, code_barres...).
+    """
+    sku: str = Field(..., min_length=1, max_length=100, validation_alias=AliasChoices("sku", "reference"))
+    name: str = Field(..., min_length=1, max_length=255, validation_alias=AliasChoices("name", "nom"))
+    description: Optional[str] = None
+    barcode: Optional[str] = Field(None, max_length=100, validation_alias=AliasChoices("barcode", "code_barres"))
+    category: Optional[str] = Field(None, max_length=255, validation_alias=AliasChoices("category", "categorie"))
+    product_type: str = Field("retail", max_length=50, validation_alias=AliasChoices("product_type", "type"))
+    purchase_price: Optional[ImportPrice] = Field(None, validation_alias=AliasChoices("purchase_price", "prix_achat"))
+    selling_price: ImportPrice = Field(..., validation_alias=AliasChoices("selling_price", "prix_vente"))
+    wholesale_price: Optional[ImportPrice] = Field(None, validation_alias=AliasChoices("wholesale_price", "prix_gros"))
+    tax_rate: Decimal = Field(
+        Decimal("0"), ge=0, le=100, decimal_places=2, validation_alias=AliasChoices("tax_rate", "tva_rate", "tva")
+    )
+    primary_unit: str = Field("pièce", max_length=50, validation_alias=AliasChoices("primary_unit", "unite"))
+    stock_quantity_primary: Decimal = Field(
+        Decimal("0"), ge=0, max_digits=15, decimal_places=3,
+        validation_alias=AliasChoices("stock_quantity_primary", "stock")
+    )
+    stock_alert_threshold: Decimal = Field(
+        Decimal("10"), ge=0, max_digits=15, decimal_places=3,
+        validation_alias=AliasChoices("stock_alert_threshold", "seuil_alerte")
+    )
+    track_stock: bool = True
+    brand: Optional[str] = Field(None, max_length=100, validation_alias=AliasChoices("brand", "marque"))
+    supplier_reference: Optional[str] = Field(
+        None, max_length=100, validation_alias=AliasChoices("supplier_reference", "reference_fournisseur")
+    )
+
+    @model_validator(mode="before")
+    @classmethod
+    def drop_empty_cells(cls, values: Any) -> Any:
+        """Une cellule vide vaut une colonne absente (valeur par défaut)"""
+        if isinstance(values, dict):
+            return {
+                key: value.strip() if isinstance(value, str) else value
+                for key, value in values.items()
+                if value is not None and not (isinstance(value, str) and not value.strip())
+            }
+        return values
+
+    @field_validator(
+        "purchase_price", "selling_price", "wholesale_price", "tax_rate",
+        "stock_quantity_primary", "stock_alert_threshold",
+        mode="before"
+    )
+    @classmethod
+    def parse_french_number(cls, value: Any) -> Any:
+        """Accepte les nombres saisis à la française ("1 500,50")"""
+        if isinstance(value, str):
+            return re.sub(r"[\s  ]", "", value).replace(",", ".")
+        return value
+
+    @field_validator("track_stock", mode="before")
+    @classmethod
+    def parse_french_bool(cls, value: Any) -> Any:
+        """Accepte oui/non"""
+        if isinstance(value, str):
+            return {"oui": True, "non": False}.get(value.lower(), value)
+        return value
+
+    @field_validator("sku", "barcode", mode="before")
+    @classmethod
+    def stringify_code(cls, value: Any) -> Any:
+        """Un code lu comme nombre dans un tableur reste un code (6111234567890, pas 6.11e12)"""
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        if isinstance(value, int):
+            return str(value)
+        return value
+
+
+class ProductImportError(BaseModel):
+    """Ligne rejetée lors d'un import"""
+    row: int = Field(..., description="Numéro de ligne dans le fichier (en-tête = 1)")
+    sku: Optional[str] = None
+    message: str
+
+
+class ProductImportResponse(BaseModel):
+    """Bilan d'un import de produits"""
+    total_rows: int
+    created: int
+    updated: int
+    error_count: int
+    errors: List[ProductImportError] = Field(
+        default_factory=list,
+        description="Lignes rejetées (limitées à PRODUCT_IMPORT_MAX_ERRORS)"
+    )
+
+
 # Import pour éviter les erreurs de référence circulaire
 from app.schemas.category import CategoryResponse
 
@@ -0,0 +1,144 @@
+"""
+Schémas Pydantic pour les rapports et le tableau de bord
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+# ========== ENUMS ==========
+
+class ProductMetric(str, Enum):
+    """Critère de classement des produits"""
+    REVENUE = "revenue"
+    QUANTITY = "quantity"
+    MARGIN = "margin"
+
+
+class Granularity(str, Enum):
+    """Pas de la série temporelle du tableau de bord"""
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+# ========== TABLEAU DE BORD ==========
+
+class SalesTotals(BaseModel):
+    """Chiffres clés d'une période"""
+    orders_count: int = 0
+    revenue: Decimal = Decimal("0")
+    average_basket: Decimal = Decimal("0")
+    discount_amount: Decimal = Decimal("0")
+    tax_amount: Decimal = Decimal("0")
+    payments_amount: Decimal = Decimal("0")
+    refunds_amount: Decimal = Decimal("0")
+    expenses_amount: Decimal = Decimal("0")
+    cash_balance: Decimal = Field(Decimal("0"), description="Encaissements - remboursements - dépenses")
+
+
+class SalesPeriod(SalesTotals):
+    """Point de la série temporelle"""
+    period_start: datetime
+
+
+class SalesBreakdown(BaseModel):
+    """Répartition des ventes par canal ou type de commande"""
+    key: str
+    orders_count: int
+    revenue: Decimal
+
+
+class PaymentMethodBreakdown(BaseModel):
+    """Répartition des encaissements par méthode de paiement"""
+    payment_method_id: Optional[UUID] = None
+    name: Optional[str] = None
+    payments_count: int
+    payments_amount: Decimal
+    refunds_amount: Decimal
+    expenses_amount: Decimal
+
+
+class DashboardReport(BaseModel):
+    """Tableau de bord d'une période (dates locales du magasin, bornes incluses)"""
+    start_date: date
+    end_date: date
+    granularity: Granularity
+    totals: SalesTotals
+    series: List[SalesPeriod] = Field(default_factory=list)
+    by_channel: List[SalesBreakdown] = Field(default_factory=list)
+    by_order_type: List[SalesBreakdown] = Field(default_factory=list)
+    by_payment_method: List[PaymentMethodBreakdown] = Field(default_factory=list)
+
+
+# ========== HEURES DE POINTE ==========
+
+class PeakHourCell(BaseModel):
+    """Créneau d'une heure dans la semaine"""
+    day_of_week: int = Field(..., ge=1, le=7, description="1 = lundi ... 7 = dimanche")
+    hour: int = Field(..., ge=0, le=23, description="Heure locale du magasin")
+    orders_count: int = 0
+    revenue: Decimal = Decimal("0")
+    average_orders: Decimal = Field(Decimal("0"), description="Commandes par occurrence du créneau sur la période")
+
+
+class PeakHoursReport(BaseModel):
+    """Carte de chaleur jour de semaine x heure"""
+    start_date: date
+    end_date: date
+    cells: List[PeakHourCell] = Field(default_factory=list, description="168 créneaux, lundi 0h en premier")
+    peak_slots: List[PeakHourCell] = Field(default_factory=list, description="Créneaux les plus chargés")
+
+
+# ========== PRODUITS (TOP VENTES, ABC) ==========
+
+class ProductSales(BaseModel):
+    """Ventes d'un produit sur la période (commandes complétées)"""
+    product_id: UUID
+    name: str
+    sku: Optional[str] = None
+    quantity: Decimal = Field(..., description="Quantité vendue en unité primaire")
+    revenue: Decimal = Field(..., description="Chiffre d'affaires HT, remises déduites")
+    margin: Optional[Decimal] = Field(None, description="Marge sur les lignes dont le prix d'achat est connu")
+    orders_count: int
+    share: Decimal = Field(..., description="Part du critère dans le total (%)")
+
+
+class TopProductsReport(BaseModel):
+    """Meilleures ventes d'une période"""
+    start_date: date
+    end_date: date
+    metric: ProductMetric
+    items: List[ProductSales] = Field(default_factory=list)
+
+
+class AbcProduct(ProductSales):
+    """Produit classé A, B ou C"""
+    rank: int
+    cumulative_share: Decimal = Field(..., description="Part cumulée jusqu'à ce produit inclus (%)")
+    abc_class: str
+
+
+class AbcClassSummary(BaseModel):
+    """Résumé d'une classe ABC"""
+    abc_class: str
+    products_count: int
+    value: Decimal
+    share: Decimal
+
+
+class AbcReport(BaseModel):
+    """Analyse ABC des produits vendus sur une période"""
+    start_date: date
+    end_date: date
+    metric: ProductMetric
+    a_threshold: int
+    b_threshold: int
+    total: Decimal
+    classes: List[AbcClassSummary] = Field(default_factory=list)
+    items: List[AbcProduct] = Field(default_factory=list)
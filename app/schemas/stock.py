@@ -63,6 +63,22 @@ class StockTransfer(BaseModel):
     notes: Optional[str] = None
 
 
+class BulkStockMovementLine(BaseModel):
+    """Ligne d'un mouvement de stock groupé"""
+    product_id: UUID
+    variant_id: Optional[UUID] = None
+    quantity: float = Field(..., gt=0, description="Quantité (positif)")
+    unit: str = Field("primary", description="Unité: primary, secondary ou nom de l'unité")
+    notes: Optional[str] = Field(None, max_length=1000)
+
+
+class BulkStockMovementCreate(BaseModel):
+    """Schéma pour un mouvement de stock groupé (ex: livraison fournisseur)"""
+    movement_type: MovementType = Field(..., description="Type de mouvement appliqué à toutes les lignes")
+    reason: Optional[str] = Field(None, max_length=500, description="Motif (ex: bon de livraison)")
+    lines: List[BulkStockMovementLine] = Field(..., min_length=1, max_length=1000)
+
+
 # ========== SCHÉMAS DE RÉPONSE ==========
 
 class StockMovementResponse(StockMovementBase):
@@ -86,13 +102,61 @@ class StockMovementWithProduct(StockMovementResponse):
     variant_name: Optional[str] = None
 
 
+class StockHistoryEntry(BaseModel):
+    """Ligne de l'historique de stock d'un produit, avec solde courant"""
+    id: UUID
+    variant_id: Optional[UUID] = None
+    variant_name: Optional[str] = None
+    movement_type: str
+    quantity: float
+    unit: str
+    quantity_change: float = Field(..., description="Variation signée, en unité primaire (ou de la variante)")
+    stock_before: float = Field(..., description="Solde avant le mouvement")
+    stock_after: float = Field(..., description="Solde après le mouvement")
+    reference_type: Optional[str] = None
+    reference_id: Optional[UUID] = None
+    reason: Optional[str] = None
+    notes: Optional[str] = None
+    performed_by: Optional[UUID] = None
+    created_at: datetime
+
+
+class StockHistoryResponse(BaseModel):
+    """Historique de stock d'un produit, du plus récent au plus ancien"""
+    product_id: UUID
+    product_name: str
+    product_sku: Optional[str] = None
+    primary_unit: Optional[str] = None
+    items: List[StockHistoryEntry]
+    next_cursor: Optional[str] = Field(None, description="Curseur à passer pour remonter plus loin dans l'historique")
+
+
 class StockMovementListResponse(BaseModel):
     """Schéma de réponse pour une liste paginée de mouvements"""
     items: List[StockMovementResponse]
-    total: int
+    total: Optional[int] = Field(None, description="Total (absent si count_mode=none)")
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = Field(None, description="Curseur à passer pour obtenir la page suivante")
+
+
+class BulkStockMovementLineResult(BaseModel):
+    """Résultat d'une ligne de mouvement groupé"""
+    product_id: UUID
+    variant_id: Optional[UUID] = None
+    quantity: float
+    stock_before: float
+    stock_after: float
+
+
+class BulkStockMovementResult(BaseModel):
+    """Résultat d'un mouvement de stock groupé"""
+    movement_type: MovementType
+    movements_created: int
+    products_updated: int
+    variants_updated: int
+    items: List[BulkStockMovementLineResult]
 
 
 # ========== SCHÉMAS POUR LE STOCK ACTUEL ==========
@@ -125,6 +189,14 @@ class ProductStockInfo(BaseModel):
     track_stock: bool
 
 
+class ProductStockListResponse(BaseModel):
+    """Schéma de réponse pour l'état du stock paginé par curseur"""
+    items: List[ProductStockInfo]
+    page_size: int
+    has_more: bool
+    next_cursor: Optional[str] = Field(None, description="Curseur à passer pour obtenir la page suivante")
+
+
 class VariantStockInfo(BaseModel):
     """Informations sur le stock d'une variante"""
     variant_id: UUID
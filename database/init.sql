@@ -7,6 +7,9 @@
 -- Activer l'extension UUID
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Activer l'extension trigramme (recherche tolérante aux fautes, ILIKE indexé)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- =====================================================
 -- 1. TABLES DE BASE
 -- =====================================================
@@ -64,6 +67,16 @@ CREATE TABLE employees (
     updated_at TIMESTAMP DEFAULT NOW()
 );
 
+-- COMPTEURS DE NUMÉROTATION (codes clients, numéros de commande et de session)
+-- Une ligne par magasin, type de document et période (YYYYMMDD, '' pour un compteur continu)
+CREATE TABLE document_counters (
+    store_id UUID NOT NULL REFERENCES stores(id) ON DELETE CASCADE,
+    scope VARCHAR(20) NOT NULL, -- client, order, session
+    period VARCHAR(8) NOT NULL DEFAULT '',
+    last_value INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (store_id, scope, period)
+);
+
 -- PERMISSIONS
 CREATE TABLE permissions (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -80,12 +93,13 @@ CREATE TABLE permissions (
 CREATE TABLE clients (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     store_id UUID REFERENCES stores(id),
-    code VARCHAR(50) UNIQUE NOT NULL,
+    code VARCHAR(50) NOT NULL,
     first_name VARCHAR(100),
     last_name VARCHAR(100),
     company_name VARCHAR(255),
     email VARCHAR(255),
     phone VARCHAR(20),
+    phone_digits VARCHAR(20) COLLATE "C" GENERATED ALWAYS AS (regexp_replace(phone, '\D', '', 'g')) STORED,
     address TEXT,
     city VARCHAR(100),
     client_type VARCHAR(50) DEFAULT 'individual', -- individual, company
@@ -95,7 +109,8 @@ CREATE TABLE clients (
     notes TEXT,
     is_active BOOLEAN DEFAULT true,
     created_at TIMESTAMP DEFAULT NOW(),
-    updated_at TIMESTAMP DEFAULT NOW()
+    updated_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE (store_id, code)
 );
 
 -- =====================================================
@@ -227,7 +242,7 @@ CREATE TABLE stock_movements (
 CREATE TABLE orders (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     store_id UUID REFERENCES stores(id),
-    order_number VARCHAR(50) UNIQUE NOT NULL,
+    order_number VARCHAR(50) NOT NULL,
 
     -- Client
     client_id UUID REFERENCES clients(id),
@@ -260,7 +275,8 @@ CREATE TABLE orders (
     created_by UUID REFERENCES users(id),
     cash_register_session_id UUID,
     created_at TIMESTAMP DEFAULT NOW(),
-    updated_at TIMESTAMP DEFAULT NOW()
+    updated_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE (store_id, order_number)
 );
 
 -- ARTICLES DE COMMANDE
@@ -335,7 +351,7 @@ CREATE TABLE transactions (
 CREATE TABLE cash_register_sessions (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     store_id UUID REFERENCES stores(id),
-    session_number VARCHAR(50) UNIQUE NOT NULL,
+    session_number VARCHAR(50) NOT NULL,
 
     opened_by UUID REFERENCES users(id),
     closed_by UUID REFERENCES users(id),
@@ -351,7 +367,12 @@ CREATE TABLE cash_register_sessions (
     closed_at TIMESTAMP,
 
     notes TEXT,
-    closing_notes TEXT
+    closing_notes TEXT,
+
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(),
+
+    UNIQUE (store_id, session_number)
 );
 
 -- DÉTAILS DE CAISSE PAR MÉTHODE
@@ -368,7 +389,9 @@ CREATE TABLE cash_register_details (
     difference DECIMAL(15,2),
 
     created_at TIMESTAMP DEFAULT NOW(),
-    updated_at TIMESTAMP DEFAULT NOW()
+    updated_at TIMESTAMP DEFAULT NOW(),
+
+    UNIQUE (session_id, payment_method_id) -- une ligne par méthode, tenue à jour par trigger
 );
 
 -- =====================================================
@@ -498,6 +521,51 @@ CREATE TABLE loyalty_points_history (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- AGRÉGATS DE VENTES (tableau de bord)
+-- Une ligne par magasin, jour et heure (heure locale du magasin), canal, type
+-- de commande et méthode de paiement, tenue à jour par triggers. Les lignes de
+-- commande ont payment_method_id = UUID nul ; les lignes de transaction
+-- portent la méthode de paiement.
+CREATE TABLE sales_daily_rollups (
+    store_id UUID NOT NULL REFERENCES stores(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    hour SMALLINT NOT NULL, -- 0-23
+    channel VARCHAR(50) NOT NULL DEFAULT '', -- order_source: pos, ecommerce ('' sans commande)
+    order_type VARCHAR(50) NOT NULL DEFAULT '',
+    payment_method_id UUID NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000',
+
+    -- Commandes complétées
+    orders_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(15,2) NOT NULL DEFAULT 0,
+    discount_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+    tax_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+
+    -- Transactions complétées
+    payments_count INT NOT NULL DEFAULT 0,
+    payments_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+    refunds_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+    expenses_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (store_id, day, hour, channel, order_type, payment_method_id)
+);
+
+-- STATISTIQUES D'ACHAT PAR CLIENT
+-- Une ligne par client, tenue à jour par trigger sur orders (les paiements
+-- modifient statut_paiement de la commande). Le mois en cours est un compteur
+-- remis à zéro au premier achat d'un nouveau mois (mois local du magasin).
+CREATE TABLE client_stats (
+    client_id UUID PRIMARY KEY REFERENCES clients(id) ON DELETE CASCADE,
+    store_id UUID NOT NULL REFERENCES stores(id) ON DELETE CASCADE,
+
+    orders_count INT NOT NULL DEFAULT 0,
+    total_spent DECIMAL(15,2) NOT NULL DEFAULT 0, -- commandes payées ou partiellement payées
+    last_purchase_at TIMESTAMP,
+
+    month_start DATE, -- mois des compteurs ci-dessous
+    month_orders_count INT NOT NULL DEFAULT 0,
+    month_spent DECIMAL(15,2) NOT NULL DEFAULT 0
+);
+
 -- =====================================================
 -- 11. LOGS ET AUDIT
 -- =====================================================
@@ -542,6 +610,9 @@ CREATE INDEX idx_clients_store_id ON clients(store_id);
 CREATE INDEX idx_clients_code ON clients(code);
 CREATE INDEX idx_clients_phone ON clients(phone);
 CREATE INDEX idx_clients_email ON clients(email);
+CREATE INDEX idx_clients_store_phone_digits ON clients(store_id, phone_digits);
+CREATE INDEX idx_clients_first_name_trgm ON clients USING gin (first_name gin_trgm_ops);
+CREATE INDEX idx_clients_last_name_trgm ON clients USING gin (last_name gin_trgm_ops);
 
 -- Categories
 CREATE INDEX idx_categories_store_id ON categories(store_id);
@@ -555,6 +626,10 @@ CREATE INDEX idx_products_category_id ON products(category_id);
 CREATE INDEX idx_products_product_type ON products(product_type);
 CREATE INDEX idx_products_is_active ON products(is_active);
 CREATE INDEX idx_products_barcode ON products(barcode);
+CREATE INDEX idx_products_name_trgm ON products USING gin (name gin_trgm_ops);
+CREATE INDEX idx_products_sku_trgm ON products USING gin (sku gin_trgm_ops);
+CREATE INDEX idx_products_barcode_trgm ON products USING gin (barcode gin_trgm_ops);
+CREATE INDEX idx_products_description_trgm ON products USING gin (description gin_trgm_ops);
 
 -- Product Variants
 CREATE INDEX idx_variants_product_id ON product_variants(product_id);
@@ -566,6 +641,7 @@ CREATE INDEX idx_stock_movements_store_id ON stock_movements(store_id);
 CREATE INDEX idx_stock_movements_product_id ON stock_movements(product_id);
 CREATE INDEX idx_stock_movements_variant_id ON stock_movements(variant_id);
 CREATE INDEX idx_stock_movements_created_at ON stock_movements(created_at);
+CREATE INDEX idx_stock_movements_product_created ON stock_movements(product_id, created_at DESC);
 
 -- Orders
 CREATE INDEX idx_orders_store_id ON orders(store_id);
@@ -575,6 +651,7 @@ CREATE INDEX idx_orders_status ON orders(status);
 CREATE INDEX idx_orders_statut_paiement ON orders(statut_paiement);
 CREATE INDEX idx_orders_created_at ON orders(created_at);
 CREATE INDEX idx_orders_created_by ON orders(created_by);
+CREATE INDEX idx_orders_store_status_created ON orders(store_id, status, created_at);
 
 -- Order Items
 CREATE INDEX idx_order_items_order_id ON order_items(order_id);
@@ -589,10 +666,16 @@ CREATE INDEX idx_transactions_transaction_type ON transactions(transaction_type)
 CREATE INDEX idx_transactions_status ON transactions(status);
 CREATE INDEX idx_transactions_created_at ON transactions(created_at);
 
+-- Client Stats
+CREATE INDEX idx_client_stats_store_last_purchase ON client_stats(store_id, last_purchase_at);
+
 -- Cash Register Sessions
 CREATE INDEX idx_cash_sessions_store_id ON cash_register_sessions(store_id);
 CREATE INDEX idx_cash_sessions_status ON cash_register_sessions(status);
 CREATE INDEX idx_cash_sessions_opened_at ON cash_register_sessions(opened_at);
+-- Une seule session ouverte par caissier et par magasin
+CREATE UNIQUE INDEX idx_cash_sessions_one_open ON cash_register_sessions(store_id, opened_by)
+    WHERE status = 'open';
 
 -- Promo Codes
 CREATE INDEX idx_promo_codes_store_id ON promo_codes(store_id);
@@ -615,24 +698,24 @@ CREATE INDEX idx_audit_logs_created_at ON audit_logs(created_at);
 -- 13. TRIGGERS
 -- =====================================================
 
+-- Allocation du prochain numéro d'un compteur. La ligne du compteur reste
+-- verrouillée jusqu'au COMMIT : deux transactions concurrentes d'un même
+-- magasin obtiennent des numéros distincts, sans COUNT(*) sur la table.
+CREATE OR REPLACE FUNCTION next_document_number(p_store_id UUID, p_scope VARCHAR, p_period VARCHAR DEFAULT '')
+RETURNS INT AS $$
+    INSERT INTO document_counters (store_id, scope, period, last_value)
+    VALUES (p_store_id, p_scope, p_period, 1)
+    ON CONFLICT (store_id, scope, period)
+    DO UPDATE SET last_value = document_counters.last_value + 1
+    RETURNING last_value;
+$$ LANGUAGE sql;
+
 -- TRIGGER 1: Auto-génération du code client
 CREATE OR REPLACE FUNCTION generate_client_code()
 RETURNS TRIGGER AS $$
-DECLARE
-    v_count INT;
-    v_code VARCHAR(50);
 BEGIN
     IF NEW.code IS NULL OR NEW.code = '' THEN
-        SELECT COUNT(*) + 1 INTO v_count FROM clients WHERE store_id = NEW.store_id;
-        v_code := 'CLI-' || LPAD(v_count::TEXT, 6, '0');
-
-        -- Vérifier l'unicité
-        WHILE EXISTS (SELECT 1 FROM clients WHERE code = v_code) LOOP
-            v_count := v_count + 1;
-            v_code := 'CLI-' || LPAD(v_count::TEXT, 6, '0');
-        END LOOP;
-
-        NEW.code := v_code;
+        NEW.code := 'CLI-' || LPAD(next_document_number(NEW.store_id, 'client')::TEXT, 6, '0');
     END IF;
     RETURN NEW;
 END;
@@ -643,30 +726,16 @@ BEFORE INSERT ON clients
 FOR EACH ROW
 EXECUTE FUNCTION generate_client_code();
 
--- TRIGGER 2: Auto-génération du numéro de commande
+-- TRIGGER 2: Auto-génération du numéro de commande (compteur par magasin et par jour)
 CREATE OR REPLACE FUNCTION generate_order_number()
 RETURNS TRIGGER AS $$
 DECLARE
-    v_count INT;
     v_date VARCHAR(8);
-    v_number VARCHAR(50);
 BEGIN
     IF NEW.order_number IS NULL OR NEW.order_number = '' THEN
         v_date := TO_CHAR(NOW(), 'YYYYMMDD');
-        SELECT COUNT(*) + 1 INTO v_count
-        FROM orders
-        WHERE store_id = NEW.store_id
-        AND order_number LIKE 'CMD-' || v_date || '%';
-
-        v_number := 'CMD-' || v_date || '-' || LPAD(v_count::TEXT, 4, '0');
-
-        -- Vérifier l'unicité
-        WHILE EXISTS (SELECT 1 FROM orders WHERE order_number = v_number) LOOP
-            v_count := v_count + 1;
-            v_number := 'CMD-' || v_date || '-' || LPAD(v_count::TEXT, 4, '0');
-        END LOOP;
-
-        NEW.order_number := v_number;
+        NEW.order_number := 'CMD-' || v_date || '-'
+            || LPAD(next_document_number(NEW.store_id, 'order', v_date)::TEXT, 4, '0');
     END IF;
     RETURN NEW;
 END;
@@ -677,6 +746,26 @@ BEFORE INSERT ON orders
 FOR EACH ROW
 EXECUTE FUNCTION generate_order_number();
 
+-- TRIGGER 2 bis: Auto-génération du numéro de session de caisse (par magasin et par jour)
+CREATE OR REPLACE FUNCTION generate_session_number()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_date VARCHAR(8);
+BEGIN
+    IF NEW.session_number IS NULL OR NEW.session_number = '' THEN
+        v_date := TO_CHAR(NOW(), 'YYYYMMDD');
+        NEW.session_number := 'SES-' || v_date || '-'
+            || LPAD(next_document_number(NEW.store_id, 'session', v_date)::TEXT, 3, '0');
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_generate_session_number
+BEFORE INSERT ON cash_register_sessions
+FOR EACH ROW
+EXECUTE FUNCTION generate_session_number();
+
 -- TRIGGER 3: Mise à jour automatique du statut de paiement avec gestion des remboursements
 CREATE OR REPLACE FUNCTION update_order_payment_status()
 RETURNS TRIGGER AS $$
@@ -732,67 +821,83 @@ FOR EACH ROW
 WHEN (NEW.status = 'completed')
 EXECUTE FUNCTION update_order_payment_status();
 
+-- Application des lignes d'une commande au stock, en une requête par table
+-- (p_sign = -1 pour une vente, 1 pour un remboursement). Les lignes d'un même
+-- produit sont cumulées ; pour un produit multi-unités, l'unité secondaire
+-- sert de référence dès qu'une ligne est exprimée dans cette unité.
+CREATE OR REPLACE FUNCTION apply_order_items_to_stock(p_order_id UUID, p_sign INT)
+RETURNS VOID AS $$
+BEGIN
+    -- Verrouiller les produits par ordre d'id (pas d'interblocage entre commandes)
+    PERFORM 1 FROM products
+    WHERE id IN (SELECT product_id FROM order_items WHERE order_id = p_order_id)
+    ORDER BY id
+    FOR UPDATE;
+
+    -- Produits avec variante
+    UPDATE product_variants pv
+    SET stock_quantity = pv.stock_quantity + p_sign * d.quantity
+    FROM (
+        SELECT oi.variant_id, SUM(oi.quantity) AS quantity
+        FROM order_items oi
+        JOIN products p ON p.id = oi.product_id
+        WHERE oi.order_id = p_order_id
+          AND oi.variant_id IS NOT NULL
+          AND p.track_stock
+        GROUP BY oi.variant_id
+    ) d
+    WHERE pv.id = d.variant_id;
+
+    -- Produits sans variante, conversion d'unités calculée dans la requête
+    UPDATE products p
+    SET stock_quantity_primary = CASE
+            WHEN p.has_multiple_units AND d.secondary_quantity <> 0
+                THEN (p.stock_quantity_secondary
+                      + p_sign * (d.secondary_quantity + d.primary_quantity * p.units_per_primary)) / p.units_per_primary
+            ELSE p.stock_quantity_primary + p_sign * d.primary_quantity
+        END,
+        stock_quantity_secondary = CASE
+            WHEN p.has_multiple_units AND d.secondary_quantity = 0
+                THEN (p.stock_quantity_primary + p_sign * d.primary_quantity) * p.units_per_primary
+            WHEN p.has_multiple_units
+                THEN p.stock_quantity_secondary
+                     + p_sign * (d.secondary_quantity + d.primary_quantity * p.units_per_primary)
+            ELSE p.stock_quantity_secondary + p_sign * d.secondary_quantity
+        END
+    FROM (
+        SELECT
+            product_id,
+            SUM(CASE WHEN unit = 'primary' THEN quantity ELSE 0 END) AS primary_quantity,
+            SUM(CASE WHEN unit = 'primary' THEN 0 ELSE quantity END) AS secondary_quantity
+        FROM order_items
+        WHERE order_id = p_order_id AND variant_id IS NULL
+        GROUP BY product_id
+    ) d
+    WHERE p.id = d.product_id AND p.track_stock;
+END;
+$$ LANGUAGE plpgsql;
+
 -- TRIGGER 4: Déduction automatique du stock lors d'une commande
 CREATE OR REPLACE FUNCTION deduct_stock_on_order()
 RETURNS TRIGGER AS $$
-DECLARE
-    v_item RECORD;
-    v_product RECORD;
 BEGIN
     -- Vérifier que la commande est confirmée ou complétée
     IF NEW.status IN ('confirmed', 'completed')
        AND (OLD.status IS NULL OR OLD.status NOT IN ('confirmed', 'completed')) THEN
 
-        FOR v_item IN
-            SELECT * FROM order_items WHERE order_id = NEW.id
-        LOOP
-            -- Récupérer les infos du produit
-            SELECT * INTO v_product FROM products WHERE id = v_item.product_id;
-
-            IF v_product.track_stock THEN
-                IF v_item.variant_id IS NOT NULL THEN
-                    -- Produit avec variante
-                    UPDATE product_variants
-                    SET stock_quantity = stock_quantity - v_item.quantity
-                    WHERE id = v_item.variant_id;
-
-                ELSE
-                    -- Produit sans variante
-                    IF v_item.unit = 'primary' THEN
-                        UPDATE products
-                        SET stock_quantity_primary = stock_quantity_primary - v_item.quantity
-                        WHERE id = v_item.product_id;
-
-                        -- Si multi-unités, synchroniser
-                        IF v_product.has_multiple_units THEN
-                            UPDATE products
-                            SET stock_quantity_secondary = stock_quantity_primary * units_per_primary
-                            WHERE id = v_item.product_id;
-                        END IF;
-                    ELSE
-                        UPDATE products
-                        SET stock_quantity_secondary = stock_quantity_secondary - v_item.quantity
-                        WHERE id = v_item.product_id;
-
-                        -- Si multi-unités, synchroniser
-                        IF v_product.has_multiple_units THEN
-                            UPDATE products
-                            SET stock_quantity_primary = stock_quantity_secondary / units_per_primary
-                            WHERE id = v_item.product_id;
-                        END IF;
-                    END IF;
-                END IF;
-
-                -- Enregistrer le mouvement de stock
-                INSERT INTO stock_movements (
-                    store_id, product_id, variant_id, movement_type,
-                    quantity, unit, reference_type, reference_id, performed_by
-                ) VALUES (
-                    NEW.store_id, v_item.product_id, v_item.variant_id, 'out',
-                    v_item.quantity, v_item.unit, 'order', NEW.id, NEW.created_by
-                );
-            END IF;
-        END LOOP;
+        PERFORM apply_order_items_to_stock(NEW.id, -1);
+
+        -- Enregistrer les mouvements de stock
+        INSERT INTO stock_movements (
+            store_id, product_id, variant_id, movement_type,
+            quantity, unit, reference_type, reference_id, performed_by
+        )
+        SELECT
+            NEW.store_id, oi.product_id, oi.variant_id, 'out',
+            oi.quantity, oi.unit, 'order', NEW.id, NEW.created_by
+        FROM order_items oi
+        JOIN products p ON p.id = oi.product_id
+        WHERE oi.order_id = NEW.id AND p.track_stock;
     END IF;
 
     RETURN NEW;
@@ -809,62 +914,26 @@ CREATE OR REPLACE FUNCTION restock_after_refund()
 RETURNS TRIGGER AS $$
 DECLARE
     v_order RECORD;
-    v_item RECORD;
-    v_product RECORD;
     v_loyalty_earned INT;
 BEGIN
     IF NEW.transaction_type = 'refund' AND NEW.status = 'completed' THEN
         -- Récupérer la commande
         SELECT * INTO v_order FROM orders WHERE id = NEW.order_id;
 
-        -- Réintégrer le stock pour chaque article
-        FOR v_item IN
-            SELECT * FROM order_items WHERE order_id = NEW.order_id
-        LOOP
-            SELECT * INTO v_product FROM products WHERE id = v_item.product_id;
-
-            IF v_product.track_stock THEN
-                IF v_item.variant_id IS NOT NULL THEN
-                    -- Produit avec variante
-                    UPDATE product_variants
-                    SET stock_quantity = stock_quantity + v_item.quantity
-                    WHERE id = v_item.variant_id;
-
-                ELSE
-                    -- Produit sans variante
-                    IF v_item.unit = 'primary' THEN
-                        UPDATE products
-                        SET stock_quantity_primary = stock_quantity_primary + v_item.quantity
-                        WHERE id = v_item.product_id;
-
-                        IF v_product.has_multiple_units THEN
-                            UPDATE products
-                            SET stock_quantity_secondary = stock_quantity_primary * units_per_primary
-                            WHERE id = v_item.product_id;
-                        END IF;
-                    ELSE
-                        UPDATE products
-                        SET stock_quantity_secondary = stock_quantity_secondary + v_item.quantity
-                        WHERE id = v_item.product_id;
-
-                        IF v_product.has_multiple_units THEN
-                            UPDATE products
-                            SET stock_quantity_primary = stock_quantity_secondary / units_per_primary
-                            WHERE id = v_item.product_id;
-                        END IF;
-                    END IF;
-                END IF;
-
-                -- Enregistrer le mouvement de stock
-                INSERT INTO stock_movements (
-                    store_id, product_id, variant_id, movement_type,
-                    quantity, unit, reference_type, reference_id, performed_by
-                ) VALUES (
-                    NEW.store_id, v_item.product_id, v_item.variant_id, 'in',
-                    v_item.quantity, v_item.unit, 'refund', NEW.id, NEW.processed_by
-                );
-            END IF;
-        END LOOP;
+        -- Réintégrer le stock des articles
+        PERFORM apply_order_items_to_stock(NEW.order_id, 1);
+
+        -- Enregistrer les mouvements de stock
+        INSERT INTO stock_movements (
+            store_id, product_id, variant_id, movement_type,
+            quantity, unit, reference_type, reference_id, performed_by
+        )
+        SELECT
+            NEW.store_id, oi.product_id, oi.variant_id, 'in',
+            oi.quantity, oi.unit, 'refund', NEW.id, NEW.processed_by
+        FROM order_items oi
+        JOIN products p ON p.id = oi.product_id
+        WHERE oi.order_id = NEW.order_id AND p.track_stock;
 
         -- Déduire les points de fidélité si la commande était payée
         IF v_order.client_id IS NOT NULL AND v_order.statut_paiement IN ('Payer', 'Partiellement') THEN
@@ -1043,6 +1112,349 @@ BEFORE UPDATE ON reservations FOR EACH ROW EXECUTE FUNCTION update_timestamp();
 CREATE TRIGGER trigger_update_timestamp_promo_codes
 BEFORE UPDATE ON promo_codes FOR EACH ROW EXECUTE FUNCTION update_timestamp();
 
+CREATE TRIGGER trigger_update_timestamp_cash_register_sessions
+BEFORE UPDATE ON cash_register_sessions FOR EACH ROW EXECUTE FUNCTION update_timestamp();
+
+CREATE TRIGGER trigger_update_timestamp_cash_register_details
+BEFORE UPDATE ON cash_register_details FOR EACH ROW EXECUTE FUNCTION update_timestamp();
+
+-- TRIGGER 9: Agrégats de ventes du tableau de bord (sales_daily_rollups)
+-- Les horodatages (TIMESTAMP sans fuseau, en UTC) sont ramenés à l'heure locale du magasin
+CREATE OR REPLACE FUNCTION store_local_time(p_store_id UUID, p_at TIMESTAMP)
+RETURNS TIMESTAMP AS $$
+    SELECT (p_at AT TIME ZONE 'UTC') AT TIME ZONE COALESCE(
+        (SELECT timezone FROM stores WHERE id = p_store_id), 'UTC'
+    );
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION add_order_to_sales_rollup(p_order orders, p_sign INT)
+RETURNS VOID AS $$
+DECLARE
+    v_local TIMESTAMP := store_local_time(p_order.store_id, p_order.created_at);
+BEGIN
+    INSERT INTO sales_daily_rollups (
+        store_id, day, hour, channel, order_type,
+        orders_count, revenue, discount_amount, tax_amount
+    ) VALUES (
+        p_order.store_id, v_local::DATE, EXTRACT(HOUR FROM v_local),
+        COALESCE(p_order.order_source, ''), p_order.order_type,
+        p_sign,
+        p_sign * p_order.total_amount,
+        p_sign * (COALESCE(p_order.discount_amount, 0) + COALESCE(p_order.promo_code_discount, 0)
+                  + COALESCE(p_order.loyalty_discount, 0)),
+        p_sign * COALESCE(p_order.tax_amount, 0)
+    )
+    ON CONFLICT (store_id, day, hour, channel, order_type, payment_method_id) DO UPDATE SET
+        orders_count = sales_daily_rollups.orders_count + EXCLUDED.orders_count,
+        revenue = sales_daily_rollups.revenue + EXCLUDED.revenue,
+        discount_amount = sales_daily_rollups.discount_amount + EXCLUDED.discount_amount,
+        tax_amount = sales_daily_rollups.tax_amount + EXCLUDED.tax_amount;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION add_transaction_to_sales_rollup(p_transaction transactions, p_sign INT)
+RETURNS VOID AS $$
+DECLARE
+    v_local TIMESTAMP := store_local_time(p_transaction.store_id, p_transaction.created_at);
+    v_channel VARCHAR(50) := '';
+    v_order_type VARCHAR(50) := '';
+    v_amount DECIMAL(15,2) := p_sign * ABS(p_transaction.amount);
+    v_is_payment BOOLEAN := p_transaction.transaction_type IN ('sale', 'deposit', 'final_payment');
+BEGIN
+    IF NOT v_is_payment AND p_transaction.transaction_type NOT IN ('refund', 'expense') THEN
+        RETURN;
+    END IF;
+
+    IF p_transaction.order_id IS NOT NULL THEN
+        SELECT COALESCE(order_source, ''), order_type INTO v_channel, v_order_type
+        FROM orders WHERE id = p_transaction.order_id;
+    END IF;
+
+    INSERT INTO sales_daily_rollups (
+        store_id, day, hour, channel, order_type, payment_method_id,
+        payments_count, payments_amount, refunds_amount, expenses_amount
+    ) VALUES (
+        p_transaction.store_id, v_local::DATE, EXTRACT(HOUR FROM v_local),
+        v_channel, v_order_type,
+        COALESCE(p_transaction.payment_method_id, '00000000-0000-0000-0000-000000000000'),
+        CASE WHEN v_is_payment THEN p_sign ELSE 0 END,
+        CASE WHEN v_is_payment THEN v_amount ELSE 0 END,
+        CASE WHEN p_transaction.transaction_type = 'refund' THEN v_amount ELSE 0 END,
+        CASE WHEN p_transaction.transaction_type = 'expense' THEN v_amount ELSE 0 END
+    )
+    ON CONFLICT (store_id, day, hour, channel, order_type, payment_method_id) DO UPDATE SET
+        payments_count = sales_daily_rollups.payments_count + EXCLUDED.payments_count,
+        payments_amount = sales_daily_rollups.payments_amount + EXCLUDED.payments_amount,
+        refunds_amount = sales_daily_rollups.refunds_amount + EXCLUDED.refunds_amount,
+        expenses_amount = sales_daily_rollups.expenses_amount + EXCLUDED.expenses_amount;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Seules les commandes et transactions complétées sont comptées : une ligne qui
+-- quitte l'état completed (annulation) ou change de montant est retirée puis rajoutée
+CREATE OR REPLACE FUNCTION update_sales_rollup_from_order()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status = 'completed' THEN
+        PERFORM add_order_to_sales_rollup(OLD, -1);
+    END IF;
+    IF NEW.status = 'completed' THEN
+        PERFORM add_order_to_sales_rollup(NEW, 1);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_sales_rollup_order_insert
+AFTER INSERT ON orders
+FOR EACH ROW
+WHEN (NEW.status = 'completed')
+EXECUTE FUNCTION update_sales_rollup_from_order();
+
+CREATE TRIGGER trigger_sales_rollup_order_update
+AFTER UPDATE ON orders
+FOR EACH ROW
+WHEN (
+    (OLD.status = 'completed' OR NEW.status = 'completed')
+    AND (OLD.status, OLD.total_amount, OLD.discount_amount, OLD.promo_code_discount,
+         OLD.loyalty_discount, OLD.tax_amount, OLD.order_type, OLD.order_source, OLD.created_at)
+        IS DISTINCT FROM
+        (NEW.status, NEW.total_amount, NEW.discount_amount, NEW.promo_code_discount,
+         NEW.loyalty_discount, NEW.tax_amount, NEW.order_type, NEW.order_source, NEW.created_at)
+)
+EXECUTE FUNCTION update_sales_rollup_from_order();
+
+CREATE OR REPLACE FUNCTION update_sales_rollup_from_transaction()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status = 'completed' THEN
+        PERFORM add_transaction_to_sales_rollup(OLD, -1);
+    END IF;
+    IF NEW.status = 'completed' THEN
+        PERFORM add_transaction_to_sales_rollup(NEW, 1);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_sales_rollup_transaction_insert
+AFTER INSERT ON transactions
+FOR EACH ROW
+WHEN (NEW.status = 'completed')
+EXECUTE FUNCTION update_sales_rollup_from_transaction();
+
+CREATE TRIGGER trigger_sales_rollup_transaction_update
+AFTER UPDATE ON transactions
+FOR EACH ROW
+WHEN (
+    (OLD.status = 'completed' OR NEW.status = 'completed')
+    AND (OLD.status, OLD.transaction_type, OLD.amount, OLD.payment_method_id, OLD.created_at)
+        IS DISTINCT FROM
+        (NEW.status, NEW.transaction_type, NEW.amount, NEW.payment_method_id, NEW.created_at)
+)
+EXECUTE FUNCTION update_sales_rollup_from_transaction();
+
+-- TRIGGER 10: Totaux de caisse par méthode de paiement (cash_register_details)
+-- Chaque transaction complétée rattachée à une session incrémente la ligne de
+-- sa méthode de paiement : la clôture lit les totaux sans relire les transactions
+CREATE OR REPLACE FUNCTION add_transaction_to_cash_register(p_transaction transactions, p_sign INT)
+RETURNS VOID AS $$
+DECLARE
+    v_in DECIMAL(15,2) := 0;
+    v_out DECIMAL(15,2) := 0;
+BEGIN
+    IF p_transaction.cash_register_session_id IS NULL OR p_transaction.payment_method_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF p_transaction.transaction_type IN ('sale', 'deposit', 'final_payment', 'caution') THEN
+        v_in := p_sign * ABS(p_transaction.amount);
+    ELSIF p_transaction.transaction_type IN ('refund', 'expense') THEN
+        v_out := p_sign * ABS(p_transaction.amount);
+    ELSE
+        RETURN;
+    END IF;
+
+    INSERT INTO cash_register_details (
+        session_id, payment_method_id, total_in, total_out, expected_closing
+    ) VALUES (
+        p_transaction.cash_register_session_id, p_transaction.payment_method_id,
+        v_in, v_out, v_in - v_out
+    )
+    ON CONFLICT (session_id, payment_method_id) DO UPDATE SET
+        total_in = cash_register_details.total_in + EXCLUDED.total_in,
+        total_out = cash_register_details.total_out + EXCLUDED.total_out,
+        expected_closing = cash_register_details.expected_closing + EXCLUDED.expected_closing;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_cash_register_from_transaction()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status = 'completed' THEN
+        PERFORM add_transaction_to_cash_register(OLD, -1);
+    END IF;
+    IF NEW.status = 'completed' THEN
+        PERFORM add_transaction_to_cash_register(NEW, 1);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_cash_register_transaction_insert
+AFTER INSERT ON transactions
+FOR EACH ROW
+WHEN (NEW.status = 'completed' AND NEW.cash_register_session_id IS NOT NULL)
+EXECUTE FUNCTION update_cash_register_from_transaction();
+
+CREATE TRIGGER trigger_cash_register_transaction_update
+AFTER UPDATE ON transactions
+FOR EACH ROW
+WHEN (
+    (OLD.status = 'completed' OR NEW.status = 'completed')
+    AND (OLD.cash_register_session_id IS NOT NULL OR NEW.cash_register_session_id IS NOT NULL)
+    AND (OLD.status, OLD.transaction_type, OLD.amount, OLD.payment_method_id, OLD.cash_register_session_id)
+        IS DISTINCT FROM
+        (NEW.status, NEW.transaction_type, NEW.amount, NEW.payment_method_id, NEW.cash_register_session_id)
+)
+EXECUTE FUNCTION update_cash_register_from_transaction();
+
+-- TRIGGER 11: Statistiques d'achat par client (client_stats)
+-- Une commande est retirée (-1) puis rajoutée (+1) quand elle change de client,
+-- de montant, de statut de paiement ou de date ; la date du dernier achat est
+-- recalculée seulement si la commande retirée était la plus récente
+CREATE OR REPLACE FUNCTION add_order_to_client_stats(p_order orders, p_sign INT)
+RETURNS VOID AS $$
+DECLARE
+    v_month DATE := DATE_TRUNC('month', store_local_time(p_order.store_id, p_order.created_at))::DATE;
+    v_spent DECIMAL(15,2) := CASE
+        WHEN p_order.statut_paiement IN ('Payer', 'Partiellement') THEN p_sign * p_order.total_amount
+        ELSE 0
+    END;
+BEGIN
+    INSERT INTO client_stats (
+        client_id, store_id, orders_count, total_spent, last_purchase_at,
+        month_start, month_orders_count, month_spent
+    ) VALUES (
+        p_order.client_id, p_order.store_id, p_sign, v_spent,
+        CASE WHEN p_sign > 0 THEN p_order.created_at END,
+        v_month, p_sign, v_spent
+    )
+    ON CONFLICT (client_id) DO UPDATE SET
+        orders_count = client_stats.orders_count + EXCLUDED.orders_count,
+        total_spent = client_stats.total_spent + EXCLUDED.total_spent,
+        last_purchase_at = GREATEST(client_stats.last_purchase_at, EXCLUDED.last_purchase_at),
+        month_start = GREATEST(client_stats.month_start, EXCLUDED.month_start),
+        month_orders_count = CASE
+            WHEN client_stats.month_start IS NULL OR EXCLUDED.month_start > client_stats.month_start
+                THEN EXCLUDED.month_orders_count
+            WHEN EXCLUDED.month_start = client_stats.month_start
+                THEN client_stats.month_orders_count + EXCLUDED.month_orders_count
+            ELSE client_stats.month_orders_count
+        END,
+        month_spent = CASE
+            WHEN client_stats.month_start IS NULL OR EXCLUDED.month_start > client_stats.month_start
+                THEN EXCLUDED.month_spent
+            WHEN EXCLUDED.month_start = client_stats.month_start
+                THEN client_stats.month_spent + EXCLUDED.month_spent
+            ELSE client_stats.month_spent
+        END;
+
+    IF p_sign < 0 THEN
+        UPDATE client_stats
+        SET last_purchase_at = (SELECT MAX(created_at) FROM orders WHERE client_id = p_order.client_id)
+        WHERE client_id = p_order.client_id
+          AND last_purchase_at <= p_order.created_at;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_client_stats_from_order()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.client_id IS NOT NULL THEN
+        PERFORM add_order_to_client_stats(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.client_id IS NOT NULL THEN
+        PERFORM add_order_to_client_stats(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_client_stats_order_insert
+AFTER INSERT ON orders
+FOR EACH ROW
+WHEN (NEW.client_id IS NOT NULL)
+EXECUTE FUNCTION update_client_stats_from_order();
+
+CREATE TRIGGER trigger_client_stats_order_update
+AFTER UPDATE ON orders
+FOR EACH ROW
+WHEN (
+    (OLD.client_id IS NOT NULL OR NEW.client_id IS NOT NULL)
+    AND (OLD.client_id, OLD.total_amount, OLD.statut_paiement, OLD.created_at)
+        IS DISTINCT FROM
+        (NEW.client_id, NEW.total_amount, NEW.statut_paiement, NEW.created_at)
+)
+EXECUTE FUNCTION update_client_stats_from_order();
+
+CREATE TRIGGER trigger_client_stats_order_delete
+AFTER DELETE ON orders
+FOR EACH ROW
+WHEN (OLD.client_id IS NOT NULL)
+EXECUTE FUNCTION update_client_stats_from_order();
+
+-- TRIGGER 12: Notification des modifications de codes-barres (cache de scan)
+-- Chaque processus de l'API garde en mémoire l'index des codes-barres de son
+-- magasin ; un NOTIFY 'barcode_cache' (store_id:product_id), délivré au COMMIT,
+-- leur fait retirer les entrées du produit et de ses variantes. Les messages
+-- identiques d'une même transaction sont fusionnés par PostgreSQL.
+CREATE OR REPLACE FUNCTION notify_barcode_product(p_product_id UUID, p_store_id UUID DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    IF p_store_id IS NULL THEN
+        SELECT store_id INTO p_store_id FROM products WHERE id = p_product_id;
+    END IF;
+    IF p_store_id IS NOT NULL AND p_product_id IS NOT NULL THEN
+        PERFORM pg_notify('barcode_cache', p_store_id || ':' || p_product_id);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_barcode_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'products' THEN
+        PERFORM notify_barcode_product(OLD.id, OLD.store_id);
+        IF TG_OP = 'UPDATE' THEN
+            PERFORM notify_barcode_product(NEW.id, NEW.store_id);
+        END IF;
+    ELSE
+        PERFORM notify_barcode_product(OLD.product_id);
+        IF TG_OP = 'UPDATE' THEN
+            PERFORM notify_barcode_product(NEW.product_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Un nouveau code-barres, absent de l'index, est relu en base : seules
+-- les modifications et les suppressions sont notifiées
+CREATE TRIGGER trigger_barcode_notify_product
+AFTER UPDATE OF barcode, sku, name, selling_price, tax_rate, stock_quantity_primary,
+    primary_unit, track_stock, is_active, store_id
+    OR DELETE ON products
+FOR EACH ROW
+EXECUTE FUNCTION notify_barcode_change();
+
+CREATE TRIGGER trigger_barcode_notify_variant
+AFTER UPDATE OF barcode, sku, variant_name, selling_price, stock_quantity, is_active, product_id
+    OR DELETE ON product_variants
+FOR EACH ROW
+EXECUTE FUNCTION notify_barcode_change();
+
 -- =====================================================
 -- 14. ROW LEVEL SECURITY (RLS)
 -- =====================================================
@@ -0,0 +1,101 @@
+-- =====================================================
+-- MIGRATION: Compteurs de numérotation par magasin
+-- Remplace le COUNT(*) + WHILE EXISTS des triggers de numérotation par une
+-- table de compteurs (codes clients, numéros de commande et de session).
+-- À exécuter une fois sur une base créée avec une version antérieure de init.sql.
+-- =====================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS document_counters (
+    store_id UUID NOT NULL REFERENCES stores(id) ON DELETE CASCADE,
+    scope VARCHAR(20) NOT NULL, -- client, order, session
+    period VARCHAR(8) NOT NULL DEFAULT '',
+    last_value INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (store_id, scope, period)
+);
+
+-- Reprendre la numérotation là où elle s'est arrêtée
+INSERT INTO document_counters (store_id, scope, period, last_value)
+SELECT store_id, 'client', '', MAX(SUBSTRING(code FROM '^CLI-(\d+)$')::INT)
+FROM clients
+WHERE code ~ '^CLI-\d+$'
+GROUP BY store_id
+ON CONFLICT DO NOTHING;
+
+INSERT INTO document_counters (store_id, scope, period, last_value)
+SELECT store_id, 'order', SUBSTRING(order_number FROM 5 FOR 8), MAX(SUBSTRING(order_number FROM '^CMD-\d{8}-(\d+)$')::INT)
+FROM orders
+WHERE order_number ~ '^CMD-\d{8}-\d+$'
+GROUP BY store_id, SUBSTRING(order_number FROM 5 FOR 8)
+ON CONFLICT DO NOTHING;
+
+-- Les numéros sont uniques par magasin
+ALTER TABLE clients DROP CONSTRAINT IF EXISTS clients_code_key;
+ALTER TABLE clients ADD CONSTRAINT clients_store_id_code_key UNIQUE (store_id, code);
+ALTER TABLE orders DROP CONSTRAINT IF EXISTS orders_order_number_key;
+ALTER TABLE orders ADD CONSTRAINT orders_store_id_order_number_key UNIQUE (store_id, order_number);
+ALTER TABLE cash_register_sessions DROP CONSTRAINT IF EXISTS cash_register_sessions_session_number_key;
+ALTER TABLE cash_register_sessions ADD CONSTRAINT cash_register_sessions_store_id_session_number_key UNIQUE (store_id, session_number);
+
+-- Allocation du prochain numéro d'un compteur. La ligne du compteur reste
+-- verrouillée jusqu'au COMMIT : deux transactions concurrentes d'un même
+-- magasin obtiennent des numéros distincts, sans COUNT(*) sur la table.
+CREATE OR REPLACE FUNCTION next_document_number(p_store_id UUID, p_scope VARCHAR, p_period VARCHAR DEFAULT '')
+RETURNS INT AS $$
+    INSERT INTO document_counters (store_id, scope, period, last_value)
+    VALUES (p_store_id, p_scope, p_period, 1)
+    ON CONFLICT (store_id, scope, period)
+    DO UPDATE SET last_value = document_counters.last_value + 1
+    RETURNING last_value;
+$$ LANGUAGE sql;
+
+-- TRIGGER 1: Auto-génération du code client
+CREATE OR REPLACE FUNCTION generate_client_code()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.code IS NULL OR NEW.code = '' THEN
+        NEW.code := 'CLI-' || LPAD(next_document_number(NEW.store_id, 'client')::TEXT, 6, '0');
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRIGGER 2: Auto-génération du numéro de commande (compteur par magasin et par jour)
+CREATE OR REPLACE FUNCTION generate_order_number()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_date VARCHAR(8);
+BEGIN
+    IF NEW.order_number IS NULL OR NEW.order_number = '' THEN
+        v_date := TO_CHAR(NOW(), 'YYYYMMDD');
+        NEW.order_number := 'CMD-' || v_date || '-'
+            || LPAD(next_document_number(NEW.store_id, 'order', v_date)::TEXT, 4, '0');
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRIGGER 2 bis: Auto-génération du numéro de session de caisse (par magasin et par jour)
+CREATE OR REPLACE FUNCTION generate_session_number()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_date VARCHAR(8);
+BEGIN
+    IF NEW.session_number IS NULL OR NEW.session_number = '' THEN
+        v_date := TO_CHAR(NOW(), 'YYYYMMDD');
+        NEW.session_number := 'SES-' || v_date || '-'
+            || LPAD(next_document_number(NEW.store_id, 'session', v_date)::TEXT, 3, '0');
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_generate_session_number ON cash_register_sessions;
+
+CREATE TRIGGER trigger_generate_session_number
+BEFORE INSERT ON cash_register_sessions
+FOR EACH ROW
+EXECUTE FUNCTION generate_session_number();
+
+COMMIT;
@@ -0,0 +1,150 @@
+-- =====================================================
+-- MIGRATION: Déduction et réintégration du stock ensemblistes
+-- Les triggers deduct_stock_on_order et restock_after_refund parcouraient les
+-- lignes de commande une à une (SELECT produit, jusqu'à deux UPDATE et un
+-- INSERT par ligne). Ils appliquent désormais toute la commande en une
+-- requête par table. Les triggers existants pointent déjà sur ces fonctions.
+-- =====================================================
+
+BEGIN;
+
+-- Application des lignes d'une commande au stock, en une requête par table
+-- (p_sign = -1 pour une vente, 1 pour un remboursement). Les lignes d'un même
+-- produit sont cumulées ; pour un produit multi-unités, l'unité secondaire
+-- sert de référence dès qu'une ligne est exprimée dans cette unité.
+CREATE OR REPLACE FUNCTION apply_order_items_to_stock(p_order_id UUID, p_sign INT)
+RETURNS VOID AS $$
+BEGIN
+    -- Verrouiller les produits par ordre d'id (pas d'interblocage entre commandes)
+    PERFORM 1 FROM products
+    WHERE id IN (SELECT product_id FROM order_items WHERE order_id = p_order_id)
+    ORDER BY id
+    FOR UPDATE;
+
+    -- Produits avec variante
+    UPDATE product_variants pv
+    SET stock_quantity = pv.stock_quantity + p_sign * d.quantity
+    FROM (
+        SELECT oi.variant_id, SUM(oi.quantity) AS quantity
+        FROM order_items oi
+        JOIN products p ON p.id = oi.product_id
+        WHERE oi.order_id = p_order_id
+          AND oi.variant_id IS NOT NULL
+          AND p.track_stock
+        GROUP BY oi.variant_id
+    ) d
+    WHERE pv.id = d.variant_id;
+
+    -- Produits sans variante, conversion d'unités calculée dans la requête
+    UPDATE products p
+    SET stock_quantity_primary = CASE
+            WHEN p.has_multiple_units AND d.secondary_quantity <> 0
+                THEN (p.stock_quantity_secondary
+                      + p_sign * (d.secondary_quantity + d.primary_quantity * p.units_per_primary)) / p.units_per_primary
+            ELSE p.stock_quantity_primary + p_sign * d.primary_quantity
+        END,
+        stock_quantity_secondary = CASE
+            WHEN p.has_multiple_units AND d.secondary_quantity = 0
+                THEN (p.stock_quantity_primary + p_sign * d.primary_quantity) * p.units_per_primary
+            WHEN p.has_multiple_units
+                THEN p.stock_quantity_secondary
+                     + p_sign * (d.secondary_quantity + d.primary_quantity * p.units_per_primary)
+            ELSE p.stock_quantity_secondary + p_sign * d.secondary_quantity
+        END
+    FROM (
+        SELECT
+            product_id,
+            SUM(CASE WHEN unit = 'primary' THEN quantity ELSE 0 END) AS primary_quantity,
+            SUM(CASE WHEN unit = 'primary' THEN 0 ELSE quantity END) AS secondary_quantity
+        FROM order_items
+        WHERE order_id = p_order_id AND variant_id IS NULL
+        GROUP BY product_id
+    ) d
+    WHERE p.id = d.product_id AND p.track_stock;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRIGGER 4: Déduction automatique du stock lors d'une commande
+CREATE OR REPLACE FUNCTION deduct_stock_on_order()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Vérifier que la commande est confirmée ou complétée
+    IF NEW.status IN ('confirmed', 'completed')
+       AND (OLD.status IS NULL OR OLD.status NOT IN ('confirmed', 'completed')) THEN
+
+        PERFORM apply_order_items_to_stock(NEW.id, -1);
+
+        -- Enregistrer les mouvements de stock
+        INSERT INTO stock_movements (
+            store_id, product_id, variant_id, movement_type,
+            quantity, unit, reference_type, reference_id, performed_by
+        )
+        SELECT
+            NEW.store_id, oi.product_id, oi.variant_id, 'out',
+            oi.quantity, oi.unit, 'order', NEW.id, NEW.created_by
+        FROM order_items oi
+        JOIN products p ON p.id = oi.product_id
+        WHERE oi.order_id = NEW.id AND p.track_stock;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRIGGER 5: Réintégration du stock lors d'un remboursement
+CREATE OR REPLACE FUNCTION restock_after_refund()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_order RECORD;
+    v_loyalty_earned INT;
+BEGIN
+    IF NEW.transaction_type = 'refund' AND NEW.status = 'completed' THEN
+        -- Récupérer la commande
+        SELECT * INTO v_order FROM orders WHERE id = NEW.order_id;
+
+        -- Réintégrer le stock des articles
+        PERFORM apply_order_items_to_stock(NEW.order_id, 1);
+
+        -- Enregistrer les mouvements de stock
+        INSERT INTO stock_movements (
+            store_id, product_id, variant_id, movement_type,
+            quantity, unit, reference_type, reference_id, performed_by
+        )
+        SELECT
+            NEW.store_id, oi.product_id, oi.variant_id, 'in',
+            oi.quantity, oi.unit, 'refund', NEW.id, NEW.processed_by
+        FROM order_items oi
+        JOIN products p ON p.id = oi.product_id
+        WHERE oi.order_id = NEW.order_id AND p.track_stock;
+
+        -- Déduire les points de fidélité si la commande était payée
+        IF v_order.client_id IS NOT NULL AND v_order.statut_paiement IN ('Payer', 'Partiellement') THEN
+            -- Calculer les points qui avaient été attribués (1 point par 1000 XOF)
+            v_loyalty_earned := FLOOR(v_order.total_amount / 1000);
+
+            UPDATE clients
+            SET loyalty_points = GREATEST(0, loyalty_points - v_loyalty_earned)
+            WHERE id = v_order.client_id;
+
+            -- Enregistrer l'historique
+            INSERT INTO loyalty_points_history (
+                client_id, order_id, movement_type, points,
+                balance_before, balance_after, notes
+            )
+            SELECT
+                v_order.client_id,
+                v_order.id,
+                'deducted',
+                -v_loyalty_earned,
+                loyalty_points + v_loyalty_earned,
+                loyalty_points,
+                'Déduction suite au remboursement de la commande ' || v_order.order_number
+            FROM clients WHERE id = v_order.client_id;
+        END IF;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,220 @@
+-- =====================================================
+-- MIGRATION: Agrégats de ventes pour le tableau de bord
+-- Crée sales_daily_rollups, les triggers qui la tiennent à jour et la remplit
+-- à partir des commandes et transactions complétées existantes.
+-- =====================================================
+
+BEGIN;
+
+-- Bloquer les écritures pendant le remplissage (ni perte ni double comptage)
+LOCK TABLE orders, transactions IN SHARE ROW EXCLUSIVE MODE;
+
+-- AGRÉGATS DE VENTES (tableau de bord)
+-- Une ligne par magasin, jour et heure (heure locale du magasin), canal, type
+-- de commande et méthode de paiement, tenue à jour par triggers. Les lignes de
+-- commande ont payment_method_id = UUID nul ; les lignes de transaction
+-- portent la méthode de paiement.
+CREATE TABLE sales_daily_rollups (
+    store_id UUID NOT NULL REFERENCES stores(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    hour SMALLINT NOT NULL, -- 0-23
+    channel VARCHAR(50) NOT NULL DEFAULT '', -- order_source: pos, ecommerce ('' sans commande)
+    order_type VARCHAR(50) NOT NULL DEFAULT '',
+    payment_method_id UUID NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000',
+
+    -- Commandes complétées
+    orders_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(15,2) NOT NULL DEFAULT 0,
+    discount_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+    tax_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+
+    -- Transactions complétées
+    payments_count INT NOT NULL DEFAULT 0,
+    payments_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+    refunds_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+    expenses_amount DECIMAL(15,2) NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (store_id, day, hour, channel, order_type, payment_method_id)
+);
+
+-- TRIGGER 9: Agrégats de ventes du tableau de bord (sales_daily_rollups)
+-- Les horodatages (TIMESTAMP sans fuseau, en UTC) sont ramenés à l'heure locale du magasin
+CREATE OR REPLACE FUNCTION store_local_time(p_store_id UUID, p_at TIMESTAMP)
+RETURNS TIMESTAMP AS $$
+    SELECT (p_at AT TIME ZONE 'UTC') AT TIME ZONE COALESCE(
+        (SELECT timezone FROM stores WHERE id = p_store_id), 'UTC'
+    );
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION add_order_to_sales_rollup(p_order orders, p_sign INT)
+RETURNS VOID AS $$
+DECLARE
+    v_local TIMESTAMP := store_local_time(p_order.store_id, p_order.created_at);
+BEGIN
+    INSERT INTO sales_daily_rollups (
+        store_id, day, hour, channel, order_type,
+        orders_count, revenue, discount_amount, tax_amount
+    ) VALUES (
+        p_order.store_id, v_local::DATE, EXTRACT(HOUR FROM v_local),
+        COALESCE(p_order.order_source, ''), p_order.order_type,
+        p_sign,
+        p_sign * p_order.total_amount,
+        p_sign * (COALESCE(p_order.discount_amount, 0) + COALESCE(p_order.promo_code_discount, 0)
+                  + COALESCE(p_order.loyalty_discount, 0)),
+        p_sign * COALESCE(p_order.tax_amount, 0)
+    )
+    ON CONFLICT (store_id, day, hour, channel, order_type, payment_method_id) DO UPDATE SET
+        orders_count = sales_daily_rollups.orders_count + EXCLUDED.orders_count,
+        revenue = sales_daily_rollups.revenue + EXCLUDED.revenue,
+        discount_amount = sales_daily_rollups.discount_amount + EXCLUDED.discount_amount,
+        tax_amount = sales_daily_rollups.tax_amount + EXCLUDED.tax_amount;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION add_transaction_to_sales_rollup(p_transaction transactions, p_sign INT)
+RETURNS VOID AS $$
+DECLARE
+    v_local TIMESTAMP := store_local_time(p_transaction.store_id, p_transaction.created_at);
+    v_channel VARCHAR(50) := '';
+    v_order_type VARCHAR(50) := '';
+    v_amount DECIMAL(15,2) := p_sign * ABS(p_transaction.amount);
+    v_is_payment BOOLEAN := p_transaction.transaction_type IN ('sale', 'deposit', 'final_payment');
+BEGIN
+    IF NOT v_is_payment AND p_transaction.transaction_type NOT IN ('refund', 'expense') THEN
+        RETURN;
+    END IF;
+
+    IF p_transaction.order_id IS NOT NULL THEN
+        SELECT COALESCE(order_source, ''), order_type INTO v_channel, v_order_type
+        FROM orders WHERE id = p_transaction.order_id;
+    END IF;
+
+    INSERT INTO sales_daily_rollups (
+        store_id, day, hour, channel, order_type, payment_method_id,
+        payments_count, payments_amount, refunds_amount, expenses_amount
+    ) VALUES (
+        p_transaction.store_id, v_local::DATE, EXTRACT(HOUR FROM v_local),
+        v_channel, v_order_type,
+        COALESCE(p_transaction.payment_method_id, '00000000-0000-0000-0000-000000000000'),
+        CASE WHEN v_is_payment THEN p_sign ELSE 0 END,
+        CASE WHEN v_is_payment THEN v_amount ELSE 0 END,
+        CASE WHEN p_transaction.transaction_type = 'refund' THEN v_amount ELSE 0 END,
+        CASE WHEN p_transaction.transaction_type = 'expense' THEN v_amount ELSE 0 END
+    )
+    ON CONFLICT (store_id, day, hour, channel, order_type, payment_method_id) DO UPDATE SET
+        payments_count = sales_daily_rollups.payments_count + EXCLUDED.payments_count,
+        payments_amount = sales_daily_rollups.payments_amount + EXCLUDED.payments_amount,
+        refunds_amount = sales_daily_rollups.refunds_amount + EXCLUDED.refunds_amount,
+        expenses_amount = sales_daily_rollups.expenses_amount + EXCLUDED.expenses_amount;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Seules les commandes et transactions complétées sont comptées : une ligne qui
+-- quitte l'état completed (annulation) ou change de montant est retirée puis rajoutée
+CREATE OR REPLACE FUNCTION update_sales_rollup_from_order()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status = 'completed' THEN
+        PERFORM add_order_to_sales_rollup(OLD, -1);
+    END IF;
+    IF NEW.status = 'completed' THEN
+        PERFORM add_order_to_sales_rollup(NEW, 1);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_sales_rollup_order_insert
+AFTER INSERT ON orders
+FOR EACH ROW
+WHEN (NEW.status = 'completed')
+EXECUTE FUNCTION update_sales_rollup_from_order();
+
+CREATE TRIGGER trigger_sales_rollup_order_update
+AFTER UPDATE ON orders
+FOR EACH ROW
+WHEN (
+    (OLD.status = 'completed' OR NEW.status = 'completed')
+    AND (OLD.status, OLD.total_amount, OLD.discount_amount, OLD.promo_code_discount,
+         OLD.loyalty_discount, OLD.tax_amount, OLD.order_type, OLD.order_source, OLD.created_at)
+        IS DISTINCT FROM
+        (NEW.status, NEW.total_amount, NEW.discount_amount, NEW.promo_code_discount,
+         NEW.loyalty_discount, NEW.tax_amount, NEW.order_type, NEW.order_source, NEW.created_at)
+)
+EXECUTE FUNCTION update_sales_rollup_from_order();
+
+CREATE OR REPLACE FUNCTION update_sales_rollup_from_transaction()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status = 'completed' THEN
+        PERFORM add_transaction_to_sales_rollup(OLD, -1);
+    END IF;
+    IF NEW.status = 'completed' THEN
+        PERFORM add_transaction_to_sales_rollup(NEW, 1);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_sales_rollup_transaction_insert
+AFTER INSERT ON transactions
+FOR EACH ROW
+WHEN (NEW.status = 'completed')
+EXECUTE FUNCTION update_sales_rollup_from_transaction();
+
+CREATE TRIGGER trigger_sales_rollup_transaction_update
+AFTER UPDATE ON transactions
+FOR EACH ROW
+WHEN (
+    (OLD.status = 'completed' OR NEW.status = 'completed')
+    AND (OLD.status, OLD.transaction_type, OLD.amount, OLD.payment_method_id, OLD.created_at)
+        IS DISTINCT FROM
+        (NEW.status, NEW.transaction_type, NEW.amount, NEW.payment_method_id, NEW.created_at)
+)
+EXECUTE FUNCTION update_sales_rollup_from_transaction();
+
+-- Remplissage initial
+INSERT INTO sales_daily_rollups (
+    store_id, day, hour, channel, order_type,
+    orders_count, revenue, discount_amount, tax_amount
+)
+SELECT
+    store_id, local_at::DATE, EXTRACT(HOUR FROM local_at), COALESCE(order_source, ''), order_type,
+    COUNT(*),
+    SUM(total_amount),
+    SUM(COALESCE(discount_amount, 0) + COALESCE(promo_code_discount, 0) + COALESCE(loyalty_discount, 0)),
+    SUM(COALESCE(tax_amount, 0))
+FROM (
+    SELECT o.*, store_local_time(o.store_id, o.created_at) AS local_at
+    FROM orders o
+    WHERE o.status = 'completed'
+) o
+GROUP BY 1, 2, 3, 4, 5;
+
+INSERT INTO sales_daily_rollups (
+    store_id, day, hour, channel, order_type, payment_method_id,
+    payments_count, payments_amount, refunds_amount, expenses_amount
+)
+SELECT
+    store_id, local_at::DATE, EXTRACT(HOUR FROM local_at), channel, order_type, payment_method_id,
+    COUNT(*) FILTER (WHERE transaction_type IN ('sale', 'deposit', 'final_payment')),
+    COALESCE(SUM(ABS(amount)) FILTER (WHERE transaction_type IN ('sale', 'deposit', 'final_payment')), 0),
+    COALESCE(SUM(ABS(amount)) FILTER (WHERE transaction_type = 'refund'), 0),
+    COALESCE(SUM(ABS(amount)) FILTER (WHERE transaction_type = 'expense'), 0)
+FROM (
+    SELECT
+        t.store_id,
+        t.transaction_type,
+        t.amount,
+        store_local_time(t.store_id, t.created_at) AS local_at,
+        COALESCE(o.order_source, '') AS channel,
+        COALESCE(o.order_type, '') AS order_type,
+        COALESCE(t.payment_method_id, '00000000-0000-0000-0000-000000000000') AS payment_method_id
+    FROM transactions t
+    LEFT JOIN orders o ON o.id = t.order_id
+    WHERE t.status = 'completed'
+      AND t.transaction_type IN ('sale', 'deposit', 'final_payment', 'refund', 'expense')
+) t
+GROUP BY 1, 2, 3, 4, 5, 6;
+
+COMMIT;
@@ -0,0 +1,8 @@
+-- =====================================================
+-- MIGRATION: Index des rapports produits
+-- Les rapports top ventes et ABC filtrent les commandes complétées d'un
+-- magasin sur une période.
+-- =====================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_store_status_created
+ON orders(store_id, status, created_at);
@@ -0,0 +1,118 @@
+-- =====================================================
+-- MIGRATION: Totaux de caisse tenus à jour par trigger
+-- Ajoute les horodatages manquants des sessions, une ligne de détail unique
+-- par session et méthode de paiement, une seule session ouverte par caissier,
+-- le trigger sur transactions et recalcule les totaux existants.
+-- =====================================================
+
+BEGIN;
+
+-- Bloquer les écritures pendant le recalcul (ni perte ni double comptage)
+LOCK TABLE transactions, cash_register_sessions, cash_register_details IN SHARE ROW EXCLUSIVE MODE;
+
+ALTER TABLE cash_register_sessions
+    ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT NOW(),
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+
+CREATE TRIGGER trigger_update_timestamp_cash_register_sessions
+BEFORE UPDATE ON cash_register_sessions FOR EACH ROW EXECUTE FUNCTION update_timestamp();
+
+CREATE TRIGGER trigger_update_timestamp_cash_register_details
+BEFORE UPDATE ON cash_register_details FOR EACH ROW EXECUTE FUNCTION update_timestamp();
+
+ALTER TABLE cash_register_details
+    ADD CONSTRAINT cash_register_details_session_id_payment_method_id_key
+    UNIQUE (session_id, payment_method_id);
+
+-- Une seule session ouverte par caissier et par magasin
+CREATE UNIQUE INDEX idx_cash_sessions_one_open ON cash_register_sessions(store_id, opened_by)
+    WHERE status = 'open';
+
+-- TRIGGER 10: Totaux de caisse par méthode de paiement (cash_register_details)
+-- Chaque transaction complétée rattachée à une session incrémente la ligne de
+-- sa méthode de paiement : la clôture lit les totaux sans relire les transactions
+CREATE OR REPLACE FUNCTION add_transaction_to_cash_register(p_transaction transactions, p_sign INT)
+RETURNS VOID AS $$
+DECLARE
+    v_in DECIMAL(15,2) := 0;
+    v_out DECIMAL(15,2) := 0;
+BEGIN
+    IF p_transaction.cash_register_session_id IS NULL OR p_transaction.payment_method_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF p_transaction.transaction_type IN ('sale', 'deposit', 'final_payment', 'caution') THEN
+        v_in := p_sign * ABS(p_transaction.amount);
+    ELSIF p_transaction.transaction_type IN ('refund', 'expense') THEN
+        v_out := p_sign * ABS(p_transaction.amount);
+    ELSE
+        RETURN;
+    END IF;
+
+    INSERT INTO cash_register_details (
+        session_id, payment_method_id, total_in, total_out, expected_closing
+    ) VALUES (
+        p_transaction.cash_register_session_id, p_transaction.payment_method_id,
+        v_in, v_out, v_in - v_out
+    )
+    ON CONFLICT (session_id, payment_method_id) DO UPDATE SET
+        total_in = cash_register_details.total_in + EXCLUDED.total_in,
+        total_out = cash_register_details.total_out + EXCLUDED.total_out,
+        expected_closing = cash_register_details.expected_closing + EXCLUDED.expected_closing;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_cash_register_from_transaction()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status = 'completed' THEN
+        PERFORM add_transaction_to_cash_register(OLD, -1);
+    END IF;
+    IF NEW.status = 'completed' THEN
+        PERFORM add_transaction_to_cash_register(NEW, 1);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_cash_register_transaction_insert
+AFTER INSERT ON transactions
+FOR EACH ROW
+WHEN (NEW.status = 'completed' AND NEW.cash_register_session_id IS NOT NULL)
+EXECUTE FUNCTION update_cash_register_from_transaction();
+
+CREATE TRIGGER trigger_cash_register_transaction_update
+AFTER UPDATE ON transactions
+FOR EACH ROW
+WHEN (
+    (OLD.status = 'completed' OR NEW.status = 'completed')
+    AND (OLD.cash_register_session_id IS NOT NULL OR NEW.cash_register_session_id IS NOT NULL)
+    AND (OLD.status, OLD.transaction_type, OLD.amount, OLD.payment_method_id, OLD.cash_register_session_id)
+        IS DISTINCT FROM
+        (NEW.status, NEW.transaction_type, NEW.amount, NEW.payment_method_id, NEW.cash_register_session_id)
+)
+EXECUTE FUNCTION update_cash_register_from_transaction();
+
+-- Recalcul des totaux à partir des transactions complétées existantes
+INSERT INTO cash_register_details (session_id, payment_method_id, total_in, total_out)
+SELECT
+    t.cash_register_session_id,
+    t.payment_method_id,
+    COALESCE(SUM(ABS(t.amount)) FILTER (
+        WHERE t.transaction_type IN ('sale', 'deposit', 'final_payment', 'caution')
+    ), 0),
+    COALESCE(SUM(ABS(t.amount)) FILTER (WHERE t.transaction_type IN ('refund', 'expense')), 0)
+FROM transactions t
+JOIN cash_register_sessions s ON s.id = t.cash_register_session_id
+WHERE t.status = 'completed'
+  AND t.payment_method_id IS NOT NULL
+  AND t.transaction_type IN ('sale', 'deposit', 'final_payment', 'caution', 'refund', 'expense')
+GROUP BY 1, 2
+ON CONFLICT (session_id, payment_method_id) DO UPDATE SET
+    total_in = EXCLUDED.total_in,
+    total_out = EXCLUDED.total_out;
+
+UPDATE cash_register_details
+SET expected_closing = COALESCE(opening_amount, 0) + total_in - total_out;
+
+COMMIT;
@@ -0,0 +1,151 @@
+-- =====================================================
+-- MIGRATION: Statistiques d'achat par client
+-- Crée client_stats, le trigger sur orders qui la tient à jour et la remplit
+-- à partir des commandes existantes.
+-- =====================================================
+
+BEGIN;
+
+-- Bloquer les écritures pendant le remplissage (ni perte ni double comptage)
+LOCK TABLE orders IN SHARE ROW EXCLUSIVE MODE;
+
+-- STATISTIQUES D'ACHAT PAR CLIENT
+-- Une ligne par client, tenue à jour par trigger sur orders (les paiements
+-- modifient statut_paiement de la commande). Le mois en cours est un compteur
+-- remis à zéro au premier achat d'un nouveau mois (mois local du magasin).
+CREATE TABLE client_stats (
+    client_id UUID PRIMARY KEY REFERENCES clients(id) ON DELETE CASCADE,
+    store_id UUID NOT NULL REFERENCES stores(id) ON DELETE CASCADE,
+
+    orders_count INT NOT NULL DEFAULT 0,
+    total_spent DECIMAL(15,2) NOT NULL DEFAULT 0, -- commandes payées ou partiellement payées
+    last_purchase_at TIMESTAMP,
+
+    month_start DATE, -- mois des compteurs ci-dessous
+    month_orders_count INT NOT NULL DEFAULT 0,
+    month_spent DECIMAL(15,2) NOT NULL DEFAULT 0
+);
+
+CREATE INDEX idx_client_stats_store_last_purchase ON client_stats(store_id, last_purchase_at);
+
+-- TRIGGER 11: Statistiques d'achat par client (client_stats)
+-- Une commande est retirée (-1) puis rajoutée (+1) quand elle change de client,
+-- de montant, de statut de paiement ou de date ; la date du dernier achat est
+-- recalculée seulement si la commande retirée était la plus récente
+CREATE OR REPLACE FUNCTION add_order_to_client_stats(p_order orders, p_sign INT)
+RETURNS VOID AS $$
+DECLARE
+    v_month DATE := DATE_TRUNC('month', store_local_time(p_order.store_id, p_order.created_at))::DATE;
+    v_spent DECIMAL(15,2) := CASE
+        WHEN p_order.statut_paiement IN ('Payer', 'Partiellement') THEN p_sign * p_order.total_amount
+        ELSE 0
+    END;
+BEGIN
+    INSERT INTO client_stats (
+        client_id, store_id, orders_count, total_spent, last_purchase_at,
+        month_start, month_orders_count, month_spent
+    ) VALUES (
+        p_order.client_id, p_order.store_id, p_sign, v_spent,
+        CASE WHEN p_sign > 0 THEN p_order.created_at END,
+        v_month, p_sign, v_spent
+    )
+    ON CONFLICT (client_id) DO UPDATE SET
+        orders_count = client_stats.orders_count + EXCLUDED.orders_count,
+        total_spent = client_stats.total_spent + EXCLUDED.total_spent,
+        last_purchase_at = GREATEST(client_stats.last_purchase_at, EXCLUDED.last_purchase_at),
+        month_start = GREATEST(client_stats.month_start, EXCLUDED.month_start),
+        month_orders_count = CASE
+            WHEN client_stats.month_start IS NULL OR EXCLUDED.month_start > client_stats.month_start
+                THEN EXCLUDED.month_orders_count
+            WHEN EXCLUDED.month_start = client_stats.month_start
+                THEN client_stats.month_orders_count + EXCLUDED.month_orders_count
+            ELSE client_stats.month_orders_count
+        END,
+        month_spent = CASE
+            WHEN client_stats.month_start IS NULL OR EXCLUDED.month_start > client_stats.month_start
+                THEN EXCLUDED.month_spent
+            WHEN EXCLUDED.month_start = client_stats.month_start
+                THEN client_stats.month_spent + EXCLUDED.month_spent
+            ELSE client_stats.month_spent
+        END;
+
+    IF p_sign < 0 THEN
+        UPDATE client_stats
+        SET last_purchase_at = (SELECT MAX(created_at) FROM orders WHERE client_id = p_order.client_id)
+        WHERE client_id = p_order.client_id
+          AND last_purchase_at <= p_order.created_at;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_client_stats_from_order()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.client_id IS NOT NULL THEN
+        PERFORM add_order_to_client_stats(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.client_id IS NOT NULL THEN
+        PERFORM add_order_to_client_stats(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_client_stats_order_insert
+AFTER INSERT ON orders
+FOR EACH ROW
+WHEN (NEW.client_id IS NOT NULL)
+EXECUTE FUNCTION update_client_stats_from_order();
+
+CREATE TRIGGER trigger_client_stats_order_update
+AFTER UPDATE ON orders
+FOR EACH ROW
+WHEN (
+    (OLD.client_id IS NOT NULL OR NEW.client_id IS NOT NULL)
+    AND (OLD.client_id, OLD.total_amount, OLD.statut_paiement, OLD.created_at)
+        IS DISTINCT FROM
+        (NEW.client_id, NEW.total_amount, NEW.statut_paiement, NEW.created_at)
+)
+EXECUTE FUNCTION update_client_stats_from_order();
+
+CREATE TRIGGER trigger_client_stats_order_delete
+AFTER DELETE ON orders
+FOR EACH ROW
+WHEN (OLD.client_id IS NOT NULL)
+EXECUTE FUNCTION update_client_stats_from_order();
+
+-- Remplissage initial (mois en cours dans le fuseau de chaque magasin)
+INSERT INTO client_stats (
+    client_id, store_id, orders_count, total_spent, last_purchase_at,
+    month_start, month_orders_count, month_spent
+)
+SELECT
+    o.client_id,
+    c.store_id,
+    COUNT(*),
+    COALESCE(SUM(o.total_amount) FILTER (WHERE o.statut_paiement IN ('Payer', 'Partiellement')), 0),
+    MAX(o.created_at),
+    MAX(DATE_TRUNC('month', store_local_time(o.store_id, o.created_at))::DATE),
+    0,
+    0
+FROM orders o
+JOIN clients c ON c.id = o.client_id
+GROUP BY o.client_id, c.store_id;
+
+UPDATE client_stats cs
+SET month_orders_count = m.orders_count,
+    month_spent = m.spent
+FROM (
+    SELECT
+        o.client_id,
+        DATE_TRUNC('month', store_local_time(o.store_id, o.created_at))::DATE AS month_start,
+        COUNT(*) AS orders_count,
+        COALESCE(SUM(o.total_amount) FILTER (WHERE o.statut_paiement IN ('Payer', 'Partiellement')), 0) AS spent
+    FROM orders o
+    WHERE o.client_id IS NOT NULL
+    GROUP BY 1, 2
+) m
+WHERE m.client_id = cs.client_id
+  AND m.month_start = cs.month_start;
+
+COMMIT;
@@ -0,0 +1,27 @@
+-- =====================================================
+-- MIGRATION: Index de recherche des clients (autocomplete)
+-- La recherche rapide appliquait quatre ILIKE '%terme%' à chaque frappe,
+-- sans index utilisable. Le téléphone est normalisé en chiffres dans une
+-- colonne générée en collation C, dont l'index btree sert à la fois le
+-- LIKE 'préfixe%' et le tri ; prénom et nom reçoivent des index trigrammes
+-- (pg_trgm, créé ici s'il est absent).
+--
+-- L'ajout de la colonne générée réécrit la table clients (verrou exclusif
+-- le temps de la réécriture) ; les index sont ensuite créés sans bloquer
+-- les écritures, hors transaction.
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE clients
+ADD COLUMN IF NOT EXISTS phone_digits VARCHAR(20) COLLATE "C"
+GENERATED ALWAYS AS (regexp_replace(phone, '\D', '', 'g')) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_store_phone_digits
+ON clients(store_id, phone_digits);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_first_name_trgm
+ON clients USING gin (first_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_last_name_trgm
+ON clients USING gin (last_name gin_trgm_ops);
@@ -0,0 +1,21 @@
+-- =====================================================
+-- MIGRATION: Index de recherche des produits
+-- La recherche classée (/products/search) utilise similarity, word_similarity
+-- et les opérateurs % et <% de pg_trgm, sur des index GIN trigrammes.
+--
+-- Index créés sans bloquer les écritures, hors transaction.
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_name_trgm
+ON products USING gin (name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_sku_trgm
+ON products USING gin (sku gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_barcode_trgm
+ON products USING gin (barcode gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_description_trgm
+ON products USING gin (description gin_trgm_ops);
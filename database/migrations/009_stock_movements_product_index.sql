@@ -0,0 +1,9 @@
+-- =====================================================
+-- MIGRATION: Index des derniers mouvements par produit
+-- L'état du stock (/stock/current) lit la date du dernier mouvement de
+-- chaque produit de la page (sous-requête ORDER BY created_at DESC LIMIT 1) ;
+-- sans cet index, tous les mouvements du produit sont relus et triés.
+-- =====================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stock_movements_product_created
+ON stock_movements(product_id, created_at DESC);
@@ -0,0 +1,60 @@
+-- =====================================================
+-- MIGRATION: Notification des modifications de codes-barres
+-- Le cache des scans (/products/lookup/barcode) est tenu par chaque processus
+-- de l'API ; ce trigger publie sur le canal 'barcode_cache' les produits
+-- modifiés pour que tous les processus retirent leurs entrées périmées.
+-- =====================================================
+
+BEGIN;
+
+-- TRIGGER 12: Notification des modifications de codes-barres (cache de scan)
+-- Chaque processus de l'API garde en mémoire l'index des codes-barres de son
+-- magasin ; un NOTIFY 'barcode_cache' (store_id:product_id), délivré au COMMIT,
+-- leur fait retirer les entrées du produit et de ses variantes. Les messages
+-- identiques d'une même transaction sont fusionnés par PostgreSQL.
+CREATE OR REPLACE FUNCTION notify_barcode_product(p_product_id UUID, p_store_id UUID DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    IF p_store_id IS NULL THEN
+        SELECT store_id INTO p_store_id FROM products WHERE id = p_product_id;
+    END IF;
+    IF p_store_id IS NOT NULL AND p_product_id IS NOT NULL THEN
+        PERFORM pg_notify('barcode_cache', p_store_id || ':' || p_product_id);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_barcode_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'products' THEN
+        PERFORM notify_barcode_product(OLD.id, OLD.store_id);
+        IF TG_OP = 'UPDATE' THEN
+            PERFORM notify_barcode_product(NEW.id, NEW.store_id);
+        END IF;
+    ELSE
+        PERFORM notify_barcode_product(OLD.product_id);
+        IF TG_OP = 'UPDATE' THEN
+            PERFORM notify_barcode_product(NEW.product_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Un nouveau code-barres, absent de l'index, est relu en base : seules
+-- les modifications et les suppressions sont notifiées
+CREATE TRIGGER trigger_barcode_notify_product
+AFTER UPDATE OF barcode, sku, name, selling_price, tax_rate, stock_quantity_primary,
+    primary_unit, track_stock, is_active, store_id
+    OR DELETE ON products
+FOR EACH ROW
+EXECUTE FUNCTION notify_barcode_change();
+
+CREATE TRIGGER trigger_barcode_notify_variant
+AFTER UPDATE OF barcode, sku, variant_name, selling_price, stock_quantity, is_active, product_id
+    OR DELETE ON product_variants
+FOR EACH ROW
+EXECUTE FUNCTION notify_barcode_change();
+
+COMMIT;
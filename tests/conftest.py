@@ -12,7 +12,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from dotenv import load_dotenv
 
 from app.main import app
-from app.core.database import Base, get_db
+from app.core.database import Base, get_db, get_session_factory
 from app.core.config import settings
 
 # Charger les variables d'environnement
@@ -74,7 +74,11 @@ async def client(test_db) -> AsyncGenerator[AsyncClient, None]:
     async def override_get_db():
         yield test_db
 
+    # Sessions propres aux réponses en flux, sur la base de test
+    test_session_factory = async_sessionmaker(test_db.bind, class_=AsyncSession, expire_on_commit=False)
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: test_session_factory
 
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
@@ -127,3 +131,20 @@ async def auth_headers(client, test_user):
 
     token = create_access_token(subject=str(test_user.id))
     return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+async def test_payment_method_id(test_db, test_store):
+    """Crée une méthode de paiement de test (la table n'a pas de updated_at)"""
+    from uuid import uuid4
+    from sqlalchemy import insert
+    from app.models.transaction import PaymentMethod
+
+    result = await test_db.execute(
+        insert(PaymentMethod.__table__)
+        .values(id=uuid4(), store_id=test_store.id, name="Espèces", type="cash")
+        .returning(PaymentMethod.__table__.c.id)
+    )
+    payment_method_id = result.scalar_one()
+    await test_db.commit()
+    return payment_method_id
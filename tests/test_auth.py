@@ -2,6 +2,10 @@
 Tests pour l'authentification
 """
 
+import asyncio
+import time
+from datetime import timedelta
+
 import pytest
 from httpx import AsyncClient
 
@@ -133,3 +137,116 @@ async def test_logout(client: AsyncClient, auth_headers):
 
     assert response.status_code == 200
     assert response.json()["message"] == "Déconnexion réussie"
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_cached(client: AsyncClient, auth_headers):
+    """Test que les appels authentifiés répétés sont servis par le cache"""
+    from app.core.security import user_cache
+
+    await client.get("/api/v1/auth/me", headers=auth_headers)
+    hits_before = user_cache.hits
+
+    response = await client.get("/api/v1/auth/me", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert user_cache.hits == hits_before + 1
+
+
+@pytest.mark.parametrize("backend", ["jose", "pyjwt"])
+def test_decode_token_backends(monkeypatch, backend):
+    """Test : les deux bibliothèques acceptent les mêmes tokens et rejettent les tokens altérés"""
+    from app.core.config import settings
+    from app.core.security import create_access_token, decode_token, token_cache
+
+    monkeypatch.setattr(settings, "JWT_BACKEND", backend)
+    token_cache.clear()
+    token = create_access_token(subject="user-1")
+
+    payload = decode_token(token)
+    assert payload["sub"] == "user-1"
+    assert decode_token(token[:-2] + ("AA" if token[-2:] != "AA" else "BB")) is None
+    assert decode_token(create_access_token("user-1", expires_delta=timedelta(seconds=-1))) is None
+
+
+def test_decode_token_cached():
+    """Test : un token vérifié est servi par le cache, jamais au-delà de son expiration"""
+    from app.core.security import create_access_token, decode_token, token_cache
+
+    token_cache.clear()
+    token = create_access_token(subject="user-1", expires_delta=timedelta(seconds=2))
+
+    assert decode_token(token)["sub"] == "user-1"
+    hits_before = token_cache.hits
+    assert decode_token(token)["sub"] == "user-1"
+    assert token_cache.hits == hits_before + 1
+
+    time.sleep(2.1)
+    assert decode_token(token) is None
+
+
+@pytest.mark.slow
+def test_decode_token_benchmark(monkeypatch):
+    """Benchmark : python-jose, PyJWT et cache derrière decode_token"""
+    from app.core.config import settings
+    from app.core.security import create_access_token, decode_token, token_cache
+
+    token = create_access_token(subject="user-1")
+    rounds = 20000
+
+    def per_call(cached: bool) -> float:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            if not cached:
+                token_cache.clear()
+            decode_token(token)
+        return (time.perf_counter() - start) * 1e6 / rounds
+
+    timings = {}
+    for backend in ("jose", "pyjwt"):
+        monkeypatch.setattr(settings, "JWT_BACKEND", backend)
+        timings[backend] = per_call(cached=False)
+    timings["cache"] = per_call(cached=True)
+
+    print("\n" + ", ".join(f"{name} {micros:.1f} µs/token" for name, micros in timings.items()))
+    assert timings["pyjwt"] < timings["jose"]
+    assert timings["cache"] < timings["pyjwt"]
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_login_burst_latency():
+    """
+    Charge : latence p99 de /health pendant une vague de vérifications bcrypt
+
+    Compare l'ancien bcrypt dans la boucle d'événements au pool dédié.
+    """
+    from app.main import app
+    from app.core.security import get_password_hash, verify_password, verify_password_async
+
+    hashed = get_password_hash("password123")
+    logins = 8
+
+    async def verify_inline(password: str, hashed_password: str) -> bool:
+        return verify_password(password, hashed_password)
+
+    async def p99_during_burst(verify) -> float:
+        latencies = []
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            burst = asyncio.ensure_future(
+                asyncio.gather(*(verify("password123", hashed) for _ in range(logins)))
+            )
+            while not burst.done():
+                start = time.perf_counter()
+                await ac.get("/health")
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+            assert all(await burst)
+        latencies.sort()
+        return latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000
+
+    inline = await p99_during_burst(verify_inline)
+    pooled = await p99_during_burst(verify_password_async)
+
+    print(f"\n{logins} connexions simultanées, p99 /health : bcrypt en ligne {inline:.0f} ms, pool {pooled:.0f} ms")
+    assert pooled < inline
@@ -0,0 +1,58 @@
+"""
+Tests pour le cache mémoire TTL/LRU
+"""
+
+import time
+
+from app.core.cache import TTLCache
+
+
+def test_cache_hit_and_miss():
+    """Test des compteurs de hits et misses"""
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_cache_expiration():
+    """Test de l'expiration des entrées"""
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_lru_eviction():
+    """Test de l'éviction de l'entrée la moins récemment utilisée"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_invalidate_where():
+    """Test de l'invalidation par prédicat sur la clé"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set(("user-1", 100), "x")
+    cache.set(("user-1", 200), "y")
+    cache.set(("user-2", 100), "z")
+
+    removed = cache.invalidate_where(lambda key: key[0] == "user-1")
+
+    assert removed == 2
+    assert cache.get(("user-2", 100)) == "z"
@@ -0,0 +1,220 @@
+"""
+Tests pour les sessions de caisse (ouverture, rapport X, clôture Z)
+"""
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.cash_register import CashRegisterSession
+from app.models.product import Product
+from app.models.store import Store
+from app.models.transaction import Transaction
+from app.models.user import User
+
+
+@pytest.mark.asyncio
+async def test_cash_register_session(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_payment_method_id: UUID
+):
+    """Test : les ventes alimentent les totaux par méthode, la clôture calcule l'écart"""
+    response = await client.post(
+        "/api/v1/cash-register/open",
+        json={
+            "opening_amount": "10000",
+            "opening_details": [{"payment_method_id": str(test_payment_method_id), "amount": "10000"}]
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 201
+    session = response.json()
+    assert session["session_number"].startswith("SES-")
+    assert session["status"] == "open"
+
+    # Une seule session ouverte par caissier
+    response = await client.post(
+        "/api/v1/cash-register/open", json={"opening_amount": "0"}, headers=auth_headers
+    )
+    assert response.status_code == 400
+
+    response = await client.get("/api/v1/cash-register/current", headers=auth_headers)
+    assert response.json()["id"] == session["id"]
+
+    product = Product(
+        name="Savon",
+        sku="CAISSE-SAVON",
+        product_type="retail",
+        store_id=test_store.id,
+        selling_price=500,
+        stock_quantity_primary=20
+    )
+    test_db.add(product)
+    await test_db.commit()
+
+    for quantity in (2, 4):
+        response = await client.post(
+            "/api/v1/orders/checkout",
+            json={
+                "items": [{"product_id": str(product.id), "quantity": quantity}],
+                "payments": [{"payment_method_id": str(test_payment_method_id), "amount": str(quantity * 500)}],
+                "cash_register_session_id": session["id"]
+            },
+            headers=auth_headers
+        )
+        assert response.status_code == 201
+
+    # Dépense sortie de la caisse, puis annulée : elle ne compte plus
+    expense_id = uuid4()
+    await test_db.execute(
+        insert(Transaction.__table__).values(
+            id=expense_id,
+            store_id=test_store.id,
+            transaction_type="expense",
+            payment_method_id=test_payment_method_id,
+            cash_register_session_id=UUID(session["id"]),
+            amount=Decimal("700"),
+            status="completed"
+        )
+    )
+    await test_db.commit()
+
+    response = await client.get(f"/api/v1/cash-register/{session['id']}/report", headers=auth_headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["report_type"] == "X"
+    assert Decimal(report["total_in"]) == 3000
+    assert Decimal(report["total_out"]) == 700
+    assert Decimal(report["expected_amount"]) == 12300
+    assert Decimal(report["details"][0]["expected_closing"]) == 12300
+
+    await test_db.execute(update(Transaction).where(Transaction.id == expense_id).values(status="cancelled"))
+    await test_db.commit()
+
+    response = await client.post(
+        f"/api/v1/cash-register/{session['id']}/close",
+        json={
+            "counted": [{"payment_method_id": str(test_payment_method_id), "amount": "12900"}],
+            "closing_notes": "Manque 100"
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["report_type"] == "Z"
+    assert report["session"]["status"] == "closed"
+    assert Decimal(report["session"]["expected_amount"]) == 13000
+    assert Decimal(report["session"]["closing_amount"]) == 12900
+    assert Decimal(report["session"]["difference"]) == -100
+    detail = report["details"][0]
+    assert (Decimal(detail["total_out"]), Decimal(detail["difference"])) == (0, -100)
+
+    # Session fermée : plus de vente ni de seconde clôture
+    response = await client.post(
+        "/api/v1/orders/checkout",
+        json={
+            "items": [{"product_id": str(product.id), "quantity": 1}],
+            "cash_register_session_id": session["id"]
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 400
+    response = await client.post(f"/api/v1/cash-register/{session['id']}/close", json={}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_open_session_invalid_opening_details(
+    client: AsyncClient,
+    auth_headers: dict,
+    test_payment_method_id: UUID
+):
+    """Test : la répartition du fond de caisse doit égaler opening_amount"""
+    response = await client.post(
+        "/api/v1/cash-register/open",
+        json={
+            "opening_amount": "5000",
+            "opening_details": [{"payment_method_id": str(test_payment_method_id), "amount": "4000"}]
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_open_session_without_split(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_user: User,
+    test_payment_method_id: UUID
+):
+    """Test : un fond de caisse non réparti est affecté aux espèces, sans écart fantôme"""
+    # Session ouverte avant la répartition automatique : fond sans ligne de détail
+    legacy = CashRegisterSession(
+        store_id=test_store.id, opened_by=test_user.id, session_number="",
+        opening_amount=Decimal("5000"), status="open"
+    )
+    test_db.add(legacy)
+    await test_db.commit()
+
+    response = await client.post(
+        f"/api/v1/cash-register/{legacy.id}/close",
+        json={"counted": [{"payment_method_id": str(test_payment_method_id), "amount": "5000"}]},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert Decimal(report["session"]["closing_amount"]) == 5000
+    assert Decimal(report["session"]["difference"]) == 0
+    assert Decimal(report["details"][0]["difference"]) == 0
+
+    response = await client.post("/api/v1/cash-register/open", json={"opening_amount": "10000"}, headers=auth_headers)
+    assert response.status_code == 201
+    session = response.json()
+
+    product = Product(
+        name="Thé", sku="CAISSE-THE", product_type="retail", store_id=test_store.id,
+        selling_price=1500, stock_quantity_primary=10
+    )
+    test_db.add(product)
+    await test_db.commit()
+    response = await client.post(
+        "/api/v1/orders/checkout",
+        json={
+            "items": [{"product_id": str(product.id), "quantity": 2}],
+            "payments": [{"payment_method_id": str(test_payment_method_id), "amount": "3000"}],
+            "cash_register_session_id": session["id"]
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 201
+
+    response = await client.get(f"/api/v1/cash-register/{session['id']}/report", headers=auth_headers)
+    detail = response.json()["details"][0]
+    assert (Decimal(detail["opening_amount"]), Decimal(detail["expected_closing"])) == (10000, 13000)
+
+    # Fond + ventes comptés en espèces : aucun écart
+    response = await client.post(
+        f"/api/v1/cash-register/{session['id']}/close",
+        json={"counted": [{"payment_method_id": str(test_payment_method_id), "amount": "13000"}]},
+        headers=auth_headers
+    )
+    report = response.json()
+    assert Decimal(report["session"]["expected_amount"]) == 13000
+    assert Decimal(report["session"]["closing_amount"]) == 13000
+    assert Decimal(report["session"]["difference"]) == 0
+
+
+@pytest.mark.asyncio
+async def test_open_session_without_split_requires_cash_method(client: AsyncClient, auth_headers: dict):
+    """Test : sans méthode espèces, la répartition du fond est obligatoire"""
+    response = await client.post("/api/v1/cash-register/open", json={"opening_amount": "10000"}, headers=auth_headers)
+    assert response.status_code == 400
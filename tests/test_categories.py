@@ -83,6 +83,50 @@ async def test_get_category_tree(client: AsyncClient, test_db: AsyncSession, aut
     assert data["total_count"] >= 3
 
 
+@pytest.mark.asyncio
+async def test_category_tree_rolled_up_counts(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store
+):
+    """Test du cumul des produits des sous-catégories dans l'arbre"""
+    from app.api.v1.endpoints.categories import category_tree_cache
+    from app.models.product import Product
+
+    category_tree_cache.clear()
+
+    parent = Category(name="Tree Parent", store_id=test_store.id)
+    test_db.add(parent)
+    await test_db.flush()
+
+    child = Category(name="Tree Child", store_id=test_store.id, parent_id=parent.id)
+    test_db.add(child)
+    await test_db.flush()
+
+    for i, category_id in enumerate([parent.id, child.id, child.id]):
+        test_db.add(Product(
+            name=f"Tree Prod {i}",
+            sku=f"TREE-{i}",
+            product_type="retail",
+            selling_price=100,
+            store_id=test_store.id,
+            category_id=category_id
+        ))
+    await test_db.commit()
+
+    response = await client.get(
+        "/api/v1/categories/tree",
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    tree_parent = next(c for c in response.json()["categories"] if c["name"] == "Tree Parent")
+    assert tree_parent["product_count"] == 1
+    assert tree_parent["total_product_count"] == 3
+    assert tree_parent["children"][0]["product_count"] == 2
+
+
 @pytest.mark.asyncio
 async def test_update_category(client: AsyncClient, test_db: AsyncSession, auth_headers: dict, test_store: Store):
     """Test de mise à jour d'une catégorie"""
@@ -1,11 +1,29 @@
 """
 Tests pour les endpoints de gestion des clients
 """
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import text, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.v1.endpoints.clients import (
+    client_index_cache,
+    get_client_stats,
+    load_client_index,
+    refresh_indexed_client,
+    search_client_index,
+    search_clients
+)
+from app.core.config import settings
 from app.models.client import Client
+from app.models.order import Order
+from app.models.product import Product
 from app.models.store import Store
 
 
@@ -188,25 +206,101 @@ async def test_create_client_duplicate_phone(client: AsyncClient, test_db: Async
 
 @pytest.mark.asyncio
 async def test_search_clients(client: AsyncClient, test_db: AsyncSession, auth_headers: dict, test_store: Store):
-    """Test de recherche rapide de clients"""
+    """Test de recherche rapide de clients (nom, téléphone, code)"""
     clients = [
-        Client(first_name="Alice", last_name="Smith", phone="221771111111", store_id=test_store.id, client_code="CLI-A"),
-        Client(first_name="Bob", last_name="Johnson", phone="221772222222", store_id=test_store.id, client_code="CLI-B"),
-        Client(first_name="Charlie", last_name="Brown", phone="221773333333", store_id=test_store.id, client_code="CLI-C"),
+        Client(first_name="Alice", last_name="Smith", phone="+221 77 111 11 11", store_id=test_store.id, code=""),
+        Client(first_name="Bob", last_name="Johnson", phone="221772222222", store_id=test_store.id, code=""),
+        Client(first_name="Charlie", last_name="Brown", phone="221773333333", store_id=test_store.id, code="VIP-C"),
     ]
-    for c in clients:
-        test_db.add(c)
+    test_db.add_all(clients)
     await test_db.commit()
 
-    response = await client.get(
-        "/api/v1/clients/search?q=Alice",
-        headers=auth_headers
-    )
+    # Téléphone saisi avec séparateurs : comparaison sur les chiffres
+    response = await client.get("/api/v1/clients/search", params={"q": "22177 1"}, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [(c["full_name"], c["match_type"]) for c in data] == [("Alice Smith", "phone")]
 
+    response = await client.get("/api/v1/clients/search?q=vip-c", headers=auth_headers)
+    data = response.json()
+    assert [(c["code"], c["match_type"], c["score"]) for c in data] == [("VIP-C", "code", 1.0)]
+
+    response = await client.get("/api/v1/clients/search?q=Alice", headers=auth_headers)
+    data = response.json()
+    assert data[0]["full_name"] == "Alice Smith"
+    assert data[0]["match_type"] == "name"
+
+
+@pytest.mark.asyncio
+async def test_search_clients_by_name(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store
+):
+    """Test : recherche par nom tolérante aux fautes (pg_trgm), préfixes en tête"""
+    test_db.add_all([
+        Client(first_name="Alice", last_name="Smith", phone="221771111111", store_id=test_store.id, code=""),
+        Client(first_name="Alicia", last_name="Johnson", phone="221772222222", store_id=test_store.id, code=""),
+        Client(first_name="Bob", last_name="Brown", phone="221773333333", store_id=test_store.id, code=""),
+    ])
+    await test_db.commit()
+
+    # Faute de frappe : correspondance par similarité de trigrammes
+    response = await client.get("/api/v1/clients/search?q=Alise", headers=auth_headers)
     assert response.status_code == 200
     data = response.json()
-    assert len(data) >= 1
-    assert any("Alice" in c["first_name"] for c in data)
+    assert data[0]["full_name"] == "Alice Smith"
+    assert {c["match_type"] for c in data} == {"name"}
+    assert "Bob Brown" not in [c["full_name"] for c in data]
+
+    # Préfixe du nom de famille : bonus de préfixe, score > 0.5
+    response = await client.get("/api/v1/clients/search?q=joh", headers=auth_headers)
+    data = response.json()
+    assert [c["full_name"] for c in data] == ["Alicia Johnson"]
+    assert data[0]["score"] > 0.5
+
+
+@pytest.mark.asyncio
+async def test_search_clients_prefix_index(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    monkeypatch
+):
+    """Test : l'index de préfixes en mémoire suit créations et désactivations"""
+    monkeypatch.setattr(settings, "CLIENT_SEARCH_INDEX", True)
+    client_index_cache.clear()
+    test_db.add(Client(
+        first_name="Mame Diarra", last_name="Ndiaye", phone="221775550001", store_id=test_store.id, code=""
+    ))
+    await test_db.commit()
+
+    response = await client.get("/api/v1/clients/search?q=diar", headers=auth_headers)
+    data = response.json()
+    assert [(c["full_name"], c["match_type"]) for c in data] == [("Mame Diarra Ndiaye", "name")]
+    assert len(client_index_cache.get(test_store.id)) == 1
+
+    # Client ajouté après le chargement : répercuté par les endpoints d'écriture
+    created = Client(first_name="Sénou", last_name="Faye", phone="221775550002", store_id=test_store.id, code="")
+    test_db.add(created)
+    await test_db.commit()
+    await test_db.refresh(created)
+    refresh_indexed_client(created)
+
+    # Accents et casse ignorés
+    response = await client.get("/api/v1/clients/search?q=SENOU", headers=auth_headers)
+    assert [c["id"] for c in response.json()] == [str(created.id)]
+
+    response = await client.get("/api/v1/clients/search?q=2217755", headers=auth_headers)
+    assert [c["match_type"] for c in response.json()] == ["phone", "phone"]
+
+    # Client désactivé : retiré de l'index
+    created.is_active = False
+    await test_db.commit()
+    refresh_indexed_client(created)
+    assert len(client_index_cache.get(test_store.id)) == 1
 
 
 @pytest.mark.asyncio
@@ -344,3 +438,129 @@ async def test_get_client_stats(client: AsyncClient, test_db: AsyncSession, auth
     assert data["total_debt"] == 5000
     assert "total_orders" in data
     assert "total_spent" in data
+
+
+@pytest.mark.asyncio
+async def test_client_stats_maintained_by_trigger(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_payment_method_id: UUID
+):
+    """Test : client_stats suit les ventes, les paiements et le mois en cours"""
+    buyer = Client(first_name="Awa", last_name="Diop", phone="221775550000", store_id=test_store.id, code="")
+    product = Product(
+        name="Savon", sku="CLI-STATS-SAVON", product_type="retail", store_id=test_store.id,
+        selling_price=500, stock_quantity_primary=50
+    )
+    test_db.add_all([buyer, product])
+    await test_db.commit()
+
+    order_ids = []
+    for quantity, paid in ((2, "1000"), (4, None)):
+        response = await client.post(
+            "/api/v1/orders/checkout",
+            json={
+                "items": [{"product_id": str(product.id), "quantity": quantity}],
+                "payments": [{"payment_method_id": str(test_payment_method_id), "amount": paid}] if paid else [],
+                "client_id": str(buyer.id)
+            },
+            headers=auth_headers
+        )
+        assert response.status_code == 201
+        order_ids.append(UUID(response.json()["id"]))
+
+    stats = await get_client_stats(buyer.id, test_db)
+    # La vente à crédit compte comme commande, pas comme montant dépensé
+    assert (stats["total_orders"], stats["total_spent"]) == (2, 1000)
+    assert (stats["orders_this_month"], stats["spent_this_month"]) == (2, 1000)
+    assert stats["last_purchase_date"] is not None
+
+    # Paiement de la vente à crédit : le statut de la commande change
+    await test_db.execute(update(Order).where(Order.id == order_ids[1]).values(statut_paiement="Payer"))
+    await test_db.commit()
+    stats = await get_client_stats(buyer.id, test_db)
+    assert stats["total_spent"] == 3000
+
+    # Commande antidatée au mois dernier : sort du mois en cours, reste dans le total
+    last_month = datetime.utcnow().replace(day=1) - timedelta(days=1)
+    await test_db.execute(update(Order).where(Order.id == order_ids[1]).values(created_at=last_month))
+    await test_db.commit()
+    stats = await get_client_stats(buyer.id, test_db)
+    assert (stats["total_orders"], stats["total_spent"]) == (2, 3000)
+    assert (stats["orders_this_month"], stats["spent_this_month"]) == (1, 1000)
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_search_clients_benchmark(test_engine, test_store: Store):
+    """
+    Benchmark : autocomplete sur un magasin de 200 000 clients
+
+    Médiane par recherche en base (code, téléphone, noms si pg_trgm est
+    installé) et dans l'index mémoire. Objectif par défaut 5 ms, ajustable via
+    BENCH_MAX_CLIENT_SEARCH_MS selon le serveur. Le chargement complet de
+    l'index est aussi mesuré (BENCH_MAX_CLIENT_INDEX_LOAD_MS, 10 s par
+    défaut). Le tout s'exécute dans une transaction annulée.
+    """
+    max_ms = float(os.getenv("BENCH_MAX_CLIENT_SEARCH_MS", "5"))
+    max_load_ms = float(os.getenv("BENCH_MAX_CLIENT_INDEX_LOAD_MS", "10000"))
+    clients_count, runs = 200_000, 30
+
+    async with test_engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            await conn.execute(
+                text(
+                    "INSERT INTO clients (store_id, code, first_name, last_name, phone) "
+                    "SELECT :store_id, 'BENCH-' || i, "
+                    "(ARRAY['Awa', 'Moussa', 'Fatou', 'Ibrahima', 'Aminata'])[i % 5 + 1] || i, "
+                    "(ARRAY['Diop', 'Ndiaye', 'Fall', 'Sow', 'Ba'])[i % 7 % 5 + 1] || (i / 3), "
+                    "'+221 77 ' || LPAD(i::TEXT, 7, '0') "
+                    "FROM generate_series(1, :count) AS i"
+                ),
+                {"store_id": test_store.id, "count": clients_count}
+            )
+            await conn.execute(text("ANALYZE clients"))
+            has_trgm = await conn.scalar(text("SELECT count(*) FROM pg_extension WHERE extname = 'pg_trgm'"))
+
+            session = AsyncSession(bind=conn)
+            terms = ["BENCH-123456", "221 77 012", "2217701999"] + (["Moussa1234", "Diop"] if has_trgm else [])
+
+            async def median_ms(search) -> float:
+                timings = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    results = await search()
+                    timings.append((time.perf_counter() - start) * 1000)
+                assert results
+                return statistics.median(timings)
+
+            sql_timings = {}
+            for term in terms:
+                sql_timings[term] = await median_ms(
+                    lambda: search_clients(session, test_store.id, term, 10)
+                )
+
+            start = time.perf_counter()
+            index = await load_client_index(session, test_store.id)
+            load_ms = (time.perf_counter() - start) * 1000
+            index_timings = {}
+            for term in terms:
+                async def search_index():
+                    return search_client_index(index, term, 10)
+                index_timings[term] = await median_ms(search_index)
+            client_index_cache.clear()
+            await session.close()
+        finally:
+            await transaction.rollback()
+
+    for term in terms:
+        print(f"\n{term!r}: base {sql_timings[term]:.2f} ms, index mémoire {index_timings[term]:.3f} ms")
+    print(f"\nChargement de l'index : {load_ms:.0f} ms")
+
+    assert len(index) == clients_count
+    assert load_ms < max_load_ms
+    assert max(sql_timings.values()) < max_ms
+    assert max(index_timings.values()) < 1
@@ -0,0 +1,40 @@
+"""
+Tests pour la journalisation structurée
+"""
+import json
+import logging
+
+from app.core.config import settings
+from app.core.logs import JsonFormatter, should_log_request
+
+
+def test_json_formatter():
+    """Test d'une ligne de log JSON avec contexte et champs supplémentaires"""
+    record = logging.makeLogRecord({
+        "name": "commercia",
+        "levelname": "INFO",
+        "msg": "GET %s",
+        "args": ("/api/v1/products/",),
+        "context": {"request_id": "abc", "store_id": "s1"},
+        "sql_count": 3,
+    })
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data["message"] == "GET /api/v1/products/"
+    assert data["request_id"] == "abc"
+    assert data["store_id"] == "s1"
+    assert data["sql_count"] == 3
+    assert "context" not in data
+
+
+def test_should_log_request(monkeypatch):
+    """Test de l'échantillonnage des logs d'accès"""
+    monkeypatch.setattr(settings, "LOG_ROUTE_SAMPLE_RATES", {"/metrics": 0.0})
+    monkeypatch.setattr(settings, "LOG_SAMPLE_RATE", 1.0)
+
+    assert should_log_request("/api/v1/products/", 200, 0.01)
+    assert not should_log_request("/metrics", 200, 0.01)
+    # Erreurs et requêtes lentes toujours journalisées
+    assert should_log_request("/metrics", 500, 0.01)
+    assert should_log_request("/metrics", 200, settings.LOG_SLOW_REQUEST_MS / 1000)
@@ -0,0 +1,49 @@
+"""
+Tests pour l'instrumentation des requêtes (/metrics, Server-Timing)
+"""
+import pytest
+from httpx import AsyncClient
+
+from app.core.metrics import Histogram, RequestStats, server_timing_header
+
+
+def test_histogram_render():
+    """Test du format d'exposition Prometheus"""
+    histogram = Histogram("test_queries", "Requêtes SQL", ("route",), (1, 5))
+    histogram.observe(0, ("/a",))
+    histogram.observe(3, ("/a",))
+    histogram.observe(8, ("/a",))
+
+    text = histogram.render()
+
+    assert '# TYPE test_queries histogram' in text
+    assert 'test_queries_bucket{route="/a",le="1"} 1' in text
+    assert 'test_queries_bucket{route="/a",le="5"} 2' in text
+    assert 'test_queries_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'test_queries_sum{route="/a"} 11.000000' in text
+    assert 'test_queries_count{route="/a"} 3' in text
+
+
+def test_server_timing_header():
+    """Test de l'en-tête Server-Timing"""
+    stats = RequestStats()
+    stats.sql_count = 3
+    stats.sql_time = 0.0042
+
+    header = server_timing_header(0.0125, stats)
+
+    assert header == 'total;dur=12.5, db;dur=4.2;desc="3 queries", pool;dur=0.0'
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client: AsyncClient, auth_headers: dict):
+    """Test du comptage des requêtes SQL par route"""
+    response = await client.get("/api/v1/auth/me", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert "Server-Timing" in response.headers
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'http_request_sql_queries_count{method="GET",route="/api/v1/auth/me"}' in response.text
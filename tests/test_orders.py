@@ -0,0 +1,151 @@
+"""
+Tests pour l'encaissement des commandes
+"""
+from uuid import UUID
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.client import Client
+from app.models.product import Product
+from app.models.stock import StockMovement
+from app.models.store import Store
+
+
+@pytest.mark.asyncio
+async def test_checkout(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_payment_method_id: UUID
+):
+    """Test d'un encaissement : prix, TVA, paiement et décrément du stock"""
+    soap = Product(
+        name="Savon",
+        sku="ORD-SAVON",
+        product_type="retail",
+        store_id=test_store.id,
+        selling_price=500,
+        tax_rate=18,
+        stock_quantity_primary=10
+    )
+    water = Product(
+        name="Eau (pack)",
+        sku="ORD-EAU",
+        product_type="retail",
+        store_id=test_store.id,
+        selling_price=1200,
+        has_multiple_units=True,
+        units_per_primary=12,
+        stock_quantity_primary=2,
+        stock_quantity_secondary=24
+    )
+    test_db.add_all([soap, water])
+    await test_db.commit()
+
+    response = await client.post(
+        "/api/v1/orders/checkout",
+        json={
+            "items": [
+                {"product_id": str(soap.id), "quantity": 3, "discount_amount": "100"},
+                {"product_id": str(water.id), "quantity": 6, "unit": "secondary"}
+            ],
+            "payments": [{"payment_method_id": str(test_payment_method_id), "amount": "2000"}]
+        },
+        headers=auth_headers
+    )
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["order_number"]
+    assert data["status"] == "completed"
+    assert len(data["items"]) == 2
+    # Savon: 3 x 500 - 100 = 1400 HT + 252 TVA ; Eau: 6 x 100 = 600 HT
+    assert float(data["items"][0]["total_price"]) == 1652
+    assert float(data["items"][1]["unit_price"]) == 100
+    assert float(data["subtotal"]) == 2000
+    assert float(data["tax_amount"]) == 252
+    assert float(data["total_amount"]) == 2252
+    assert float(data["montant_restant"]) == 252
+    assert data["statut_paiement"] == "Partiellement"
+
+    await test_db.refresh(soap)
+    await test_db.refresh(water)
+    assert float(soap.stock_quantity_primary) == 7
+    assert float(water.stock_quantity_secondary) == 18
+    assert float(water.stock_quantity_primary) == 1.5
+
+    result = await test_db.execute(
+        select(StockMovement).where(StockMovement.reference_id == data["id"])
+    )
+    assert len(result.scalars().all()) == 2
+
+    # Stock insuffisant : rien n'est enregistré
+    response = await client.post(
+        "/api/v1/orders/checkout",
+        json={
+            "items": [
+                {"product_id": str(soap.id), "quantity": 1},
+                {"product_id": str(water.id), "quantity": 3}
+            ]
+        },
+        headers=auth_headers
+    )
+
+    assert response.status_code == 400
+    await test_db.refresh(soap)
+    assert float(soap.stock_quantity_primary) == 7
+
+    response = await client.get(f"/api/v1/orders/{data['id']}", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["order_number"] == data["order_number"]
+    assert len(response.json()["items"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_checkout_paid_client_earns_points_and_keeps_debt(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_payment_method_id: UUID
+):
+    """Test : vente soldée (paiement mixte) pour un client déjà endetté"""
+    buyer = Client(
+        first_name="Awa", last_name="Diop", phone="221776660001", store_id=test_store.id, code="",
+        loyalty_points=0, current_debt=5000
+    )
+    rice = Product(
+        name="Riz 5 kg", sku="ORD-RIZ", product_type="retail", store_id=test_store.id,
+        selling_price=2500, tax_rate=0, stock_quantity_primary=10
+    )
+    test_db.add_all([buyer, rice])
+    await test_db.commit()
+
+    response = await client.post(
+        "/api/v1/orders/checkout",
+        json={
+            "client_id": str(buyer.id),
+            "items": [{"product_id": str(rice.id), "quantity": 1}],
+            "payments": [
+                {"payment_method_id": str(test_payment_method_id), "amount": "1500"},
+                {"payment_method_id": str(test_payment_method_id), "amount": "1000"}
+            ]
+        },
+        headers=auth_headers
+    )
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["statut_paiement"] == "Payer"
+    assert float(data["montant_paye"]) == 2500
+    assert float(data["montant_restant"]) == 0
+
+    # 1 point par 1000 XOF ; la dette antérieure n'est pas touchée
+    await test_db.refresh(buyer)
+    assert buyer.loyalty_points == 2
+    assert float(buyer.current_debt) == 5000
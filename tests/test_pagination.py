@@ -0,0 +1,52 @@
+"""
+Tests pour les utilitaires de pagination par curseur
+"""
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import decode_cursor, encode_cursor, next_cursor, total_pages
+
+
+def test_cursor_round_trip():
+    """Test de l'encodage puis du décodage d'un curseur"""
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    row_id = uuid4()
+
+    cursor = encode_cursor(created_at, Decimal("12.50"), row_id)
+    values = decode_cursor(cursor, datetime.fromisoformat, Decimal, type(row_id))
+
+    assert values == [created_at, Decimal("12.50"), row_id]
+
+
+def test_invalid_cursor():
+    """Test d'un curseur illisible ou au mauvais format"""
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("invalide", str)
+    assert exc.value.status_code == 400
+
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor("a", "b"), str)
+
+
+def test_next_cursor():
+    """Test de la troncature de page et du curseur suivant"""
+    rows = [(i, f"id-{i}") for i in range(4)]
+
+    items, cursor = next_cursor(rows, 3, lambda row: row)
+    assert items == rows[:3]
+    assert decode_cursor(cursor, int, str) == [2, "id-2"]
+
+    items, cursor = next_cursor(rows, 4, lambda row: row)
+    assert items == rows
+    assert cursor is None
+
+
+def test_total_pages():
+    """Test du nombre de pages"""
+    assert total_pages(0, 50) == 0
+    assert total_pages(101, 50) == 3
+    assert total_pages(None, 50) is None
@@ -1,11 +1,20 @@
 """
 Tests pour les endpoints de gestion des produits
 """
+import asyncio
+import csv
+import io
+import json
+from decimal import Decimal
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import uuid4
 
+from app.api.v1.endpoints.products import BARCODE_CHANNEL, barcode_cache, on_barcode_notification
+from app.core.database import listen_channel
 from app.models.product import Product, ProductVariant
 from app.models.category import Category
 from app.models.store import Store
@@ -335,3 +344,288 @@ async def test_filter_products_by_category(client: AsyncClient, test_db: AsyncSe
     assert response.status_code == 200
     data = response.json()
     assert data["total"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_search_products_ranked(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store
+):
+    """Test de la recherche classée (SKU exact et faute de frappe)"""
+    suffix = uuid4().hex[:6].upper()
+    products = [
+        Product(name=f"Chargeur Samsung Galaxy {suffix}", sku=f"CHG-SAM-{suffix}", product_type="electronics",
+                store_id=test_store.id, purchase_price=3000, selling_price=5000),
+        Product(name=f"Câble USB Samsung {suffix}", sku=f"CAB-SAM-{suffix}", product_type="electronics",
+                store_id=test_store.id, purchase_price=1000, selling_price=2000),
+    ]
+    for prod in products:
+        test_db.add(prod)
+    await test_db.commit()
+
+    # SKU exact : court-circuit
+    response = await client.get(
+        "/api/v1/products/search",
+        params={"q": f"CHG-SAM-{suffix}"},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["match_type"] == "sku"
+    assert data[0]["score"] == 1.0
+
+    # Faute de frappe : classement par similarité
+    response = await client.get(
+        "/api/v1/products/search",
+        params={"q": f"Chargeur Samsng {suffix}"},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) >= 1
+    assert data[0]["name"] == f"Chargeur Samsung Galaxy {suffix}"
+
+
+@pytest.mark.asyncio
+async def test_lookup_barcode(client: AsyncClient, test_db: AsyncSession, auth_headers: dict, test_store: Store):
+    """Test de la lecture d'un code-barres (produit et variante)"""
+    suffix = uuid4().hex[:8]
+    product = Product(
+        name="Chemise Lin",
+        sku=f"CHE-{suffix}",
+        barcode=f"P{suffix}",
+        product_type="clothing",
+        store_id=test_store.id,
+        purchase_price=5000,
+        selling_price=10000,
+        tax_rate=18,
+        stock_quantity_primary=7
+    )
+    test_db.add(product)
+    await test_db.flush()
+    test_db.add(ProductVariant(
+        product_id=product.id,
+        sku=f"CHE-{suffix}-L",
+        barcode=f"V{suffix}",
+        variant_name="L",
+        attributes={"taille": "L"},
+        stock_quantity=3
+    ))
+    await test_db.commit()
+
+    response = await client.get(f"/api/v1/products/lookup/barcode/P{suffix}", headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["product_id"] == str(product.id)
+    assert data["variant_id"] is None
+    assert float(data["price_with_tax"]) == 11800
+    assert float(data["stock_quantity"]) == 7
+
+    response = await client.get(f"/api/v1/products/lookup/barcode/V{suffix}", headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["variant_id"] is not None
+    assert data["name"] == "Chemise Lin - L"
+    assert float(data["stock_quantity"]) == 3
+
+    response = await client.get("/api/v1/products/lookup/barcode/INCONNU-000", headers=auth_headers)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_lookup_barcode_notified_by_other_process(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    test_engine,
+    auth_headers: dict,
+    test_store: Store
+):
+    """Test : une modification faite hors de ce processus retire l'entrée de l'index (LISTEN/NOTIFY)"""
+    suffix = uuid4().hex[:8]
+    product = Product(
+        name="Savon", sku=f"SAV-{suffix}", barcode=f"S{suffix}", product_type="retail",
+        store_id=test_store.id, selling_price=500, stock_quantity_primary=20
+    )
+    test_db.add(product)
+    await test_db.commit()
+
+    listening = asyncio.Event()
+    listener = asyncio.create_task(
+        listen_channel(BARCODE_CHANNEL, on_barcode_notification, barcode_cache.clear, listening)
+    )
+    try:
+        await asyncio.wait_for(listening.wait(), timeout=5)
+
+        response = await client.get(f"/api/v1/products/lookup/barcode/S{suffix}", headers=auth_headers)
+        assert float(response.json()["selling_price"]) == 500
+
+        # Un autre worker (ou un script) modifie le prix, sans passer par ce processus
+        async with test_engine.begin() as conn:
+            await conn.execute(
+                text("UPDATE products SET selling_price = 650 WHERE id = :id"), {"id": product.id}
+            )
+
+        for _ in range(50):
+            if f"S{suffix}" not in barcode_cache.get(test_store.id):
+                break
+            await asyncio.sleep(0.05)
+
+        response = await client.get(f"/api/v1/products/lookup/barcode/S{suffix}", headers=auth_headers)
+        assert float(response.json()["selling_price"]) == 650
+    finally:
+        listener.cancel()
+
+
+@pytest.mark.asyncio
+async def test_import_products(client: AsyncClient, test_db: AsyncSession, auth_headers: dict, test_store: Store):
+    """Test : import CSV par blocs, lignes rejetées rapportées sans bloquer le fichier"""
+    category = Category(name="Outillage", store_id=test_store.id)
+    existing = Product(
+        name="Pince", sku="IMP-PINCE", barcode="6110000000001", product_type="hardware",
+        store_id=test_store.id, selling_price=2500, stock_quantity_primary=4
+    )
+    test_db.add_all([category, existing])
+    await test_db.commit()
+
+    # Export Excel français : séparateur ;, en-têtes accentués, virgule décimale
+    csv_content = (
+        "SKU;Nom;Prix vente;TVA;Catégorie;Code barres;Stock\n"
+        "IMP-MARTEAU;Marteau;1 500,50;18;outillage;6110000000002;12\n"
+        "IMP-VIS;Vis 4x40;abc;;;;\n"
+        "IMP-MARTEAU;Marteau bis;1500;;;;\n"
+        "IMP-CLOU;Clous;300;;Peinture;;\n"
+        "IMP-SCIE;Scie;9000;;;6110000000001;\n"
+        "IMP-PINCE;Pince coupante;2800;;;;\n"
+        ";;;;;;\n"
+        "IMP-METRE;Mètre;1200;;;;3\n"
+    )
+    response = await client.post(
+        "/api/v1/products/import",
+        files={"file": ("catalogue.csv", csv_content.encode("utf-8-sig"), "text/csv")},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["total_rows"], report["created"], report["updated"]) == (7, 2, 0)
+    assert [(error["row"], error["sku"]) for error in report["errors"]] == [
+        (3, "IMP-VIS"), (4, "IMP-MARTEAU"), (5, "IMP-CLOU"), (6, "IMP-SCIE"), (7, "IMP-PINCE")
+    ]
+    # Le message cite la colonne telle que nommée dans le fichier
+    assert report["errors"][0]["message"].startswith("prix_vente:")
+
+    hammer = await test_db.scalar(select(Product).where(Product.sku == "IMP-MARTEAU"))
+    assert hammer.store_id == test_store.id
+    assert hammer.selling_price == Decimal("1500.50")
+    assert hammer.category_id == category.id
+    assert hammer.stock_quantity_primary == 12
+
+    # Mise à jour des SKU existants, sans toucher au stock
+    response = await client.post(
+        "/api/v1/products/import",
+        params={"update_existing": "true"},
+        files={"file": ("maj.csv", b"sku,name,selling_price,stock\nIMP-PINCE,Pince coupante,2800,99\n", "text/csv")},
+        headers=auth_headers
+    )
+    report = response.json()
+    assert (report["created"], report["updated"], report["error_count"]) == (0, 1, 0)
+    await test_db.refresh(existing)
+    assert (existing.name, existing.selling_price, existing.stock_quantity_primary) == ("Pince coupante", 2800, 4)
+
+
+@pytest.mark.asyncio
+async def test_import_products_xlsx(client: AsyncClient, test_db: AsyncSession, auth_headers: dict, test_store: Store):
+    """Test : import d'un classeur XLSX (codes lus comme nombres)"""
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["sku", "name", "selling_price", "barcode"])
+    sheet.append(["XLS-1", "Ampoule", 750, 6110000000099])
+    sheet.append(["XLS-2", "Douille", None, None])
+    content = io.BytesIO()
+    workbook.save(content)
+
+    response = await client.post(
+        "/api/v1/products/import",
+        files={"file": ("catalogue.xlsx", content.getvalue(), "application/octet-stream")},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["error_count"]) == (1, 1)
+    assert report["errors"][0]["row"] == 3
+    bulb = await test_db.scalar(select(Product).where(Product.sku == "XLS-1"))
+    assert bulb.barcode == "6110000000099"
+
+
+@pytest.mark.asyncio
+async def test_import_products_unsupported_format(client: AsyncClient, auth_headers: dict):
+    """Test : format de fichier refusé"""
+    response = await client.post(
+        "/api/v1/products/import",
+        files={"file": ("catalogue.pdf", b"%PDF", "application/pdf")},
+        headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_products(client: AsyncClient, test_db: AsyncSession, auth_headers: dict, test_store: Store):
+    """Test : export CSV / NDJSON du catalogue, réimportable tel quel"""
+    category = Category(name="Électricité", store_id=test_store.id)
+    test_db.add(category)
+    await test_db.flush()
+    test_db.add_all([
+        Product(
+            name="Ampoule LED", sku="EXP-B", product_type="hardware", store_id=test_store.id,
+            category_id=category.id, selling_price=Decimal("1250.50"), stock_quantity_primary=8
+        ),
+        Product(name="Prise, double", sku="EXP-A", product_type="hardware", store_id=test_store.id, selling_price=900),
+        Product(
+            name="Douille", sku="EXP-C", product_type="hardware", store_id=test_store.id,
+            selling_price=300, is_active=False
+        ),
+    ])
+    await test_db.commit()
+
+    response = await client.get("/api/v1/products/export", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="produits.csv"' in response.headers["content-disposition"]
+    assert response.content.startswith("\ufeff".encode("utf-8"))
+    rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert [row["sku"] for row in rows] == ["EXP-A", "EXP-B", "EXP-C"]
+    assert rows[0]["name"] == "Prise, double"
+    assert (rows[1]["category"], rows[1]["selling_price"]) == ("Électricité", "1250.50")
+
+    response = await client.get(
+        "/api/v1/products/export", params={"format": "ndjson", "is_active": True}, headers=auth_headers
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["sku"] for line in lines] == ["EXP-A", "EXP-B"]
+    assert lines[1]["category"] == "Électricité"
+    assert lines[1]["is_active"] is True
+
+    # Un export modifié se réimporte tel quel
+    exported = (await client.get("/api/v1/products/export", headers=auth_headers)).content
+    response = await client.post(
+        "/api/v1/products/import",
+        params={"update_existing": True},
+        files={"file": ("produits.csv", exported.replace(b"1250.50", b"1300.00"), "text/csv")},
+        headers=auth_headers
+    )
+    assert (response.json()["updated"], response.json()["error_count"]) == (3, 0)
+    bulb = await test_db.scalar(
+        select(Product).where(Product.sku == "EXP-B").execution_options(populate_existing=True)
+    )
+    assert bulb.selling_price == Decimal("1300.00")
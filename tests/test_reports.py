@@ -0,0 +1,190 @@
+"""
+Tests pour les rapports (tableau de bord)
+"""
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID, uuid4
+from zoneinfo import ZoneInfo
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order
+from app.models.product import Product
+from app.models.store import Store
+from app.models.transaction import Transaction
+
+
+@pytest.mark.asyncio
+async def test_dashboard(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_payment_method_id: UUID
+):
+    """Test : le tableau de bord reflète ventes, dépenses et annulations"""
+    product = Product(
+        name="Savon",
+        sku="RPT-SAVON",
+        product_type="retail",
+        store_id=test_store.id,
+        selling_price=500,
+        stock_quantity_primary=10
+    )
+    test_db.add(product)
+    await test_db.commit()
+
+    for quantity in (2, 4):
+        response = await client.post(
+            "/api/v1/orders/checkout",
+            json={
+                "items": [{"product_id": str(product.id), "quantity": quantity}],
+                "payments": [{"payment_method_id": str(test_payment_method_id), "amount": str(quantity * 500)}]
+            },
+            headers=auth_headers
+        )
+        assert response.status_code == 201
+    first_order_id = response.json()["id"]
+
+    await test_db.execute(
+        insert(Transaction.__table__).values(
+            id=uuid4(),
+            store_id=test_store.id,
+            transaction_type="expense",
+            payment_method_id=test_payment_method_id,
+            amount=Decimal("300"),
+            status="completed"
+        )
+    )
+    await test_db.commit()
+
+    response = await client.get("/api/v1/reports/dashboard", headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    totals = data["totals"]
+    assert totals["orders_count"] == 2
+    assert Decimal(totals["revenue"]) == 3000
+    assert Decimal(totals["average_basket"]) == 1500
+    assert Decimal(totals["expenses_amount"]) == 300
+    assert Decimal(totals["cash_balance"]) == 2700
+    assert len(data["series"]) == 1
+    assert data["by_channel"][0]["key"] == "pos"
+    method = data["by_payment_method"][0]
+    assert method["name"] == "Espèces"
+    assert method["payments_count"] == 2
+
+    # Une commande annulée sort du chiffre d'affaires
+    await test_db.execute(update(Order).where(Order.id == UUID(first_order_id)).values(status="cancelled"))
+    await test_db.commit()
+
+    response = await client.get("/api/v1/reports/dashboard", headers=auth_headers)
+    totals = response.json()["totals"]
+    assert totals["orders_count"] == 1
+    assert Decimal(totals["revenue"]) == 1000
+
+
+@pytest.mark.asyncio
+async def test_dashboard_invalid_range(client: AsyncClient, auth_headers: dict):
+    """Test : période inversée refusée"""
+    response = await client.get(
+        "/api/v1/reports/dashboard",
+        params={"start_date": "2024-02-01", "end_date": "2024-01-01"},
+        headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_peak_hours(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_payment_method_id: UUID
+):
+    """Test : la vente apparaît dans le créneau jour/heure local du magasin"""
+    # Fuseau éloigné de UTC pour vérifier la conversion
+    test_store.timezone = "Asia/Tokyo"
+    product = Product(
+        name="Pain",
+        sku="RPT-PAIN",
+        product_type="retail",
+        store_id=test_store.id,
+        selling_price=150,
+        stock_quantity_primary=50
+    )
+    test_db.add(product)
+    await test_db.commit()
+
+    response = await client.post(
+        "/api/v1/orders/checkout",
+        json={
+            "items": [{"product_id": str(product.id), "quantity": 2}],
+            "payments": [{"payment_method_id": str(test_payment_method_id), "amount": "300"}]
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 201
+    sold_at = datetime.now(ZoneInfo("Asia/Tokyo"))
+
+    response = await client.get("/api/v1/reports/peak-hours", headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["cells"]) == 168
+    peak = data["peak_slots"][0]
+    assert (peak["day_of_week"], peak["hour"]) == (sold_at.isoweekday(), sold_at.hour)
+    assert peak["orders_count"] == 1
+    assert Decimal(peak["revenue"]) == 300
+
+
+@pytest.mark.asyncio
+async def test_top_products_and_abc(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_payment_method_id: UUID
+):
+    """Test : classement des produits et classes ABC (80 % / 95 %)"""
+    products = [
+        Product(name=name, sku=f"RPT-ABC-{name}", product_type="retail", store_id=test_store.id,
+                selling_price=price, purchase_price=cost, stock_quantity_primary=100)
+        for name, price, cost in (("Riz", 8000, 6000), ("Huile", 1500, 1000), ("Sel", 500, None))
+    ]
+    test_db.add_all(products)
+    await test_db.commit()
+
+    response = await client.post(
+        "/api/v1/orders/checkout",
+        json={
+            "items": [{"product_id": str(product.id), "quantity": 1} for product in products],
+            "payments": [{"payment_method_id": str(test_payment_method_id), "amount": "10000"}]
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 201
+
+    response = await client.get(
+        "/api/v1/reports/top-products", params={"limit": 2}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["name"] for item in items] == ["Riz", "Huile"]
+    assert Decimal(items[0]["share"]) == 80
+    assert Decimal(items[0]["margin"]) == 2000
+
+    response = await client.get("/api/v1/reports/abc", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert Decimal(data["total"]) == 10000
+    assert [(item["name"], item["abc_class"]) for item in data["items"]] == [
+        ("Riz", "A"), ("Huile", "B"), ("Sel", "C")
+    ]
+    # Prix d'achat inconnu : pas de marge
+    assert data["items"][2]["margin"] is None
+    assert [summary["products_count"] for summary in data["classes"]] == [1, 1, 1]
@@ -0,0 +1,524 @@
+"""
+Tests pour les endpoints de gestion du stock
+"""
+import asyncio
+import csv
+import io
+import json
+import tracemalloc
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.api.v1.endpoints.products import stock_summary_cache
+from app.api.v1.endpoints.stock import create_stock_movement, movement_filters
+from app.core.pagination import CountMode, count_total
+from app.core.export import ExportFormat, stream_query
+from app.models.product import Product, ProductVariant
+from app.models.stock import StockMovement
+from app.models.store import Store
+from app.models.user import User
+from app.schemas.stock import MovementType
+
+
+@pytest.mark.asyncio
+async def test_current_stock_cursor_pagination(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store
+):
+    """Test du parcours complet de l'état du stock par curseur"""
+    for i in range(5):
+        test_db.add(Product(
+            name=f"Stock Prod {i}",
+            sku=f"STK-CUR-{i}",
+            product_type="retail",
+            store_id=test_store.id,
+            purchase_price=100,
+            selling_price=150,
+            stock_quantity_primary=i
+        ))
+    await test_db.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"page_size": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/api/v1/stock/current", params=params, headers=auth_headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        seen.extend(item["product_id"] for item in data["items"])
+        if not data["has_more"]:
+            break
+        cursor = data["next_cursor"]
+
+    assert len(seen) == len(set(seen))
+    assert len(seen) >= 5
+
+
+@pytest.mark.asyncio
+async def test_current_stock_invalid_cursor(client: AsyncClient, auth_headers: dict):
+    """Test d'un curseur invalide"""
+    response = await client.get(
+        "/api/v1/stock/current",
+        params={"cursor": "invalide"},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_stock_summary_includes_variants(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store
+):
+    """Test du résumé de stock avec le stock des variantes"""
+    from app.models.product import ProductVariant
+
+    product = Product(
+        name="T-Shirt Résumé",
+        sku="STK-SUM-1",
+        product_type="clothing",
+        store_id=test_store.id,
+        purchase_price=1000,
+        selling_price=2000,
+        has_variants=True,
+        stock_quantity_primary=0
+    )
+    test_db.add(product)
+    await test_db.flush()
+    test_db.add(ProductVariant(
+        product_id=product.id,
+        sku="STK-SUM-1-M",
+        variant_name="M",
+        attributes={"taille": "M"},
+        stock_quantity=4
+    ))
+    await test_db.commit()
+
+    response = await client.get(
+        "/api/v1/stock/summary",
+        params={"use_cache": False},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["products_with_variants"] >= 1
+    assert data["products_in_stock"] >= 1
+    assert data["total_stock_value"] >= 4000
+
+
+@pytest.mark.asyncio
+async def test_stock_summary_cache_invalidated_after_writes(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store
+):
+    """Test : le résumé en cache suit l'import de produits et les mouvements"""
+    stock_summary_cache.clear()
+    response = await client.get("/api/v1/stock/summary", headers=auth_headers)
+    initial = response.json()
+
+    # Import d'un produit avec stock initial
+    csv_content = b"sku,name,selling_price,purchase_price,stock\nSTK-SUM-IMP,Seau,1500,1000,3\n"
+    response = await client.post(
+        "/api/v1/products/import",
+        files={"file": ("catalogue.csv", csv_content, "text/csv")},
+        headers=auth_headers
+    )
+    assert response.json()["created"] == 1
+
+    response = await client.get("/api/v1/stock/summary", headers=auth_headers)
+    data = response.json()
+    assert data["total_products"] == initial["total_products"] + 1
+    assert data["total_stock_value"] == initial["total_stock_value"] + 3000
+
+    product_id = await test_db.scalar(select(Product.id).where(Product.sku == "STK-SUM-IMP"))
+    response = await client.post(
+        "/api/v1/stock/movements/bulk",
+        json={"movement_type": "purchase", "lines": [{"product_id": str(product_id), "quantity": 2}]},
+        headers=auth_headers
+    )
+    assert response.status_code == 201
+
+    response = await client.get("/api/v1/stock/summary", headers=auth_headers)
+    assert response.json()["total_stock_value"] == initial["total_stock_value"] + 5000
+
+
+@pytest.mark.asyncio
+async def test_bulk_stock_movements(client: AsyncClient, test_db: AsyncSession, auth_headers: dict, test_store: Store):
+    """Test d'une réception groupée puis d'une sortie refusée (tout ou rien)"""
+    products = [
+        Product(
+            name=f"Bulk Prod {i}",
+            sku=f"STK-BULK-{i}",
+            product_type="retail",
+            store_id=test_store.id,
+            purchase_price=100,
+            selling_price=150,
+            stock_quantity_primary=1
+        )
+        for i in range(3)
+    ]
+    for product in products:
+        test_db.add(product)
+    await test_db.commit()
+
+    lines = [{"product_id": str(product.id), "quantity": 5} for product in products]
+    lines.append({"product_id": str(products[0].id), "quantity": 2})
+
+    response = await client.post(
+        "/api/v1/stock/movements/bulk",
+        json={"movement_type": "purchase", "reason": "BL-001", "lines": lines},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["movements_created"] == 4
+    assert data["products_updated"] == 3
+    assert data["items"][-1]["stock_before"] == 6
+    assert data["items"][-1]["stock_after"] == 8
+
+    response = await client.post(
+        "/api/v1/stock/movements/bulk",
+        json={
+            "movement_type": "adjustment_out",
+            "lines": [
+                {"product_id": str(products[1].id), "quantity": 1},
+                {"product_id": str(products[2].id), "quantity": 1000}
+            ]
+        },
+        headers=auth_headers
+    )
+
+    assert response.status_code == 400
+
+    await test_db.refresh(products[1])
+    assert float(products[1].stock_quantity_primary) == 6
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sales_never_oversell(test_engine, test_db: AsyncSession, test_store: Store, test_user: User):
+    """Test de charge : ventes simultanées du même produit, le stock final et le journal sont exacts"""
+    initial_stock = 20
+    concurrent_sales = 60
+
+    product = Product(
+        name="Dernier Article",
+        sku="STK-RACE-1",
+        product_type="retail",
+        store_id=test_store.id,
+        purchase_price=100,
+        selling_price=150,
+        primary_unit="pièce",
+        stock_quantity_primary=initial_stock
+    )
+    test_db.add(product)
+    await test_db.commit()
+
+    session_factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def sell_one() -> bool:
+        async with session_factory() as session:
+            try:
+                await create_stock_movement(
+                    db=session,
+                    store_id=test_store.id,
+                    product_id=product.id,
+                    movement_type=MovementType.SALE,
+                    quantity=1,
+                    unit="pièce",
+                    user_id=test_user.id
+                )
+                await session.commit()
+                return True
+            except HTTPException as exc:
+                await session.rollback()
+                assert exc.status_code == 400
+                return False
+
+    results = await asyncio.gather(*(sell_one() for _ in range(concurrent_sales)))
+
+    assert sum(results) == initial_stock
+
+    await test_db.refresh(product)
+    assert float(product.stock_quantity_primary) == 0
+
+    result = await test_db.execute(
+        select(func.count(), func.sum(StockMovement.quantity)).where(StockMovement.product_id == product.id)
+    )
+    movements, quantity = result.one()
+    assert movements == initial_stock
+    assert float(quantity) == initial_stock
+
+
+@pytest.mark.asyncio
+async def test_product_stock_history(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_user: User
+):
+    """Test de l'historique : noms de variantes, solde courant et pagination par curseur"""
+    product = Product(
+        name="T-shirt",
+        sku="STK-HIST-1",
+        product_type="retail",
+        store_id=test_store.id,
+        selling_price=5000,
+        primary_unit="pièce",
+        stock_quantity_primary=10
+    )
+    test_db.add(product)
+    await test_db.flush()
+    variant = ProductVariant(
+        product_id=product.id,
+        sku="STK-HIST-1-M",
+        variant_name="Rouge - M",
+        attributes={"couleur": "Rouge", "taille": "M"},
+        stock_quantity=8
+    )
+    test_db.add(variant)
+    await test_db.commit()
+
+    for movement_type, quantity, variant_id in (
+        (MovementType.PURCHASE, 5, None),
+        (MovementType.PURCHASE, 4, variant.id),
+        (MovementType.SALE, 3, None),
+        (MovementType.SALE, 1, variant.id),
+    ):
+        await create_stock_movement(
+            db=test_db,
+            store_id=test_store.id,
+            product_id=product.id,
+            movement_type=movement_type,
+            quantity=quantity,
+            unit="pièce",
+            user_id=test_user.id,
+            variant_id=variant_id
+        )
+        await test_db.commit()
+
+    items, cursor = [], None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get(
+            f"/api/v1/stock/movements/{product.id}/history", params=params, headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        items.extend(data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    # Du plus récent au plus ancien, solde par variante ou pour le produit
+    assert [
+        (item["variant_name"], item["quantity_change"], item["stock_before"], item["stock_after"])
+        for item in items
+    ] == [
+        ("Rouge - M", -1, 12, 11),
+        (None, -3, 15, 12),
+        ("Rouge - M", 4, 8, 12),
+        (None, 5, 10, 15),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_stock_movements(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store,
+    test_user: User
+):
+    """Test : export du journal en CSV et NDJSON, ordre chronologique et filtres"""
+    product = Product(
+        name="Câble 2,5 mm²", sku="STK-EXP-1", product_type="hardware", store_id=test_store.id,
+        selling_price=800, stock_quantity_primary=100
+    )
+    test_db.add(product)
+    await test_db.flush()
+    variant = ProductVariant(
+        product_id=product.id, sku="STK-EXP-1-R", variant_name="Rouge",
+        attributes={"couleur": "Rouge"}, stock_quantity=10
+    )
+    test_db.add(variant)
+    await test_db.commit()
+
+    for movement_type, quantity, variant_id in (
+        (MovementType.PURCHASE, 50, None),
+        (MovementType.SALE, 7.5, None),
+        (MovementType.PURCHASE, 4, variant.id),
+    ):
+        await create_stock_movement(
+            db=test_db, store_id=test_store.id, product_id=product.id, movement_type=movement_type,
+            quantity=quantity, unit="mètre", user_id=test_user.id, variant_id=variant_id
+        )
+        await test_db.commit()
+
+    response = await client.get("/api/v1/stock/movements/export", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="mouvements_stock.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert [(row["movement_type"], row["quantity"], row["variant_sku"]) for row in rows] == [
+        ("purchase", "50.000", ""), ("sale", "7.500", ""), ("purchase", "4.000", "STK-EXP-1-R")
+    ]
+    assert rows[0]["product_name"] == "Câble 2,5 mm²"
+
+    response = await client.get(
+        "/api/v1/stock/movements/export",
+        params={"format": "ndjson", "movement_type": "purchase"},
+        headers=auth_headers
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["quantity"] for line in lines] == ["50.000", "4.000"]
+    assert lines[0]["performed_by"] == str(test_user.id)
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_export_memory_is_constant(test_engine, test_db: AsyncSession, test_store: Store):
+    """
+    Benchmark : pic mémoire de l'export pour 20 000 puis 200 000 mouvements
+
+    Le pic doit rester du même ordre (curseur serveur, envoi par blocs). Le
+    tout s'exécute dans une transaction annulée.
+    """
+    async def export_peak(conn, movements_count: int) -> tuple:
+        session_factory = async_sessionmaker(bind=conn, class_=AsyncSession)
+        query = (
+            select(StockMovement.id, StockMovement.created_at, StockMovement.movement_type, StockMovement.quantity)
+            .where(StockMovement.store_id == test_store.id)
+            .order_by(StockMovement.created_at, StockMovement.id)
+        )
+        tracemalloc.start()
+        exported_rows = 0
+        async for chunk in stream_query(session_factory, query, ExportFormat.CSV):
+            exported_rows += chunk.count(b"\n")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert exported_rows == movements_count + 1  # en-tête
+        return peak
+
+    async with test_engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            product_id = uuid4()
+            await conn.execute(
+                insert(Product.__table__).values(
+                    id=product_id, store_id=test_store.id, name="Bench export", sku="BENCH-EXPORT",
+                    product_type="retail", selling_price=100
+                )
+            )
+            peaks = {}
+            inserted = 0
+            for movements_count in (20_000, 200_000):
+                await conn.execute(
+                    text(
+                        "INSERT INTO stock_movements (store_id, product_id, movement_type, quantity, unit, created_at) "
+                        "SELECT :store_id, :product_id, 'purchase', i % 50 + 1, 'pièce', "
+                        "NOW() - make_interval(secs => i) FROM generate_series(1, :count) AS i"
+                    ),
+                    {"store_id": test_store.id, "product_id": product_id, "count": movements_count - inserted}
+                )
+                inserted = movements_count
+                peaks[movements_count] = await export_peak(conn, movements_count)
+        finally:
+            await transaction.rollback()
+
+    print(
+        f"\nPic mémoire de l'export : {peaks[20_000] / 1024:.0f} Kio pour 20 000 lignes, "
+        f"{peaks[200_000] / 1024:.0f} Kio pour 200 000 lignes"
+    )
+    assert peaks[200_000] < 2 * peaks[20_000]
+
+
+@pytest.mark.asyncio
+async def test_stock_movement_refreshes_barcode_entry(
+    client: AsyncClient,
+    test_db: AsyncSession,
+    auth_headers: dict,
+    test_store: Store
+):
+    """Test : après un mouvement validé, le scan renvoie le nouveau stock"""
+    barcode = f"STK-{uuid4().hex[:8]}"
+    product = Product(
+        name="Ciment 50 kg", sku=barcode, barcode=barcode, product_type="hardware",
+        store_id=test_store.id, selling_price=4500, stock_quantity_primary=10
+    )
+    test_db.add(product)
+    await test_db.commit()
+
+    # Index chargé avec le stock initial
+    response = await client.get(f"/api/v1/products/lookup/barcode/{barcode}", headers=auth_headers)
+    assert float(response.json()["stock_quantity"]) == 10
+
+    response = await client.post(
+        "/api/v1/stock/movements",
+        json={
+            "store_id": str(test_store.id), "product_id": str(product.id),
+            "movement_type": "purchase", "quantity": 5, "unit": "pièce"
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 201
+
+    response = await client.get(f"/api/v1/products/lookup/barcode/{barcode}", headers=auth_headers)
+    assert float(response.json()["stock_quantity"]) == 15
+
+    response = await client.post(
+        "/api/v1/stock/adjust",
+        json={"product_id": str(product.id), "new_quantity": 4, "reason": "Inventaire", "unit": "pièce"},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    response = await client.get(f"/api/v1/products/lookup/barcode/{barcode}", headers=auth_headers)
+    assert float(response.json()["stock_quantity"]) == 4
+
+
+@pytest.mark.asyncio
+async def test_estimated_count_uses_filters(test_db: AsyncSession, test_store: Store):
+    """Test : count_mode=estimated estime la requête filtrée, pas la table entière"""
+    product = Product(name="Sable", sku="STK-EST-1", product_type="hardware", store_id=test_store.id, selling_price=100)
+    test_db.add(product)
+    await test_db.flush()
+    await test_db.execute(
+        text(
+            "INSERT INTO stock_movements (store_id, product_id, movement_type, quantity, unit) "
+            "SELECT :store_id, :product_id, 'purchase', 1, 'pièce' FROM generate_series(1, 300)"
+        ),
+        {"store_id": test_store.id, "product_id": product.id}
+    )
+    await test_db.commit()
+    await test_db.execute(text("ANALYZE stock_movements"))
+
+    # Mouvements du magasin uniquement (la table contient ceux des autres magasins)
+    query = select(StockMovement).where(*movement_filters(test_store.id))
+    assert 200 <= await count_total(test_db, query, CountMode.ESTIMATED) <= 400
+    assert await count_total(test_db, query, CountMode.EXACT) == 300
+
+    # Aucun mouvement de ce type pour le produit : estimation minimale
+    query = select(StockMovement).where(*movement_filters(test_store.id, product.id, MovementType.SALE))
+    assert await count_total(test_db, query, CountMode.ESTIMATED) < 50
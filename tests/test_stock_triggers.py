@@ -0,0 +1,266 @@
+"""
+Tests pour les triggers de stock sur les commandes (deduct_stock_on_order)
+"""
+import time
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order, OrderItem
+from app.models.product import Product, ProductVariant
+from app.models.stock import StockMovement
+from app.models.store import Store
+
+
+# Version ligne par ligne du trigger, conservée pour le benchmark
+LEGACY_DEDUCT_STOCK_ON_ORDER = """
+CREATE OR REPLACE FUNCTION deduct_stock_on_order_legacy()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_item RECORD;
+    v_product RECORD;
+BEGIN
+    IF NEW.status IN ('confirmed', 'completed')
+       AND (OLD.status IS NULL OR OLD.status NOT IN ('confirmed', 'completed')) THEN
+        FOR v_item IN
+            SELECT * FROM order_items WHERE order_id = NEW.id
+        LOOP
+            SELECT * INTO v_product FROM products WHERE id = v_item.product_id;
+
+            IF v_product.track_stock THEN
+                IF v_item.variant_id IS NOT NULL THEN
+                    UPDATE product_variants
+                    SET stock_quantity = stock_quantity - v_item.quantity
+                    WHERE id = v_item.variant_id;
+                ELSE
+                    IF v_item.unit = 'primary' THEN
+                        UPDATE products
+                        SET stock_quantity_primary = stock_quantity_primary - v_item.quantity
+                        WHERE id = v_item.product_id;
+
+                        IF v_product.has_multiple_units THEN
+                            UPDATE products
+                            SET stock_quantity_secondary = stock_quantity_primary * units_per_primary
+                            WHERE id = v_item.product_id;
+                        END IF;
+                    ELSE
+                        UPDATE products
+                        SET stock_quantity_secondary = stock_quantity_secondary - v_item.quantity
+                        WHERE id = v_item.product_id;
+
+                        IF v_product.has_multiple_units THEN
+                            UPDATE products
+                            SET stock_quantity_primary = stock_quantity_secondary / units_per_primary
+                            WHERE id = v_item.product_id;
+                        END IF;
+                    END IF;
+                END IF;
+
+                INSERT INTO stock_movements (
+                    store_id, product_id, variant_id, movement_type,
+                    quantity, unit, reference_type, reference_id, performed_by
+                ) VALUES (
+                    NEW.store_id, v_item.product_id, v_item.variant_id, 'out',
+                    v_item.quantity, v_item.unit, 'order', NEW.id, NEW.created_by
+                );
+            END IF;
+        END LOOP;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def item_row(order_id, product_id, quantity, unit="primary", variant_id=None) -> dict:
+    """Ligne de commande minimale"""
+    return {
+        "id": uuid4(),
+        "order_id": order_id,
+        "product_id": product_id,
+        "variant_id": variant_id,
+        "product_name": "Produit",
+        "quantity": Decimal(str(quantity)),
+        "unit": unit,
+        "unit_price": Decimal("100"),
+        "total_price": Decimal("100") * Decimal(str(quantity))
+    }
+
+
+async def insert_pending_order(conn, store_id, lines) -> UUID:
+    """
+    Insère une commande en attente et ses lignes (le stock n'est pas encore touché)
+
+    - **lines**: tuples (product_id, quantity, unit, variant_id) ; unit et variant_id optionnels
+    """
+    order_id = uuid4()
+    await conn.execute(
+        insert(Order.__table__).values(
+            id=order_id,
+            store_id=store_id,
+            order_number="",
+            order_type="pos",
+            subtotal=Decimal("100"),
+            total_amount=Decimal("100"),
+            status="pending"
+        )
+    )
+    await conn.execute(insert(OrderItem.__table__).values([item_row(order_id, *line) for line in lines]))
+    return order_id
+
+
+@pytest.mark.asyncio
+async def test_deduct_stock_on_order(test_db: AsyncSession, test_store: Store):
+    """Test : confirmer une commande déduit le stock de toutes ses lignes"""
+    soap = Product(
+        name="Savon", sku="TRG-SAVON", product_type="retail", store_id=test_store.id,
+        selling_price=500, stock_quantity_primary=10
+    )
+    water = Product(
+        name="Eau (pack)", sku="TRG-EAU", product_type="retail", store_id=test_store.id,
+        selling_price=1200, has_multiple_units=True, units_per_primary=12,
+        stock_quantity_primary=5, stock_quantity_secondary=60
+    )
+    rice = Product(
+        name="Riz (sac)", sku="TRG-RIZ", product_type="retail", store_id=test_store.id,
+        selling_price=25000, has_multiple_units=True, units_per_primary=50,
+        stock_quantity_primary=4, stock_quantity_secondary=200
+    )
+    service = Product(
+        name="Livraison", sku="TRG-LIVR", product_type="service", store_id=test_store.id,
+        selling_price=1000, track_stock=False, stock_quantity_primary=0
+    )
+    shirt = Product(
+        name="T-shirt", sku="TRG-TSHIRT", product_type="retail", store_id=test_store.id,
+        selling_price=5000, has_variants=True
+    )
+    test_db.add_all([soap, water, rice, service, shirt])
+    await test_db.flush()
+    variant = ProductVariant(
+        product_id=shirt.id, sku="TRG-TSHIRT-M", variant_name="M",
+        attributes={"size": "M"}, stock_quantity=8
+    )
+    test_db.add(variant)
+    await test_db.commit()
+
+    conn = await test_db.connection()
+    order_id = await insert_pending_order(conn, test_store.id, [
+        (soap.id, 2),
+        (soap.id, 1),
+        (water.id, 1),
+        (rice.id, 1),
+        (rice.id, 25, "secondary"),
+        (service.id, 1),
+        (shirt.id, 3, "primary", variant.id),
+    ])
+    await test_db.commit()
+
+    await test_db.execute(update(Order).where(Order.id == order_id).values(status="confirmed"))
+    await test_db.commit()
+
+    result = await test_db.execute(
+        select(Product.id, Product.stock_quantity_primary, Product.stock_quantity_secondary)
+        .where(Product.store_id == test_store.id)
+    )
+    stock = {row.id: (row.stock_quantity_primary, row.stock_quantity_secondary) for row in result}
+    assert stock[soap.id][0] == 7
+    # Multi-unités en unité primaire seule : le secondaire suit le primaire
+    assert stock[water.id] == (4, 48)
+    # Lignes mixtes : 200 - (25 + 1 x 50) = 125 sachets, soit 2,5 sacs
+    assert stock[rice.id] == (Decimal("2.5"), 125)
+    assert stock[service.id][0] == 0
+
+    variant_stock = await test_db.scalar(
+        select(ProductVariant.stock_quantity).where(ProductVariant.id == variant.id)
+    )
+    assert variant_stock == 5
+
+    movements = await test_db.scalar(
+        select(func.count()).select_from(StockMovement).where(StockMovement.reference_id == order_id)
+    )
+    # Une ligne de mouvement par article suivi en stock (la livraison est exclue)
+    assert movements == 6
+
+    # Reconfirmer la commande ne déduit pas une seconde fois
+    await test_db.execute(update(Order).where(Order.id == order_id).values(status="completed"))
+    await test_db.commit()
+    assert await test_db.scalar(
+        select(Product.stock_quantity_primary).where(Product.id == soap.id)
+    ) == 7
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_deduct_stock_benchmark(test_engine, test_db: AsyncSession, test_store: Store):
+    """
+    Benchmark : trigger ensembliste contre l'ancienne boucle ligne par ligne
+
+    20 commandes de gros de 60 lignes confirmées avec chaque version. Le tout
+    s'exécute dans une transaction annulée (le remplacement du trigger aussi).
+    """
+    orders_count, lines = 20, 60
+
+    async with test_engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            product_ids = []
+            for i in range(lines):
+                product_id = uuid4()
+                multi = i % 3 == 0
+                await conn.execute(
+                    insert(Product.__table__).values(
+                        id=product_id,
+                        store_id=test_store.id,
+                        name=f"Bench {i}",
+                        sku=f"BENCH-{i}",
+                        product_type="retail",
+                        selling_price=Decimal("1000"),
+                        has_multiple_units=multi,
+                        units_per_primary=12 if multi else 1,
+                        stock_quantity_primary=Decimal("100000"),
+                        stock_quantity_secondary=Decimal("1200000") if multi else Decimal("0")
+                    )
+                )
+                product_ids.append(product_id)
+
+            # Une ligne sur six en unité secondaire (produits multi-unités)
+            order_lines = [
+                (product_id, 1, "secondary" if i % 6 == 0 else "primary")
+                for i, product_id in enumerate(product_ids)
+            ]
+
+            async def confirm_orders() -> float:
+                order_ids = [
+                    await insert_pending_order(conn, test_store.id, order_lines)
+                    for _ in range(orders_count)
+                ]
+                start = time.perf_counter()
+                for order_id in order_ids:
+                    await conn.execute(
+                        update(Order.__table__).where(Order.__table__.c.id == order_id).values(status="confirmed")
+                    )
+                return time.perf_counter() - start
+
+            set_based = await confirm_orders()
+
+            await conn.execute(text(LEGACY_DEDUCT_STOCK_ON_ORDER))
+            await conn.execute(text("DROP TRIGGER trigger_deduct_stock_on_order ON orders"))
+            await conn.execute(text(
+                "CREATE TRIGGER trigger_deduct_stock_on_order AFTER INSERT OR UPDATE ON orders "
+                "FOR EACH ROW EXECUTE FUNCTION deduct_stock_on_order_legacy()"
+            ))
+            legacy = await confirm_orders()
+        finally:
+            await transaction.rollback()
+
+    print(
+        f"\n{orders_count} commandes x {lines} lignes : "
+        f"ligne par ligne {legacy * 1000 / orders_count:.1f} ms/commande, "
+        f"ensembliste {set_based * 1000 / orders_count:.1f} ms/commande "
+        f"(x{legacy / set_based:.1f})"
+    )
+    assert set_based < legacy